@@ -1,3 +1,7 @@
+from .bulk import *
+from .conditional import *
 from .destinations import *
 from .itineraries import *
+from .pagination import *
+from .serialization import *
 from .users import *
@@ -0,0 +1,122 @@
+import json
+from collections import defaultdict
+from typing import Any, Callable, Dict, Hashable, List, Union
+
+from app.config import settings
+from app.services.supabase_client import supabase_client_manager
+from fastapi import HTTPException, Request
+from pydantic import ValidationError
+
+# Ids per IN lookup, keeping the PostgREST URL short
+ID_LOOKUP_CHUNK_SIZE = 100
+NDJSON_TYPES = ("application/x-ndjson", "application/jsonl")
+
+
+class InvalidItem(Exception):
+    """A bulk item that could not be parsed; reported, not raised."""
+
+
+def describe_validation_error(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in e['loc']) or 'item'}: {e['msg']}"
+        for e in error.errors()
+    )
+
+
+async def read_bulk_items(
+    request: Request, max_items: int = settings.DESTINATION_BULK_MAX_ITEMS
+) -> List[Union[Any, InvalidItem]]:
+    """Items of a JSON array body, or of an NDJSON stream, one per line.
+
+    NDJSON is read as it arrives, and a malformed line only invalidates
+    itself; a malformed JSON array invalidates the request.
+    """
+    items: List[Union[Any, InvalidItem]] = []
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith(NDJSON_TYPES):
+        buffer = b""
+
+        def add_line(line: bytes):
+            line = line.strip()
+            if not line:
+                return
+            try:
+                items.append(json.loads(line))
+            except ValueError as e:
+                items.append(InvalidItem(f"Invalid JSON: {e}"))
+
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                add_line(line)
+            if len(items) > max_items:
+                break
+        add_line(buffer)
+    else:
+        try:
+            items = json.loads(await request.body())
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid JSON: {e}")
+        if not isinstance(items, list):
+            raise HTTPException(status_code=400, detail="Expected a JSON array")
+
+    if len(items) > max_items:
+        raise HTTPException(
+            status_code=413, detail=f"At most {max_items} items per request"
+        )
+    return items
+
+
+async def write_in_chunks(
+    rows: List[dict],
+    query_for: Callable[[List[dict]], Any],
+    chunk_size: int = settings.DESTINATION_BULK_CHUNK_SIZE,
+    key: Callable[[dict], Hashable] = lambda row: row["id"],
+) -> List[Union[dict, Exception]]:
+    """Runs one multi-row write per chunk; returns the written row or the
+    error for each input row, in order.
+
+    A chunk that fails is retried row by row, so one bad row only fails
+    itself. A chunk that writes fewer rows than it sent is matched back to
+    its input rows by ``key``; the missing ones fail and none are replayed.
+    """
+    results: List[Union[dict, Exception]] = []
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start : start + chunk_size]
+        try:
+            written = await supabase_client_manager.execute(query_for(chunk))
+        except Exception as e:
+            if len(chunk) == 1:
+                results.append(e)
+                continue
+            for row in chunk:
+                results.extend(await write_in_chunks([row], query_for, 1, key))
+            continue
+        if len(written.data) == len(chunk):
+            results.extend(written.data)
+            continue
+
+        returned = defaultdict(list)
+        for row in written.data:
+            returned[key(row)].append(row)
+        for row in chunk:
+            matches = returned.get(key(row))
+            results.append(
+                matches.pop(0) if matches else ValueError("Row was not written")
+            )
+    return results
+
+
+async def fetch_by_ids(
+    query_for: Callable[[List[str]], Any],
+    ids: List[str],
+    chunk_size: int = ID_LOOKUP_CHUNK_SIZE,
+) -> Dict[str, dict]:
+    rows = {}
+    for start in range(0, len(ids), chunk_size):
+        found = await supabase_client_manager.execute(
+            query_for(ids[start : start + chunk_size])
+        )
+        rows.update((row["id"], row) for row in found.data)
+    return rows
@@ -0,0 +1,32 @@
+import hashlib
+from typing import Dict, Optional
+
+from fastapi import Request, Response
+
+
+def compute_etag(body: bytes) -> str:
+    """Strong ETag over the exact response bytes."""
+    return f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    # Weak comparison, as RFC 9110 requires for If-None-Match
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+def conditional_response(
+    request: Request,
+    body: bytes,
+    etag: Optional[str] = None,
+    headers: Optional[Dict[str, str]] = None,
+    media_type: str = "application/json",
+) -> Response:
+    """``body`` with its ETag, or an empty 304 if the client already has it."""
+    headers = {**(headers or {}), "ETag": etag or compute_etag(body)}
+    if etag_matches(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type=media_type, headers=headers)
@@ -1,11 +1,79 @@
-from typing import List
-from fastapi import APIRouter, HTTPException, Request
-from app.models.destination import Destination, DestinationCreate, DestinationUpdate
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Union
+import anyio
+from fastapi import APIRouter, HTTPException, Query, Request
+from app.api.bulk import (
+    InvalidItem,
+    describe_validation_error,
+    fetch_by_ids,
+    read_bulk_items,
+    write_in_chunks,
+)
+from app.api.conditional import compute_etag, conditional_response
+from app.api.pagination import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    decode_cursor,
+    page_response,
+    parse_fields,
+    seek_after,
+    split_page,
+)
+from app.api.serialization import (
+    ModelResponse,
+    destination_list_adapter,
+    rows_to_json,
+)
+from app.models.destination import (
+    BulkItemResult,
+    BulkItemStatus,
+    BulkResult,
+    Destination,
+    DestinationCreate,
+    DestinationPatch,
+    DestinationUpdate,
+    NearbyDestination,
+    Season,
+)
+from app.services.destination_cache import destination_cache
+from app.services.spatial_index import SpatialIndex, destination_index
 from app.services.supabase_client import supabase_client_manager
 from app.services.vector_store import vector_store_service
+from pydantic import ValidationError
+from pydantic_core import to_json
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 supabase_client = supabase_client_manager.get_client()
+index_lock = asyncio.Lock()
+
+INDEX_COLUMNS = ("id", "name", "country", "latitude", "longitude")
+
+
+def index_entry(destination: Destination) -> dict:
+    return destination.model_dump(include=set(INDEX_COLUMNS))
+
+
+async def get_destination_index() -> SpatialIndex:
+    # Loaded on first use, then kept current by the write endpoints
+    if not destination_index.loaded:
+        async with index_lock:
+            if not destination_index.loaded:
+                rows = await supabase_client_manager.execute(
+                    supabase_client.table("destinations").select(
+                        ",".join(INDEX_COLUMNS)
+                    )
+                )
+                destination_index.rebuild(rows.data)
+    return destination_index
+
+
+def to_nearby(results) -> List[NearbyDestination]:
+    return [
+        NearbyDestination(**entry, distance_km=distance) for entry, distance in results
+    ]
 
 
 @router.post("/", response_model=Destination)
@@ -15,39 +83,323 @@ async def create_destination(destination: DestinationCreate, request: Request):
         if not user_id:
             raise HTTPException(status_code=401, detail="Unauthorized")
 
-        new_destination = (
+        new_destination = await supabase_client_manager.execute(
             supabase_client.table("destinations")
             .insert(destination.model_dump())
-            .execute()
         )
         created_destination = Destination(**new_destination.data[0])
-        vector_store_service.add_destination(created_destination)
-        return created_destination
+        # The row is committed, so the index and cache follow it first
+        destination_index.upsert(index_entry(created_destination))
+        destination_cache.invalidate(
+            created_destination.id, new_destination.data[0]
+        )
+        await anyio.to_thread.run_sync(
+            vector_store_service.add_destination, created_destination
+        )
+        return ModelResponse(created_destination)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
-@router.get("/", response_model=List[Destination])
-async def read_destinations():
+@router.get(
+    "/",
+    # A fields= projection returns only the requested columns of each row
+    response_model=Union[List[Destination], List[Dict[str, Any]]],
+    response_description="Destinations, or the requested fields of each",
+)
+async def read_destinations(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    country: Optional[str] = None,
+    season: Optional[Season] = None,
+    min_safety_rating: Optional[float] = Query(None, ge=0, le=10),
+    min_latitude: Optional[float] = Query(None, ge=-90, le=90),
+    max_latitude: Optional[float] = Query(None, ge=-90, le=90),
+    min_longitude: Optional[float] = Query(None, ge=-180, le=180),
+    max_longitude: Optional[float] = Query(None, ge=-180, le=180),
+    fields: Optional[str] = Query(None, description="Comma-separated columns"),
+):
+    """One page of destinations ordered by id; the next page's cursor is
+    returned in the ``X-Next-Cursor`` header."""
     try:
-        destinations = supabase_client.table("destinations").select("*").execute()
-        return [Destination(**destination) for destination in destinations.data]
+        cache_key = destination_cache.page_key(
+            str(sorted(request.query_params.multi_items()))
+        )
+        page = destination_cache.pages.get(cache_key)
+        if page is not None:
+            return page_response(
+                request, page["body"], page["next_cursor"], page["etag"]
+            )
+
+        columns = parse_fields(fields, Destination)
+        query = (
+            supabase_client.table("destinations")
+            .select(",".join(columns) if columns else "*")
+            .order("id")
+            .limit(limit + 1)
+        )
+        if cursor:
+            query = seek_after(query, decode_cursor(cursor, ["id"]))
+        if country:
+            query = query.eq("country", country)
+        if season:
+            query = query.contains("best_seasons", [season.value])
+        if min_safety_rating is not None:
+            query = query.gte("safety_rating", min_safety_rating)
+        if min_latitude is not None:
+            query = query.gte("latitude", min_latitude)
+        if max_latitude is not None:
+            query = query.lte("latitude", max_latitude)
+        if (
+            min_longitude is not None
+            and max_longitude is not None
+            and min_longitude > max_longitude
+        ):
+            # Box crossing the antimeridian
+            query = query.or_(
+                f"longitude.gte.{min_longitude},longitude.lte.{max_longitude}"
+            )
+        else:
+            if min_longitude is not None:
+                query = query.gte("longitude", min_longitude)
+            if max_longitude is not None:
+                query = query.lte("longitude", max_longitude)
+
+        destinations = await supabase_client_manager.execute(query)
+        rows, next_cursor = split_page(destinations.data, limit, ["id"])
+        if columns:
+            body = to_json(rows)
+        else:
+            body = rows_to_json(destination_list_adapter, rows)
+        page = {"body": body, "etag": compute_etag(body), "next_cursor": next_cursor}
+        destination_cache.pages.set(cache_key, page)
+        return page_response(request, body, next_cursor, page["etag"])
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/cache/stats")
+async def read_destination_cache_stats(request: Request):
+    user_id = request.headers.get("user-id")
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    return destination_cache.stats()
+
+
+@router.get("/nearby", response_model=List[NearbyDestination])
+async def read_nearby_destinations(
+    latitude: float = Query(..., ge=-90, le=90),
+    longitude: float = Query(..., ge=-180, le=180),
+    radius_km: Optional[float] = Query(None, gt=0),
+    limit: int = Query(10, ge=1, le=100),
+):
+    """Destinations within ``radius_km`` of the point, or the nearest ``limit``."""
+    try:
+        index = await get_destination_index()
+        if radius_km is None:
+            return ModelResponse(to_nearby(index.nearest(latitude, longitude, limit)))
+        return ModelResponse(
+            to_nearby(index.within(latitude, longitude, radius_km, limit))
+        )
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/{destination_id}/neighbors", response_model=List[NearbyDestination])
+async def read_destination_neighbors(
+    destination_id: str,
+    radius_km: Optional[float] = Query(None, gt=0),
+    limit: int = Query(10, ge=1, le=100),
+):
+    try:
+        index = await get_destination_index()
+        origin = index.get(destination_id)
+        if origin is None:
+            raise HTTPException(status_code=404, detail="Destination not found")
+        latitude, longitude = origin["latitude"], origin["longitude"]
+        if radius_km is None:
+            results = index.nearest(latitude, longitude, limit, exclude=destination_id)
+        else:
+            results = index.within(
+                latitude, longitude, radius_km, limit, exclude=destination_id
+            )
+        return ModelResponse(to_nearby(results))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.get("/{destination_id}", response_model=Destination)
-async def read_destination(destination_id: str):
+async def read_destination(destination_id: str, request: Request):
     try:
-        destination = (
-            supabase_client.table("destinations")
+        row = destination_cache.get(destination_id)
+        if row is None:
+            destination = await supabase_client_manager.execute(
+                supabase_client.table("destinations")
+                .select("*")
+                .eq("id", destination_id)
+            )
+            if not destination.data:
+                raise HTTPException(status_code=404, detail="Destination not found")
+            row = destination.data[0]
+            destination_cache.put(row)
+        body = Destination(**row).model_dump_json().encode()
+        return conditional_response(request, body)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def item_failed(index: int, error: str, destination_id: Optional[str] = None):
+    return BulkItemResult(
+        index=index, status=BulkItemStatus.FAILED, id=destination_id, error=error
+    )
+
+
+def bulk_result(results: List[BulkItemResult]) -> BulkResult:
+    failed = sum(result.status == BulkItemStatus.FAILED for result in results)
+    return BulkResult(succeeded=len(results) - failed, failed=failed, results=results)
+
+
+async def sync_written(rows: List[dict]):
+    # Same bookkeeping as the single-row endpoints, with one embedding batch
+    destinations = [Destination(**row) for row in rows]
+    for destination, row in zip(destinations, rows):
+        destination_index.upsert(index_entry(destination))
+        destination_cache.invalidate(destination.id, row)
+    try:
+        await anyio.to_thread.run_sync(
+            vector_store_service.add_destinations, destinations
+        )
+    except Exception as e:
+        logger.error(f"Failed to embed {len(destinations)} bulk destinations: {e}")
+
+
+def record_writes(
+    results: List[Optional[BulkItemResult]],
+    positions: List[int],
+    written: List[Union[dict, Exception]],
+    status: BulkItemStatus,
+) -> List[dict]:
+    rows = []
+    for index, outcome in zip(positions, written):
+        if isinstance(outcome, Exception):
+            results[index] = item_failed(index, str(outcome))
+        else:
+            results[index] = BulkItemResult(
+                index=index, status=status, id=outcome["id"]
+            )
+            rows.append(outcome)
+    return rows
+
+
+@router.post("/bulk", response_model=BulkResult)
+async def create_destinations_bulk(request: Request):
+    """Creates destinations from a JSON array or an NDJSON stream of
+    ``DestinationCreate`` items, with one result per item."""
+    try:
+        user_id = request.headers.get("user-id")
+        if not user_id:
+            raise HTTPException(status_code=401, detail="Unauthorized")
+
+        items = await read_bulk_items(request)
+        results: List[Optional[BulkItemResult]] = [None] * len(items)
+        rows, positions = [], []
+        for index, item in enumerate(items):
+            if isinstance(item, InvalidItem):
+                results[index] = item_failed(index, str(item))
+                continue
+            try:
+                destination = DestinationCreate.model_validate(item)
+            except ValidationError as e:
+                results[index] = item_failed(index, describe_validation_error(e))
+                continue
+            rows.append(destination.model_dump(mode="json"))
+            positions.append(index)
+
+        written = await write_in_chunks(
+            rows,
+            lambda chunk: supabase_client.table("destinations").insert(chunk),
+            # Ids are assigned on insert, so rows are matched back by name
+            key=lambda row: (row["name"], row["country"]),
+        )
+        created = record_writes(results, positions, written, BulkItemStatus.CREATED)
+        await sync_written(created)
+        return ModelResponse(bulk_result(results))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.patch("/bulk", response_model=BulkResult)
+async def update_destinations_bulk(request: Request):
+    """Applies ``DestinationPatch`` items (partial updates keyed by ``id``).
+
+    Current rows are fetched with IN queries, patched and re-validated, then
+    written back with chunked multi-row upserts.
+    """
+    try:
+        user_id = request.headers.get("user-id")
+        if not user_id:
+            raise HTTPException(status_code=401, detail="Unauthorized")
+
+        items = await read_bulk_items(request)
+        results: List[Optional[BulkItemResult]] = [None] * len(items)
+        patches = {}
+        for index, item in enumerate(items):
+            if isinstance(item, InvalidItem):
+                results[index] = item_failed(index, str(item))
+                continue
+            try:
+                patch = DestinationPatch.model_validate(item)
+            except ValidationError as e:
+                results[index] = item_failed(index, describe_validation_error(e))
+                continue
+            if patch.id in patches:
+                results[index] = item_failed(index, "Duplicate id", patch.id)
+                continue
+            patches[patch.id] = (
+                index,
+                patch.model_dump(mode="json", exclude_unset=True),
+            )
+
+        current = await fetch_by_ids(
+            lambda ids: supabase_client.table("destinations")
             .select("*")
-            .eq("id", destination_id)
-            .execute()
+            .in_("id", ids),
+            list(patches),
         )
-        if not destination.data:
-            raise HTTPException(status_code=404, detail="Destination not found")
-        return Destination(**destination.data[0])
+        rows, positions = [], []
+        for destination_id, (index, patch) in patches.items():
+            if destination_id not in current:
+                results[index] = item_failed(
+                    index, "Destination not found", destination_id
+                )
+                continue
+            merged = {**current[destination_id], **patch}
+            try:
+                DestinationCreate.model_validate(merged)
+            except ValidationError as e:
+                results[index] = item_failed(
+                    index, describe_validation_error(e), destination_id
+                )
+                continue
+            rows.append(merged)
+            positions.append(index)
+
+        written = await write_in_chunks(
+            rows,
+            lambda chunk: supabase_client.table("destinations").upsert(
+                chunk, on_conflict="id"
+            ),
+        )
+        updated = record_writes(results, positions, written, BulkItemStatus.UPDATED)
+        await sync_written(updated)
+        return ModelResponse(bulk_result(results))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -61,15 +413,17 @@ async def update_destination(
         if not user_id:
             raise HTTPException(status_code=401, detail="Unauthorized")
 
-        updated_destination = (
+        updated_destination = await supabase_client_manager.execute(
             supabase_client.table("destinations")
             .update(destination_update.model_dump(exclude_unset=True))
             .eq("id", destination_id)
-            .execute()
         )
         if not updated_destination.data:
             raise HTTPException(status_code=404, detail="Destination not found")
-        return Destination(**updated_destination.data[0])
+        destination = Destination(**updated_destination.data[0])
+        destination_index.upsert(index_entry(destination))
+        destination_cache.invalidate(destination_id, updated_destination.data[0])
+        return ModelResponse(destination)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -81,13 +435,14 @@ async def delete_destination(destination_id: str, request: Request):
         if not user_id:
             raise HTTPException(status_code=401, detail="Unauthorized")
 
-        deleted = (
+        deleted = await supabase_client_manager.execute(
             supabase_client.table("destinations")
             .delete()
             .eq("id", destination_id)
-            .execute()
         )
         if not deleted.data:
             raise HTTPException(status_code=404, detail="Destination not found")
+        destination_index.remove(destination_id)
+        destination_cache.invalidate(destination_id)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
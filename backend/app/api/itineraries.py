@@ -1,11 +1,47 @@
-from typing import List
+import json
+from datetime import datetime
+from functools import partial
+from typing import List, Optional
 
-from app.models.itinerary import Itinerary, ItineraryCreate, ItineraryUpdate
-from app.models.user import UserPreferences
+import anyio
+from app.api.conditional import conditional_response
+from app.api.pagination import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    decode_cursor,
+    page_response,
+    seek_after,
+    split_page,
+)
+from app.api.serialization import (
+    ModelResponse,
+    itinerary_summary_list_adapter,
+    rows_to_json,
+)
+from app.models.itinerary import (
+    Itinerary,
+    ItineraryCreate,
+    ItinerarySummary,
+    ItineraryTheme,
+    ItineraryUpdate,
+    RouteOptimizationReport,
+    TripStatus,
+)
+from app.models.job import GenerationJob, ItineraryGenerationRequest
+from app.services.destination_cache import destination_cache
+from app.services.job_queue import (
+    JobQueueFullError,
+    ProgressReporter,
+    UserJobLimitError,
+    job_queue,
+)
 from app.services.llm_service import llm_service
+from app.services.route_optimizer import route_optimizer
 from app.services.supabase_client import supabase_client_manager
-from fastapi import APIRouter, HTTPException, Request
-from geopy.distance import geodesic
+from app.utils.geo import apply_route_metrics
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import iterate_in_threadpool
 
 router = APIRouter()
 supabase_client = supabase_client_manager.get_client()
@@ -18,30 +54,81 @@ async def create_itinerary(itinerary: ItineraryCreate, request: Request):
         if not user_id:
             raise HTTPException(status_code=401, detail="Unauthorized")
 
-        new_itinerary = (
-            supabase_client.table("itineraries")
-            .insert({**itinerary.model_dump(), "user_id": user_id})
-            .execute()
+        new_itinerary = await supabase_client_manager.execute(
+            supabase_client.table("itineraries").insert(
+                {**itinerary.model_dump(), "user_id": user_id}
+            )
         )
-        return Itinerary(**new_itinerary.data[0])
+        return ModelResponse(Itinerary(**new_itinerary.data[0]))
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
-@router.get("/", response_model=List[Itinerary])
-async def read_itineraries(request: Request):
+SUMMARY_COLUMNS = (
+    "id",
+    "title",
+    "start_date",
+    "end_date",
+    "status",
+    "theme",
+    "total_cost",
+    "created_at",
+    "destinations",
+)
+SUMMARY_ORDER = ("created_at", "id")
+
+
+def summary_row(row: dict) -> dict:
+    summary = {key: value for key, value in row.items() if key != "destinations"}
+    summary["stop_count"] = len(row["destinations"] or [])
+    return summary
+
+
+@router.get("/", response_model=List[ItinerarySummary])
+async def read_itineraries(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    status: Optional[TripStatus] = None,
+    theme: Optional[ItineraryTheme] = None,
+    start_after: Optional[datetime] = None,
+    start_before: Optional[datetime] = None,
+):
+    """The user's itineraries as summaries, newest first. The next page's
+    cursor is returned in the ``X-Next-Cursor`` header; the full itinerary
+    comes from ``GET /itineraries/{id}``."""
     try:
         user_id = request.headers.get("user-id")
         if not user_id:
             raise HTTPException(status_code=401, detail="Unauthorized")
 
-        itineraries = (
+        query = (
             supabase_client.table("itineraries")
-            .select("*")
+            .select(",".join(SUMMARY_COLUMNS))
             .eq("user_id", user_id)
-            .execute()
+            .order("created_at", desc=True)
+            .order("id", desc=True)
+            .limit(limit + 1)
         )
-        return [Itinerary(**itinerary) for itinerary in itineraries.data]
+        if cursor:
+            query = seek_after(
+                query, decode_cursor(cursor, SUMMARY_ORDER), descending=True
+            )
+        if status:
+            query = query.eq("status", status.value)
+        if theme:
+            query = query.eq("theme", theme.value)
+        if start_after:
+            query = query.gte("start_date", start_after.isoformat())
+        if start_before:
+            query = query.lt("start_date", start_before.isoformat())
+
+        itineraries = await supabase_client_manager.execute(query)
+        rows, next_cursor = split_page(itineraries.data, limit, SUMMARY_ORDER)
+        body = rows_to_json(
+            itinerary_summary_list_adapter, (summary_row(row) for row in rows)
+        )
+        return page_response(request, body, next_cursor)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -53,16 +140,16 @@ async def read_itinerary(itinerary_id: str, request: Request):
         if not user_id:
             raise HTTPException(status_code=401, detail="Unauthorized")
 
-        itinerary = (
+        itinerary = await supabase_client_manager.execute(
             supabase_client.table("itineraries")
             .select("*")
             .eq("id", itinerary_id)
             .eq("user_id", user_id)
-            .execute()
         )
         if not itinerary.data:
             raise HTTPException(status_code=404, detail="Itinerary not found")
-        return Itinerary(**itinerary.data[0])
+        body = Itinerary(**itinerary.data[0]).model_dump_json().encode()
+        return conditional_response(request, body)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -76,16 +163,15 @@ async def update_itinerary(
         if not user_id:
             raise HTTPException(status_code=401, detail="Unauthorized")
 
-        updated_itinerary = (
+        updated_itinerary = await supabase_client_manager.execute(
             supabase_client.table("itineraries")
             .update(itinerary_update.model_dump(exclude_unset=True))
             .eq("id", itinerary_id)
             .eq("user_id", user_id)
-            .execute()
         )
         if not updated_itinerary.data:
             raise HTTPException(status_code=404, detail="Itinerary not found")
-        return Itinerary(**updated_itinerary.data[0])
+        return ModelResponse(Itinerary(**updated_itinerary.data[0]))
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -97,12 +183,11 @@ async def delete_itinerary(itinerary_id: str, request: Request):
         if not user_id:
             raise HTTPException(status_code=401, detail="Unauthorized")
 
-        deleted = (
+        deleted = await supabase_client_manager.execute(
             supabase_client.table("itineraries")
             .delete()
             .eq("id", itinerary_id)
             .eq("user_id", user_id)
-            .execute()
         )
         if not deleted.data:
             raise HTTPException(status_code=404, detail="Itinerary not found")
@@ -110,78 +195,191 @@ async def delete_itinerary(itinerary_id: str, request: Request):
         raise HTTPException(status_code=400, detail=str(e))
 
 
-router = APIRouter()
-supabase_client = supabase_client_manager.get_client()
+async def fetch_destination_details(destinations: List[str]) -> List[dict]:
+    # One IN query for every name the cache doesn't already hold
+    found, missing = destination_cache.lookup_names(destinations)
+    if missing:
+        details = await supabase_client_manager.execute(
+            supabase_client.table("destinations").select("*").in_("name", missing)
+        )
+        for row in details.data:
+            destination_cache.put(row)
+            found.setdefault(row["name"], row)
+
+    for dest in destinations:
+        if dest not in found:
+            raise HTTPException(
+                status_code=404, detail=f"Destination not found: {dest}"
+            )
+    return [found[dest] for dest in destinations]
+
+
+async def save_generated_itinerary(
+    itinerary: Itinerary, user_id: str, destination_details: List[dict]
+) -> Itinerary:
+    # Leg distances, travel times and costs, all legs in one vectorized pass
+    apply_route_metrics([itinerary], destination_details)
+
+    # Save the itinerary
+    new_itinerary = await supabase_client_manager.execute(
+        supabase_client.table("itineraries").insert(
+            {**itinerary.model_dump(), "user_id": user_id}
+        )
+    )
+    return Itinerary(**new_itinerary.data[0])
+
+
+async def optimize_route(
+    itinerary: Itinerary,
+    destination_details: List[dict],
+    generation_request: ItineraryGenerationRequest,
+) -> Optional[RouteOptimizationReport]:
+    # 2-opt/Or-opt is CPU-bound, so it runs off the event loop
+    return await anyio.to_thread.run_sync(
+        partial(
+            route_optimizer.optimize_itinerary,
+            itinerary,
+            destination_details,
+            max_travel_hours=generation_request.user_preferences.max_travel_time,
+            start=generation_request.start_destination,
+            end=generation_request.end_destination,
+        )
+    )
+
+
+async def run_generation_job(
+    destination_details: List[dict], job: GenerationJob, report: ProgressReporter
+) -> Itinerary:
+    generation_request = job.request
+
+    # Generate itinerary using LLM
+    await report("generating", 0.1)
+    itinerary = await anyio.to_thread.run_sync(
+        llm_service.generate_itinerary,
+        generation_request.user_preferences,
+        generation_request.destinations,
+        generation_request.duration,
+        destination_details,
+    )
+
+    await report("optimizing_route", 0.8)
+    route_report = await optimize_route(
+        itinerary, destination_details, generation_request
+    )
+    await report("saving", 0.9, route_report=route_report)
+    return await save_generated_itinerary(itinerary, job.user_id, destination_details)
 
 
-def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-    return geodesic((lat1, lon1), (lat2, lon2)).kilometers
+def format_sse(event: str, data: str) -> str:
+    return f"event: {event}\ndata: {data}\n\n"
 
 
-def estimate_travel_cost(
-    distance: float, base_cost: float, cost_per_km: float
-) -> float:
-    return base_cost + (distance * cost_per_km)
+def get_user_job(job_id: str, user_id: str) -> GenerationJob:
+    job = job_queue.get(job_id)
+    if job is None or job.user_id != user_id:
+        raise HTTPException(status_code=404, detail="Generation job not found")
+    return job
 
 
-@router.post("/generate", response_model=Itinerary)
+@router.post("/generate", response_model=GenerationJob, status_code=202)
 async def generate_itinerary(
-    user_preferences: UserPreferences,
-    destinations: List[str],
-    duration: int,
-    request: Request,
+    generation_request: ItineraryGenerationRequest, request: Request
 ):
-    try:
-        user_id = request.headers.get("user-id")
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Unauthorized")
+    user_id = request.headers.get("user-id")
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Unauthorized")
 
-        # Fetch destination details
-        destination_details = []
-        for dest in destinations:
-            details = (
-                supabase_client.table("destinations")
-                .select("*")
-                .eq("name", dest)
-                .execute()
-            )
-            if details.data:
-                destination_details.append(details.data[0])
-            else:
-                raise HTTPException(
-                    status_code=404, detail=f"Destination not found: {dest}"
-                )
-
-        # Generate itinerary using LLM
-        itinerary = llm_service.generate_itinerary(
-            user_preferences, destination_details, duration
+    try:
+        # Resolve destinations up front so unknown names still fail fast with 404
+        destination_details = await fetch_destination_details(
+            generation_request.destinations
         )
+        job = await job_queue.submit(
+            user_id,
+            generation_request,
+            partial(run_generation_job, destination_details),
+        )
+        return ModelResponse(job, status_code=202)
+    except HTTPException:
+        raise
+    except (JobQueueFullError, UserJobLimitError) as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-        # Calculate distances and costs
-        total_distance = 0
-        total_cost = 0
-        for i in range(len(itinerary.destinations) - 1):
-            d1 = itinerary.destinations[i]
-            d2 = itinerary.destinations[i + 1]
-            distance = calculate_distance(
-                d1.latitude, d1.longitude, d2.latitude, d2.longitude
-            )
-            cost = estimate_travel_cost(distance, d2.base_travel_cost, d2.cost_per_km)
-            total_distance += distance
-            total_cost += cost
-            d2.travel_time_from_previous = (
-                distance / 100
-            )  # Assuming average speed of 100 km/h
-            d2.travel_cost_from_previous = cost
-
-        itinerary.total_cost = total_cost
-
-        # Save the itinerary
-        new_itinerary = (
-            supabase_client.table("itineraries")
-            .insert({**itinerary.model_dump(), "user_id": user_id})
-            .execute()
+
+@router.get("/jobs/{job_id}", response_model=GenerationJob)
+async def read_generation_job(job_id: str, request: Request):
+    user_id = request.headers.get("user-id")
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    return ModelResponse(get_user_job(job_id, user_id))
+
+
+@router.get("/jobs/{job_id}/events")
+async def stream_generation_job(job_id: str, request: Request):
+    user_id = request.headers.get("user-id")
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    get_user_job(job_id, user_id)
+
+    async def events():
+        async for job in job_queue.watch(job_id):
+            yield format_sse(job.status.value, job.model_dump_json())
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@router.get("/llm/stats")
+async def read_llm_stats(request: Request):
+    """Calls, tokens, time and invalid outputs per model since startup."""
+    user_id = request.headers.get("user-id")
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    return llm_service.router.stats()
+
+
+@router.post("/generate/stream")
+async def stream_itinerary(
+    generation_request: ItineraryGenerationRequest, request: Request
+):
+    user_id = request.headers.get("user-id")
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+    try:
+        destination_details = await fetch_destination_details(
+            generation_request.destinations
         )
-        return Itinerary(**new_itinerary.data[0])
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+
+    async def events():
+        stream = llm_service.stream_itinerary(
+            generation_request.user_preferences,
+            generation_request.destinations,
+            generation_request.duration,
+            destination_details,
+        )
+        try:
+            async for event in iterate_in_threadpool(stream):
+                if event.event == "token":
+                    yield format_sse("token", json.dumps(event.data))
+                elif event.event == "destination":
+                    yield format_sse("destination", event.data.model_dump_json())
+                else:
+                    route_report = await optimize_route(
+                        event.data, destination_details, generation_request
+                    )
+                    if route_report is not None:
+                        yield format_sse("route", route_report.model_dump_json())
+                    itinerary = await save_generated_itinerary(
+                        event.data, user_id, destination_details
+                    )
+                    yield format_sse("itinerary", itinerary.model_dump_json())
+        except Exception as e:
+            yield format_sse("error", json.dumps({"detail": str(e)}))
+
+    return StreamingResponse(events(), media_type="text/event-stream")
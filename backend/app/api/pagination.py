@@ -0,0 +1,83 @@
+import base64
+import json
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.api.conditional import conditional_response
+from fastapi import Request, Response
+from pydantic import BaseModel
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(values: Dict[str, Any]) -> str:
+    """Opaque keyset cursor holding the sort key of the last row served."""
+    raw = json.dumps(values, separators=(",", ":"), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, keys: Sequence[str]) -> Dict[str, Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except ValueError as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(values, dict) or set(values) != set(keys):
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def seek_after(query: Any, values: Dict[str, Any], descending: bool = False) -> Any:
+    """Keyset filter for rows after ``values`` in ``ORDER BY`` key order."""
+    operator = "lt" if descending else "gt"
+    keys = list(values)
+    if len(keys) == 1:
+        return getattr(query, operator)(keys[0], values[keys[0]])
+
+    # (a, b) > (x, y)  <=>  a > x OR (a = x AND b > y)
+    def quoted(key):
+        return '"{}"'.format(str(values[key]).replace('"', '\\"'))
+
+    branches = []
+    for i, key in enumerate(keys):
+        terms = [f"{prior}.eq.{quoted(prior)}" for prior in keys[:i]]
+        terms.append(f"{key}.{operator}.{quoted(key)}")
+        branches.append(terms[0] if len(terms) == 1 else f"and({','.join(terms)})")
+    return query.or_(",".join(branches))
+
+
+def parse_fields(
+    fields: Optional[str], model: type[BaseModel], required: Sequence[str] = ("id",)
+) -> Optional[List[str]]:
+    """Columns named in a ``fields=a,b`` projection, or None for all of them.
+
+    The ``required`` columns (the cursor key) are always selected.
+    """
+    if not fields:
+        return None
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in names if name not in model.model_fields]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return list(dict.fromkeys([*required, *names]))
+
+
+def split_page(
+    rows: List[Dict[str, Any]], limit: int, keys: Sequence[str]
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Trims the look-ahead row fetched with ``limit + 1`` into a next cursor."""
+    if len(rows) <= limit:
+        return rows, None
+    page = rows[:limit]
+    return page, encode_cursor({key: page[-1][key] for key in keys})
+
+
+def page_response(
+    request: Request,
+    body: bytes,
+    next_cursor: Optional[str],
+    etag: Optional[str] = None,
+) -> Response:
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else {}
+    return conditional_response(request, body, etag, headers)
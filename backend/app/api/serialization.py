@@ -0,0 +1,27 @@
+from typing import Any, Dict, Iterable, List
+
+from app.models.destination import Destination
+from app.models.itinerary import ItinerarySummary
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+from pydantic_core import to_json
+
+destination_list_adapter = TypeAdapter(List[Destination])
+itinerary_summary_list_adapter = TypeAdapter(List[ItinerarySummary])
+
+
+class ModelResponse(JSONResponse):
+    """JSON response rendered by pydantic-core straight to bytes.
+
+    Returning it from a handler bypasses FastAPI's ``response_model`` pass,
+    so models that are already validated are not validated a second time;
+    ``response_model`` then only documents the schema.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return to_json(content)
+
+
+def rows_to_json(adapter: TypeAdapter, rows: Iterable[Dict[str, Any]]) -> bytes:
+    """Validates DB rows once, as a whole list, and serializes them."""
+    return adapter.dump_json(adapter.validate_python(list(rows)))
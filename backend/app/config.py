@@ -1,3 +1,5 @@
+from typing import Optional
+
 from pydantic import ConfigDict
 from pydantic_settings import BaseSettings
 
@@ -8,6 +10,46 @@ class Settings(BaseSettings):
     SECRET_KEY: str
     SUPABASE_URL: str
     SUPABASE_KEY: str
+    SUPABASE_MAX_CONCURRENCY: int = 20  # Matches httpx's default keep-alive pool
+    GENERATION_WORKERS: int = 2  # Parallel requests the Ollama server can serve
+    GENERATION_QUEUE_SIZE: int = 100
+    GENERATION_MAX_JOBS_PER_USER: int = 3
+    GENERATION_JOB_RETENTION: int = 1000
+    LLM_CACHE_MAX_ENTRIES: int = 512
+    LLM_CACHE_TTL_SECONDS: float = 6 * 60 * 60
+    LLM_CACHE_SIMILARITY: Optional[float] = 0.97  # None disables semantic lookup
+    PROMPT_VERSIONS: dict[str, str] = {}  # e.g. {"itinerary": "v1"}
+    # Model tiers, smallest first; a task falls back to the next larger tier
+    LLM_MODELS: dict[str, str] = {"small": "llama3.2:3b", "large": "llama3.1:8b"}
+    LLM_TASK_TIERS: dict[str, str] = {
+        "destination_info": "small",
+        "itinerary": "large",
+        "itinerary_skeleton": "large",
+        "itinerary_stop": "small",
+    }
+    LLM_SCHEMA_FORMAT: bool = True  # Constrain output to the JSON schema (Ollama 0.5+)
+    LLM_CONTEXT_TOKEN_BUDGET: int = 1536  # Per retrieved-context section of a prompt
+    # tokenizer.json path or hub name for token counts; None estimates them
+    LLM_TOKENIZER: Optional[str] = None
+    # Longer trips are planned as a skeleton first, then filled in per stop
+    LLM_HIERARCHICAL_MIN_DAYS: int = 8
+    # Sampling temperature of seeded calls, so a seed reproduces its output
+    LLM_SEED_TEMPERATURE: float = 0.8
+    GITHUB_URL: str = "https://github.com/pupperemeritus/fictional-travelevator"
+    EMAIL: str = ""  # Contact address sent in the scraper User-Agent
+    HTTP_CACHE_DIR: str = "./http_cache"
+    WIKI_PAGE_STORE: str = "./wiki_pages.sqlite3"
+    VECTOR_STORE_BATCH_SIZE: int = 64  # Documents per embedding request and upsert
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 200_000
+    EMBEDDING_CACHE_MEMORY_ENTRIES: int = 10_000
+    SPATIAL_INDEX_CELL_DEGREES: float = 1.0
+    DISTANCE_MATRIX_CACHE_SIZE: int = 128
+    DESTINATION_CACHE_MAX_ENTRIES: int = 5000
+    DESTINATION_CACHE_TTL_SECONDS: float = 5 * 60
+    DESTINATION_PAGE_CACHE_MAX_ENTRIES: int = 1000
+    DESTINATION_BULK_CHUNK_SIZE: int = 500  # Rows per multi-row insert/upsert
+    DESTINATION_BULK_MAX_ITEMS: int = 10_000
+    COMPRESSION_MINIMUM_SIZE: int = 1024  # Bytes; smaller bodies are sent as is
     CORS_ORIGINS: list[str] = ["http://localhost:3000"]  # Add more as needed
 
     model_config = ConfigDict(env_file=".env")
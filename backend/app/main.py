@@ -1,9 +1,21 @@
+from contextlib import asynccontextmanager
+
 from app.api import destinations, itineraries, users
 from app.config import settings
+from app.middleware import CompressionMiddleware
+from app.services.job_queue import job_queue
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-app = FastAPI(title="Travel Itinerary API", version="1.0.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await job_queue.start()
+    yield
+    await job_queue.stop()
+
+
+app = FastAPI(title="Travel Itinerary API", version="1.0.0", lifespan=lifespan)
 
 # Configure CORS
 app.add_middleware(
@@ -12,8 +24,13 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Cross-origin clients page lists with the cursor header
+    expose_headers=["X-Next-Cursor"],
 )
 
+# Compress large JSON responses (brotli when installed, else gzip)
+app.add_middleware(CompressionMiddleware)
+
 # Include routers
 app.include_router(users.router, prefix="/users", tags=["Users"])
 app.include_router(itineraries.router, prefix="/itineraries", tags=["Itineraries"])
@@ -1,4 +1,5 @@
 from .activity import *
 from .destination import *
 from .itinerary import *
+from .job import *
 from .user import *
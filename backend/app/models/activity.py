@@ -2,7 +2,7 @@ from datetime import datetime
 from enum import Enum
 from typing import List, Optional
 
-from pydantic import BaseModel, ConfigDict, Field, field_validator
+from pydantic import BaseModel, ConfigDict, Field, ValidationInfo, field_validator
 
 
 class TransportationType(str, Enum):
@@ -104,8 +104,8 @@ class ActivityBase(BaseModel):
     cancellation_policy: Optional[str] = Field(None, max_length=500)
 
     @field_validator("end_time")
-    def end_time_after_start_time(cls, v, values):
-        if "start_time" in values and v <= values["start_time"]:
+    def end_time_after_start_time(cls, v, info: ValidationInfo):
+        if "start_time" in info.data and v <= info.data["start_time"]:
             raise ValueError("end_time must be after start_time")
         return v
 
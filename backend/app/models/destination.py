@@ -54,6 +54,10 @@ class DestinationUpdate(BaseModel):
     popular_events: Optional[List[str]] = None
 
 
+class DestinationPatch(DestinationUpdate):
+    id: str
+
+
 class DestinationInDB(DestinationBase):
     id: str
     created_at: datetime
@@ -66,6 +70,34 @@ class Destination(DestinationInDB):
     pass
 
 
+class NearbyDestination(BaseModel):
+    id: str
+    name: str
+    country: str
+    latitude: float
+    longitude: float
+    distance_km: float = Field(..., description="Great-circle distance in km")
+
+
+class BulkItemStatus(str, Enum):
+    CREATED = "created"
+    UPDATED = "updated"
+    FAILED = "failed"
+
+
+class BulkItemResult(BaseModel):
+    index: int = Field(..., description="Position of the item in the request")
+    status: BulkItemStatus
+    id: Optional[str] = None
+    error: Optional[str] = None
+
+
+class BulkResult(BaseModel):
+    succeeded: int
+    failed: int
+    results: List[BulkItemResult]
+
+
 class PlaceType(str, Enum):
     CITY = "city"
     STATE = "state"
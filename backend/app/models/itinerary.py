@@ -1,7 +1,7 @@
 from datetime import datetime
 from enum import Enum
 from typing import List, Optional
-from pydantic import BaseModel, ConfigDict, Field, field_validator
+from pydantic import BaseModel, ConfigDict, Field, ValidationInfo, field_validator
 
 
 class TripStatus(str, Enum):
@@ -41,6 +41,43 @@ class DestinationInItinerary(BaseModel):
     )
 
 
+class StopPlan(BaseModel):
+    """A stop as fixed by the skeleton pass of hierarchical generation."""
+
+    destination_id: str
+    arrival_time: datetime
+    departure_time: datetime
+
+
+class StopDetails(BaseModel):
+    travel_time_from_previous: Optional[float] = Field(
+        None, description="Travel time in hours from the previous destination"
+    )
+    travel_cost_from_previous: Optional[float] = Field(
+        None, description="Travel cost in USD from the previous destination"
+    )
+    accommodation_id: Optional[str] = Field(
+        None, description="ID of the accommodation at this destination"
+    )
+
+
+class ItinerarySkeleton(BaseModel):
+    """Trip-level fields and stop order, before per-stop details."""
+
+    title: str = Field(..., min_length=1, max_length=100)
+    start_date: datetime
+    end_date: datetime
+    total_budget: float = Field(..., ge=0)
+    destinations: List[StopPlan]
+    theme: ItineraryTheme = Field(..., description="Theme of the itinerary")
+    flexibility: FlexibilityLevel = Field(
+        ..., description="How flexible the itinerary is"
+    )
+    sustainability_score: float = Field(
+        ..., ge=0, le=10, description="Eco-friendliness rating out of 10"
+    )
+
+
 class ItineraryBase(BaseModel):
     title: str = Field(..., min_length=1, max_length=100)
     start_date: datetime
@@ -58,8 +95,8 @@ class ItineraryBase(BaseModel):
     )
 
     @field_validator("end_date")
-    def end_date_after_start_date(cls, v, values):
-        if "start_date" in values and v <= values["start_date"]:
+    def end_date_after_start_date(cls, v, info: ValidationInfo):
+        if "start_date" in info.data and v <= info.data["start_date"]:
             raise ValueError("end_date must be after start_date")
         return v
 
@@ -100,6 +137,36 @@ class Itinerary(ItineraryInDB):
     pass
 
 
+class ItinerarySummary(BaseModel):
+    """Lightweight list-view projection of an itinerary."""
+
+    id: str
+    title: str
+    start_date: datetime
+    end_date: datetime
+    status: TripStatus
+    theme: ItineraryTheme
+    total_cost: float = 0
+    stop_count: int = Field(..., description="Number of destinations in the trip")
+    created_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class RouteOptimizationReport(BaseModel):
+    original_order: List[str]
+    optimized_order: List[str]
+    original_distance_km: float
+    optimized_distance_km: float
+    original_cost: float
+    optimized_cost: float
+    longest_leg_hours: float
+    within_travel_time_limit: bool = Field(
+        ..., description="Whether every leg respects the user's max_travel_time"
+    )
+    elapsed_ms: float
+
+
 class ItineraryFeedback(BaseModel):
     itinerary_id: str
     user_id: str
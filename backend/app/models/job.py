@@ -0,0 +1,46 @@
+from datetime import datetime
+from enum import Enum
+from typing import List, Optional
+
+from app.models.itinerary import Itinerary, RouteOptimizationReport
+from app.models.user import UserPreferences
+from pydantic import BaseModel, ConfigDict, Field
+
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+class ItineraryGenerationRequest(BaseModel):
+    user_preferences: UserPreferences
+    destinations: List[str] = Field(..., min_length=1)
+    duration: int = Field(..., ge=1, description="Trip length in days")
+    start_destination: Optional[str] = Field(
+        None, description="Destination to keep as the first stop"
+    )
+    end_destination: Optional[str] = Field(
+        None, description="Destination to keep as the last stop"
+    )
+
+
+class GenerationJob(BaseModel):
+    id: str
+    user_id: str
+    request: ItineraryGenerationRequest
+    status: JobStatus = JobStatus.QUEUED
+    stage: str = Field("queued", description="Current step of the generation")
+    progress: float = Field(0, ge=0, le=1)
+    result: Optional[Itinerary] = None
+    route_report: Optional[RouteOptimizationReport] = None
+    error: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+    model_config = ConfigDict(from_attributes=True)
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in (JobStatus.SUCCEEDED, JobStatus.FAILED)
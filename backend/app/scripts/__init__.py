@@ -1,4 +1,7 @@
 from .fetcher import *
+from .http_cache import *
+from .ingestion import *
 from .itinerary_generator import *
 from .main import *
 from .pipeline import *
+from .wiki_batch import *
@@ -1,27 +1,40 @@
+import asyncio
 import logging
-import re
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
 import httpx
-import wikipediaapi
 from app.config import settings
+from app.scripts.http_cache import (
+    AsyncCachingTransport,
+    CachingTransport,
+    HTTPResponseCache,
+)
+from app.scripts.wiki_batch import (
+    MAX_TITLES_PER_QUERY,
+    WikipediaBatchFetcher,
+    WikiPageStore,
+    chunked,
+)
 from tenacity import retry, stop_after_attempt, wait_exponential
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+USER_AGENT = f"FictionalTravelevator/1.0 ({settings.GITHUB_URL}; {settings.EMAIL})"
+
 
 class RestCountriesWikipediaFetcher:
-    def __init__(self):
+    def __init__(
+        self,
+        http_cache: Optional[HTTPResponseCache] = None,
+        page_store: Optional[WikiPageStore] = None,
+    ):
         self.rest_countries_url = "https://restcountries.com/v3.1"
-        self.wiki_api = wikipediaapi.Wikipedia(
-            user_agent=f"FictionalTravelevator/1.0 ({settings.GITHUB_URL}; {settings.EMAIL} )",
-            language="en",
-        )
+        self.http_cache = http_cache or HTTPResponseCache()
+        self.page_store = page_store if page_store is not None else WikiPageStore()
         self.http_client = httpx.Client(
-            headers={
-                "User-Agent": f"FictionalTravelevator/1.0 ({settings.GITHUB_URL}; {settings.EMAIL})"
-            }
+            headers={"User-Agent": USER_AGENT},
+            transport=CachingTransport(self.http_cache),
         )
 
     @retry(
@@ -36,27 +49,8 @@ class RestCountriesWikipediaFetcher:
             logger.error(f"HTTP error occurred while fetching countries: {e}")
             raise
 
-    @retry(
-        stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10)
-    )
-    def fetch_cities(self, country_code: str) -> List[Dict[str, Any]]:
-        try:
-            response = self.http_client.get(
-                f"{self.rest_countries_url}/alpha/{country_code}"
-            )
-            response.raise_for_status()
-            country_data = response.json()[0]
-            return self.extract_cities(country_data)
-        except httpx.HTTPError as e:
-            logger.error(
-                f"HTTP error occurred while fetching cities for {country_code}: {e}"
-            )
-            raise
-        except (KeyError, IndexError) as e:
-            logger.error(f"Error extracting city data for {country_code}: {e}")
-            return []
-
-    def extract_cities(self, country_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    @staticmethod
+    def extract_cities(country_data: Dict[str, Any]) -> List[Dict[str, Any]]:
         cities = []
         if "capital" in country_data:
             cities.extend(
@@ -68,59 +62,40 @@ class RestCountriesWikipediaFetcher:
             )
         return cities
 
-    def fetch_wikipedia_info(self, city_name: str, country_name: str) -> Dict[str, Any]:
-        page = self.wiki_api.page(city_name)
-
-        if page.exists():
-            if "disambiguation" in page.title:
-                # Handling disambiguation: Search for the relevant country name in the disambiguation links
-                links = page.links
-                for link_title in links:
-                    if re.search(
-                        rf"\b{re.escape(country_name)}\b", link_title, re.IGNORECASE
-                    ):
-                        # Fetch the page for the matched link
-                        country_page = self.wiki_api.page(link_title)
-                        if country_page.exists():
-                            return {
-                                "summary": country_page.summary,  # First 500 characters of the summary
-                                "url": country_page.fullurl,
-                            }
-                        else:
-                            logger.warning(
-                                f"No Wikipedia page found for disambiguation link: {link_title}"
-                            )
-                # If no matching page is found, return a message indicating so
-                logger.warning(
-                    f"No relevant Wikipedia page found for disambiguation page of {city_name}, {country_name}"
-                )
-                return {
-                    "summary": "This page is a disambiguation page. No relevant city page found.",
-                    "url": page.fullurl,
-                }
+    def fetch_wikipedia_infos(
+        self, places: Iterable[Tuple[str, str]]
+    ) -> Dict[Tuple[str, str], Dict[str, Any]]:
+        return asyncio.run(self._fetch_wikipedia_infos(list(places)))
 
-            # If not a disambiguation page, return the standard page information
-            return {
-                "summary": page.summary,  # First 500 characters of the summary
-                "url": page.fullurl,
-            }
-        else:
-            logger.warning(f"No Wikipedia page found for {city_name}, {country_name}")
-            return {"summary": "", "url": ""}
+    async def _fetch_wikipedia_infos(self, places: List[Tuple[str, str]]):
+        async with httpx.AsyncClient(
+            headers={"User-Agent": USER_AGENT},
+            transport=AsyncCachingTransport(self.http_cache),
+            timeout=30,
+        ) as client:
+            wikipedia = WikipediaBatchFetcher(client, store=self.page_store)
+            return await wikipedia.fetch_wikipedia_infos(places)
+
+    def fetch_wikipedia_info(self, city_name: str, country_name: str) -> Dict[str, Any]:
+        place = (city_name, country_name)
+        return self.fetch_wikipedia_infos([place])[place]
 
     def process_countries(self):
-        countries = self.fetch_countries()
-        for country in countries:
-            country_name = country["name"]["common"]
-            country_code = country["cca3"]
-            logger.info(f"Processing country: {country_name}")
-
-            cities = self.fetch_cities(country_code)
-            for city in cities:
+        places = []
+        for country in self.fetch_countries():
+            logger.info(f"Processing country: {country['name']['common']}")
+            # /all already carries the capital, so no per-country /alpha request
+            places.extend((country, city) for city in self.extract_cities(country))
+
+        for batch in chunked(places, MAX_TITLES_PER_QUERY):
+            wiki_infos = self.fetch_wikipedia_infos(
+                (city["name"], country["name"]["common"]) for country, city in batch
+            )
+            for country, city in batch:
                 city_name = city["name"]
+                country_name = country["name"]["common"]
                 logger.info(f"Processing city: {city_name}")
-
-                wiki_info = self.fetch_wikipedia_info(city_name, country_name)
+                wiki_info = wiki_infos[(city_name, country_name)]
 
                 yield {
                     "name": city_name,
@@ -133,3 +108,62 @@ class RestCountriesWikipediaFetcher:
 
     def __del__(self):
         self.http_client.close()
+
+
+class AsyncRestCountriesWikipediaFetcher:
+    """Async counterpart of RestCountriesWikipediaFetcher for the ingestion pipeline.
+
+    Wikipedia is queried in batches through the MediaWiki action API, so both
+    base URLs can point at local stub servers in tests.
+    """
+
+    def __init__(
+        self,
+        rest_countries_url: str = "https://restcountries.com/v3.1",
+        wikipedia_api_url: str = "https://en.wikipedia.org/w/api.php",
+        max_connections: int = 20,
+        http_cache: Optional[HTTPResponseCache] = None,
+        page_store: Optional[WikiPageStore] = None,
+    ):
+        self.rest_countries_url = rest_countries_url
+        self.wikipedia_api_url = wikipedia_api_url
+        self.http_cache = http_cache or HTTPResponseCache()
+        self.http_client = httpx.AsyncClient(
+            headers={"User-Agent": USER_AGENT},
+            transport=AsyncCachingTransport(
+                self.http_cache,
+                httpx.AsyncHTTPTransport(
+                    limits=httpx.Limits(max_connections=max_connections)
+                ),
+            ),
+            timeout=30,
+        )
+        self.wikipedia = WikipediaBatchFetcher(
+            self.http_client, wikipedia_api_url, page_store
+        )
+
+    @retry(
+        stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10)
+    )
+    async def fetch_countries(self) -> List[Dict[str, Any]]:
+        try:
+            response = await self.http_client.get(f"{self.rest_countries_url}/all")
+            response.raise_for_status()
+            return response.json()
+        except httpx.HTTPError as e:
+            logger.error(f"HTTP error occurred while fetching countries: {e}")
+            raise
+
+    async def fetch_wikipedia_infos(
+        self, places: Iterable[Tuple[str, str]]
+    ) -> Dict[Tuple[str, str], Dict[str, Any]]:
+        return await self.wikipedia.fetch_wikipedia_infos(places)
+
+    async def fetch_wikipedia_info(
+        self, city_name: str, country_name: str
+    ) -> Dict[str, Any]:
+        place = (city_name, country_name)
+        return (await self.fetch_wikipedia_infos([place]))[place]
+
+    async def aclose(self):
+        await self.http_client.aclose()
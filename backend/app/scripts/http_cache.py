@@ -0,0 +1,189 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+from app.config import settings
+
+_MAX_AGE = re.compile(r"max-age=(\d+)")
+
+
+class HTTPResponseCache:
+    """On-disk store of GET responses and their ETag/Last-Modified validators.
+
+    Bodies are kept exactly as received (still content-encoded), next to a
+    small JSON file holding the headers, so a 304 can be answered with the
+    original response.
+    """
+
+    def __init__(self, directory: str = settings.HTTP_CACHE_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+
+    def _paths(self, url: str):
+        digest = hashlib.sha256(url.encode()).hexdigest()
+        base = os.path.join(self.directory, digest[:2], digest)
+        return f"{base}.json", f"{base}.body"
+
+    def load(self, url: str) -> Optional[Dict[str, Any]]:
+        meta_path, body_path = self._paths(url)
+        try:
+            with open(meta_path) as f:
+                entry = json.load(f)
+            with open(body_path, "rb") as f:
+                entry["body"] = f.read()
+        except (OSError, ValueError):
+            return None
+        return entry
+
+    def store(self, url: str, response: httpx.Response, body: bytes):
+        cache_control = response.headers.get("cache-control", "")
+        if "no-store" in cache_control:
+            return
+        max_age = _MAX_AGE.search(cache_control)
+        entry = {
+            "url": url,
+            "status_code": response.status_code,
+            "headers": list(response.headers.multi_items()),
+            "etag": response.headers.get("etag"),
+            "last_modified": response.headers.get("last-modified"),
+            "fresh_until": time.time() + int(max_age.group(1)) if max_age else 0,
+        }
+        if not (entry["etag"] or entry["last_modified"] or entry["fresh_until"]):
+            return
+
+        meta_path, body_path = self._paths(url)
+        os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+        self._write_atomic(body_path, body)
+        self._write_atomic(meta_path, json.dumps(entry).encode())
+
+    def _write_atomic(self, path: str, data: bytes):
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def conditional_headers(self, entry: Dict[str, Any]) -> Dict[str, str]:
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def is_fresh(self, entry: Dict[str, Any]) -> bool:
+        return entry.get("fresh_until", 0) > time.time()
+
+    def to_response(
+        self, request: httpx.Request, entry: Dict[str, Any]
+    ) -> httpx.Response:
+        return httpx.Response(
+            status_code=entry["status_code"],
+            headers=entry["headers"],
+            content=entry["body"],
+            request=request,
+        )
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "revalidated": self.revalidated,
+            "misses": self.misses,
+        }
+
+
+class CachingTransport(httpx.BaseTransport):
+    """httpx transport that revalidates cached GETs instead of refetching them."""
+
+    def __init__(
+        self,
+        cache: HTTPResponseCache,
+        transport: Optional[httpx.BaseTransport] = None,
+    ):
+        self.cache = cache
+        self.transport = transport or httpx.HTTPTransport()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        if request.method != "GET":
+            return self.transport.handle_request(request)
+
+        url = str(request.url)
+        entry = self.cache.load(url)
+        if entry is not None:
+            if self.cache.is_fresh(entry):
+                self.cache.hits += 1
+                return self.cache.to_response(request, entry)
+            request.headers.update(self.cache.conditional_headers(entry))
+
+        response = self.transport.handle_request(request)
+        if response.status_code == 304 and entry is not None:
+            response.close()
+            self.cache.revalidated += 1
+            return self.cache.to_response(request, entry)
+
+        self.cache.misses += 1
+        if response.status_code != 200:
+            return response
+        body = b"".join(response.iter_raw())
+        self.cache.store(url, response, body)
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            content=body,
+            request=request,
+        )
+
+    def close(self):
+        self.transport.close()
+
+
+class AsyncCachingTransport(httpx.AsyncBaseTransport):
+    """Async twin of CachingTransport; disk access is small enough to stay inline."""
+
+    def __init__(
+        self,
+        cache: HTTPResponseCache,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.cache = cache
+        self.transport = transport or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if request.method != "GET":
+            return await self.transport.handle_async_request(request)
+
+        url = str(request.url)
+        entry = self.cache.load(url)
+        if entry is not None:
+            if self.cache.is_fresh(entry):
+                self.cache.hits += 1
+                return self.cache.to_response(request, entry)
+            request.headers.update(self.cache.conditional_headers(entry))
+
+        response = await self.transport.handle_async_request(request)
+        if response.status_code == 304 and entry is not None:
+            await response.aclose()
+            self.cache.revalidated += 1
+            return self.cache.to_response(request, entry)
+
+        self.cache.misses += 1
+        if response.status_code != 200:
+            return response
+        body = b"".join([chunk async for chunk in response.aiter_raw()])
+        self.cache.store(url, response, body)
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            content=body,
+            request=request,
+        )
+
+    async def aclose(self):
+        await self.transport.aclose()
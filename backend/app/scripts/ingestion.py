@@ -0,0 +1,284 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from app.config import settings
+from app.models.destination import Destination
+from app.scripts.fetcher import (
+    AsyncRestCountriesWikipediaFetcher,
+    RestCountriesWikipediaFetcher,
+)
+from app.scripts.wiki_batch import MAX_TITLES_PER_QUERY
+from app.services.llm_service import llm_service
+from app.services.supabase_client import supabase_client_manager
+from app.services.vector_store import vector_store_service
+
+logger = logging.getLogger(__name__)
+
+STAGES = ("fetch", "wiki", "embed", "llm", "persist")
+DEFAULT_STAGE_WORKERS = {"fetch": 4, "wiki": 8, "embed": 2, "llm": 2, "persist": 4}
+# Stages whose handler receives a list drained from its queue, up to this size
+STAGE_BATCH_SIZES = {
+    "wiki": MAX_TITLES_PER_QUERY,
+    "embed": settings.VECTOR_STORE_BATCH_SIZE,
+}
+
+# Marks the end of a stage's input; each worker consumes exactly one
+_DONE = object()
+
+
+class StageStats:
+    def __init__(self, name: str, workers: int):
+        self.name = name
+        self.workers = workers
+        self.processed = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+        self.started_at = time.perf_counter()
+
+    @property
+    def throughput(self) -> float:
+        elapsed = time.perf_counter() - self.started_at
+        return self.processed / elapsed if elapsed else 0.0
+
+    @property
+    def utilization(self) -> float:
+        elapsed = time.perf_counter() - self.started_at
+        return self.busy_seconds / (elapsed * self.workers) if elapsed else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.name:<8} processed={self.processed:<6} failed={self.failed:<4} "
+            f"{self.throughput:7.2f} items/s  busy={self.utilization:6.1%}"
+        )
+
+
+class IngestionCheckpoint:
+    """Append-only log of persisted items, so an interrupted run can resume."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.completed = set()
+        if os.path.exists(path):
+            with open(path) as f:
+                self.completed = {json.loads(line)["key"] for line in f if line.strip()}
+
+    def is_done(self, key: str) -> bool:
+        return key in self.completed
+
+    def mark_done(self, key: str):
+        self.completed.add(key)
+        with open(self.path, "a") as f:
+            f.write(json.dumps({"key": key, "at": time.time()}) + "\n")
+
+
+def item_key(country_name: str, city_name: str) -> str:
+    return f"{country_name}|{city_name}"
+
+
+def persist_destination(destination: Destination):
+    supabase = supabase_client_manager.get_client()
+    new_destination = (
+        supabase.table("destinations").insert(destination.model_dump()).execute()
+    )
+    if not new_destination.data:
+        raise ValueError("Supabase returned no row for the inserted destination")
+
+
+class StagedIngestionPipeline:
+    """Country/city ingestion as a chain of bounded worker pools.
+
+    fetch and wiki are network-bound and run as coroutines on the event loop;
+    embed, llm and persist wrap blocking clients and run in worker threads.
+    Stages are connected by bounded queues, so a slow stage applies
+    backpressure instead of letting the crawl buffer the whole world.
+    """
+
+    def __init__(
+        self,
+        fetcher: Optional[AsyncRestCountriesWikipediaFetcher] = None,
+        embed: Callable = vector_store_service.add_scraped_items,
+        generate: Callable = llm_service.generate_destination_info,
+        persist: Callable = persist_destination,
+        workers: Optional[Dict[str, int]] = None,
+        queue_size: int = 100,
+        checkpoint_path: str = "ingestion_checkpoint.jsonl",
+        report_interval: float = 30.0,
+    ):
+        self.fetcher = fetcher or AsyncRestCountriesWikipediaFetcher()
+        self.embed = embed
+        self.generate = generate
+        self.persist = persist
+        self.workers = {**DEFAULT_STAGE_WORKERS, **(workers or {})}
+        self.queue_size = queue_size
+        self.checkpoint = IngestionCheckpoint(checkpoint_path)
+        self.report_interval = report_interval
+        self.stats: Dict[str, StageStats] = {}
+
+    async def run(self) -> Dict[str, StageStats]:
+        self.stats = {stage: StageStats(stage, self.workers[stage]) for stage in STAGES}
+        queues = {stage: asyncio.Queue(maxsize=self.queue_size) for stage in STAGES}
+        handlers = {
+            "fetch": self._fetch,
+            "wiki": self._wiki,
+            "embed": self._embed,
+            "llm": self._llm,
+            "persist": self._persist,
+        }
+
+        reporter = asyncio.create_task(self._report_periodically())
+        try:
+            countries = await self.fetcher.fetch_countries()
+            await asyncio.gather(
+                self._produce(countries, queues["fetch"]),
+                *self._build_stages(queues, handlers),
+            )
+        finally:
+            reporter.cancel()
+            await self.fetcher.aclose()
+        self.report()
+        return self.stats
+
+    def _build_stages(self, queues, handlers):
+        stages = []
+        for index, stage in enumerate(STAGES):
+            outbox = queues[STAGES[index + 1]] if index + 1 < len(STAGES) else None
+            next_workers = (
+                self.workers[STAGES[index + 1]] if index + 1 < len(STAGES) else 0
+            )
+            stages.append(
+                self._run_stage(
+                    stage, handlers[stage], queues[stage], outbox, next_workers
+                )
+            )
+        return stages
+
+    def report(self):
+        for stats in self.stats.values():
+            logger.info(str(stats))
+
+    async def _report_periodically(self):
+        while True:
+            await asyncio.sleep(self.report_interval)
+            self.report()
+
+    async def _produce(self, countries: Iterable[Dict[str, Any]], fetch_queue):
+        for country in countries:
+            await fetch_queue.put(country)
+        for _ in range(self.workers["fetch"]):
+            await fetch_queue.put(_DONE)
+
+    async def _run_stage(
+        self,
+        name: str,
+        handler: Callable[[Any], Awaitable[Iterable[Any]]],
+        inbox: asyncio.Queue,
+        outbox: Optional[asyncio.Queue],
+        next_workers: int,
+    ):
+        stats = self.stats[name]
+        batch_size = STAGE_BATCH_SIZES.get(name)
+
+        async def worker():
+            finished = False
+            while not finished:
+                batch, finished = await take_batch(inbox, batch_size or 1)
+                if not batch:
+                    continue
+                started = time.perf_counter()
+                try:
+                    results = await handler(batch if batch_size else batch[0])
+                except Exception as e:
+                    stats.failed += len(batch)
+                    items = ", ".join(describe(item) for item in batch)
+                    logger.error(f"{name} stage failed for {items}: {e}")
+                    continue
+                finally:
+                    stats.busy_seconds += time.perf_counter() - started
+                stats.processed += len(batch)
+                if outbox is not None:
+                    for result in results:
+                        await outbox.put(result)
+
+        await asyncio.gather(*(worker() for _ in range(self.workers[name])))
+        if outbox is not None:
+            for _ in range(next_workers):
+                await outbox.put(_DONE)
+
+    async def _fetch(self, country: Dict[str, Any]):
+        country_name = country["name"]["common"]
+        # /all already carries the capital, so no per-country /alpha request
+        cities = RestCountriesWikipediaFetcher.extract_cities(country)
+        return [
+            {"country_name": country_name, "country": country, "city": city}
+            for city in cities
+            if not self.checkpoint.is_done(item_key(country_name, city["name"]))
+        ]
+
+    async def _wiki(self, batch: List[Dict[str, Any]]):
+        wiki_infos = await self.fetcher.fetch_wikipedia_infos(
+            (pending["city"]["name"], pending["country_name"]) for pending in batch
+        )
+        items = []
+        for pending in batch:
+            city_name = pending["city"]["name"]
+            country_name = pending["country_name"]
+            wiki_info = wiki_infos[(city_name, country_name)]
+            items.append(
+                {
+                    "name": city_name,
+                    "country": country_name,
+                    "is_capital": pending["city"]["is_capital"],
+                    "description": wiki_info["summary"],
+                    "wikipedia_url": wiki_info["url"],
+                    "country_data": pending["country"],
+                }
+            )
+        return items
+
+    async def _embed(self, batch: List[Dict[str, Any]]):
+        await asyncio.to_thread(self.embed, batch)
+        return batch
+
+    async def _llm(self, item: Dict[str, Any]):
+        destination = await asyncio.to_thread(self.generate, item)
+        return [(item, destination)]
+
+    async def _persist(self, generated):
+        item, destination = generated
+        await asyncio.to_thread(self.persist, destination)
+        self.checkpoint.mark_done(item_key(item["country"], item["name"]))
+        logger.info(
+            f"Successfully processed and stored: {item['name']}, {item['country']}"
+        )
+        return []
+
+
+async def take_batch(inbox: asyncio.Queue, size: int):
+    """Waits for one item, then drains whatever else is queued, up to ``size``.
+
+    Returns the batch and whether the stage's end marker was consumed.
+    """
+    item = await inbox.get()
+    if item is _DONE:
+        return [], True
+    batch = [item]
+    while len(batch) < size and not inbox.empty():
+        item = inbox.get_nowait()
+        if item is _DONE:
+            return batch, True
+        batch.append(item)
+    return batch, False
+
+
+def describe(item: Any) -> str:
+    if isinstance(item, tuple):
+        item = item[0]
+    if "name" in item and "country" in item and isinstance(item["name"], str):
+        return f"{item['name']}, {item['country']}"
+    if "city" in item:
+        return f"{item['city']['name']}, {item['country_name']}"
+    return item.get("name", {}).get("common", "unknown country")
@@ -1,49 +1,189 @@
+import argparse
+import logging
 import random
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, NamedTuple, Optional
 
+from app.config import settings
+from app.models.itinerary import Itinerary
+from app.models.user import UserPreferences
 from app.services.llm_service import llm_service
 from app.services.supabase_client import supabase_client_manager
-from app.utils import calculate_distance, estimate_travel_cost
+from app.utils.geo import apply_route_metrics
+from tenacity import Retrying, stop_after_attempt, wait_exponential
 
+logger = logging.getLogger(__name__)
+
+INTERESTS = ["culture", "nature", "food", "history", "adventure"]
+TRAVEL_STYLES = ["luxury", "budget", "mid-range"]
+ACTIVITIES = ["sightseeing", "hiking", "shopping", "relaxing", "nightlife"]
+TRANSPORTATION = ["any", "car", "public_transport", "plane"]
 
-def generate_mock_itineraries(num_itineraries=100):
-    supabase = supabase_client_manager.get_client()
-    destinations = supabase.table("destinations").select("*").execute().data
-
-    for _ in range(num_itineraries):
-        num_destinations = random.randint(2, 5)
-        selected_destinations = random.sample(destinations, num_destinations)
-        duration = random.randint(7, 21)
-
-        user_preferences = {
-            "interests": random.sample(
-                ["culture", "nature", "food", "history", "adventure"], 3
-            ),
-            "budget": random.uniform(1000, 5000),
-            "preferred_travel_style": random.choice(["luxury", "budget", "mid-range"]),
-            "preferred_activities": random.sample(
-                ["sightseeing", "hiking", "shopping", "relaxing", "nightlife"], 3
-            ),
-            "preferred_transportation": random.sample(
-                ["any", "car", "public_transport", "plane"], 2
-            ),
-        }
-
-        itinerary = llm_service.generate_itinerary(
-            user_preferences, [d["name"] for d in selected_destinations], duration
-        )
 
-        total_distance, total_cost = 0, 0
-        for i in range(len(itinerary.destinations) - 1):
-            d1, d2 = itinerary.destinations[i], itinerary.destinations[i + 1]
-            distance = calculate_distance(
-                d1.latitude, d1.longitude, d2.latitude, d2.longitude
+class MockRequest(NamedTuple):
+    index: int
+    user_preferences: UserPreferences
+    destinations: List[str]
+    duration: int
+    # The sampled rows, so prompts get their descriptions and country data
+    destination_rows: List[Dict]
+
+
+def mock_requests(
+    destinations: List[Dict], count: int, seed: int = 0
+) -> List[MockRequest]:
+    """The sampled trip requests, fixed by ``seed`` whatever the worker count."""
+    rng = random.Random(seed)
+    requests = []
+    for index in range(count):
+        selected = rng.sample(destinations, rng.randint(2, min(5, len(destinations))))
+        duration = rng.randint(7, 21)
+        user_preferences = UserPreferences(
+            user_id=f"mock-user-{index}",
+            interests=rng.sample(INTERESTS, 3),
+            budget=rng.uniform(1000, 5000),
+            preferred_travel_style=rng.choice(TRAVEL_STYLES),
+            preferred_activities=rng.sample(ACTIVITIES, 3),
+            preferred_transportation=rng.sample(TRANSPORTATION, 2),
+        )
+        requests.append(
+            MockRequest(
+                index,
+                user_preferences,
+                [d["name"] for d in selected],
+                duration,
+                selected,
             )
-            cost = estimate_travel_cost(distance)
-            total_distance += distance
-            total_cost += cost
-            d2.travel_time_from_previous = distance / 100
-            d2.travel_cost_from_previous = cost
+        )
+    return requests
+
+
+class ProgressReport:
+    def __init__(self, total: int):
+        self.total = total
+        self.succeeded = 0
+        self.failed = 0
+        self.started_at = time.perf_counter()
+
+    def update(self, succeeded: bool, count: int = 1):
+        if succeeded:
+            self.succeeded += count
+        else:
+            self.failed += count
+
+    def __str__(self) -> str:
+        done = self.succeeded + self.failed
+        elapsed = time.perf_counter() - self.started_at
+        rate = done / elapsed if elapsed else 0.0
+        eta = (self.total - done) / rate if rate else float("inf")
+        return (
+            f"{done}/{self.total} itineraries ({self.failed} failed) "
+            f"{rate * 60:.1f}/min, ETA {eta:.0f}s"
+        )
+
+
+def insert_itineraries(itineraries: List[Itinerary]):
+    supabase = supabase_client_manager.get_client()
+    supabase.table("itineraries").insert(
+        [itinerary.model_dump(mode="json") for itinerary in itineraries]
+    ).execute()
+
+
+def generate_mock_itineraries(
+    num_itineraries: int = 100,
+    workers: int = settings.GENERATION_WORKERS,
+    seed: int = 0,
+    batch_size: int = 20,
+    attempts: int = 3,
+    retry_wait: float = 2.0,
+    destinations: Optional[List[Dict]] = None,
+    generate: Callable[..., Itinerary] = llm_service.generate_itinerary,
+    insert: Callable[[List[Itinerary]], None] = insert_itineraries,
+) -> ProgressReport:
+    """Generates itineraries on ``workers`` threads and inserts them in batches.
+
+    Generation is I/O-bound on the Ollama server, so threads are enough and
+    ``workers`` should match the parallel requests it serves. A request that
+    still fails after ``attempts`` is logged and skipped, and an itinerary
+    only counts as succeeded once its batch is inserted. Request ``i`` is
+    generated with LLM seed ``seed + i``, so a rerun on the same models
+    reproduces the same itineraries.
+    """
+    if destinations is None:
+        supabase = supabase_client_manager.get_client()
+        destinations = supabase.table("destinations").select("*").execute().data
+    requests = mock_requests(destinations, num_itineraries, seed)
+    progress = ProgressReport(len(requests))
+
+    def run(request: MockRequest) -> Itinerary:
+        for attempt in Retrying(
+            stop=stop_after_attempt(attempts),
+            wait=wait_exponential(multiplier=retry_wait, max=30),
+            reraise=True,
+        ):
+            with attempt:
+                return generate(
+                    request.user_preferences,
+                    request.destinations,
+                    request.duration,
+                    request.destination_rows,
+                    seed=seed + request.index,
+                )
+
+    def flush(batch: List[Itinerary]):
+        # Route metrics for the whole batch in one vectorized pass
+        apply_route_metrics(batch, destinations)
+        try:
+            insert(batch)
+            progress.update(succeeded=True, count=len(batch))
+        except Exception as e:
+            progress.update(succeeded=False, count=len(batch))
+            logger.error(f"Failed to insert {len(batch)} itineraries: {e}")
+        logger.info(str(progress))
+        batch.clear()
+
+    batch: List[Itinerary] = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(run, request): request for request in requests}
+        for future in as_completed(futures):
+            request = futures[future]
+            try:
+                batch.append(future.result())
+            except Exception as e:
+                progress.update(succeeded=False)
+                logger.error(f"Itinerary {request.index} failed: {e}")
+            logger.info(str(progress))
+            if len(batch) >= batch_size:
+                flush(batch)
+    if batch:
+        flush(batch)
+    return progress
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate mock itineraries")
+    parser.add_argument("--count", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=settings.GENERATION_WORKERS)
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="Seeds the sampled requests and, offset by request, the LLM",
+    )
+    parser.add_argument("--batch-size", type=int, default=20)
+    parser.add_argument("--attempts", type=int, default=3)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    generate_mock_itineraries(
+        args.count,
+        workers=args.workers,
+        seed=args.seed,
+        batch_size=args.batch_size,
+        attempts=args.attempts,
+    )
 
-        itinerary.total_cost = total_cost
 
-        supabase.table("itineraries").insert(itinerary.model_dump()).execute()
+if __name__ == "__main__":
+    main()
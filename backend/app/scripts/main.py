@@ -1,10 +1,13 @@
+import argparse
+import asyncio
 import logging
 
 import colorlog
-from app.scripts.fetcher import RestCountriesWikipediaFetcher
-from app.services.llm_service import llm_service
-from app.services.supabase_client import supabase_client_manager
-from app.services.vector_store import vector_store_service
+from app.scripts.ingestion import (
+    DEFAULT_STAGE_WORKERS,
+    STAGES,
+    StagedIngestionPipeline,
+)
 
 formatter = colorlog.ColoredFormatter(
     "%(log_color)s%(asctime)s - %(name)s - %(levelname)s - %(message)s",
@@ -17,35 +20,23 @@ handler = logging.StreamHandler()
 handler.setFormatter(formatter)
 logger.addHandler(handler)
 
+
 def main():
-    fetcher = RestCountriesWikipediaFetcher()
-    supabase = supabase_client_manager.get_client()
-
-    for item in fetcher.process_countries():
-        try:
-            # Store scraped data in vector store
-            vector_store_service.add_scraped_data(item)
-
-            # Generate destination info using LLM and vector store
-            destination_info = llm_service.generate_destination_info(item)
-
-            # Store in database
-            new_destination = (
-                supabase.table("destinations")
-                .insert(destination_info.model_dump())
-                .execute()
-            )
-
-            if new_destination.data:
-                logger.info(
-                    f"Successfully processed and stored: {item['name']}, {item['country']}"
-                )
-            else:
-                logger.warning(f"Failed to process: {item['name']}, {item['country']}")
-        except Exception as e:
-            logger.error(
-                f"Error in main loop for {item['name']}, {item['country']}: {e}"
-            )
+    parser = argparse.ArgumentParser(description="Crawl countries and cities")
+    parser.add_argument("--checkpoint", default="ingestion_checkpoint.jsonl")
+    parser.add_argument("--queue-size", type=int, default=100)
+    for stage in STAGES:
+        parser.add_argument(
+            f"--{stage}-workers", type=int, default=DEFAULT_STAGE_WORKERS[stage]
+        )
+    args = parser.parse_args()
+
+    pipeline = StagedIngestionPipeline(
+        workers={stage: getattr(args, f"{stage}_workers") for stage in STAGES},
+        queue_size=args.queue_size,
+        checkpoint_path=args.checkpoint,
+    )
+    asyncio.run(pipeline.run())
 
 
 if __name__ == "__main__":
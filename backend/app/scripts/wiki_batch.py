@@ -0,0 +1,301 @@
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import httpx
+from app.config import settings
+from tenacity import retry, stop_after_attempt, wait_exponential
+
+logger = logging.getLogger(__name__)
+
+# MediaWiki limits: 50 titles per query, 20 intro extracts per query
+MAX_TITLES_PER_QUERY = 50
+MAX_EXTRACTS_PER_QUERY = 20
+
+NO_CITY_PAGE_SUMMARY = (
+    "This page is a disambiguation page. No relevant city page found."
+)
+
+
+def chunked(items: List[Any], size: int) -> Iterator[List[Any]]:
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class WikiPageStore:
+    """SQLite store of page summaries keyed by title and revision id.
+
+    Only the latest stored revision of a title is kept. The extract's content
+    hash is stored alongside it so consumers can tell unchanged text apart.
+    """
+
+    def __init__(self, path: str = settings.WIKI_PAGE_STORE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS pages (
+                    title TEXT NOT NULL,
+                    revid INTEGER NOT NULL,
+                    url TEXT NOT NULL,
+                    extract TEXT NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    disambiguation INTEGER NOT NULL,
+                    links TEXT,
+                    fetched_at REAL NOT NULL,
+                    PRIMARY KEY (title, revid)
+                )
+                """)
+
+    @staticmethod
+    def _to_page(row) -> Dict[str, Any]:
+        title, revid, url, extract, digest, disambiguation, links = row
+        return {
+            "title": title,
+            "revid": revid,
+            "url": url,
+            "extract": extract,
+            "content_hash": digest,
+            "disambiguation": bool(disambiguation),
+            "links": json.loads(links) if links else [],
+        }
+
+    def get(self, title: str, revid: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT title, revid, url, extract, content_hash, disambiguation, links"
+                " FROM pages WHERE title = ? AND revid = ?",
+                (title, revid),
+            ).fetchone()
+        return self._to_page(row) if row else None
+
+    def put(self, page: Dict[str, Any]) -> Dict[str, Any]:
+        page = {**page, "content_hash": content_hash(page["extract"])}
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM pages WHERE title = ? AND revid < ?",
+                (page["title"], page["revid"]),
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    page["title"],
+                    page["revid"],
+                    page["url"],
+                    page["extract"],
+                    page["content_hash"],
+                    int(page["disambiguation"]),
+                    json.dumps(page["links"]) if page["links"] else None,
+                    time.time(),
+                ),
+            )
+        return page
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+
+    def close(self):
+        self._conn.close()
+
+
+class WikipediaBatchFetcher:
+    """Resolves many city pages per MediaWiki request.
+
+    Every run asks for the current revision of all titles at once (redirects
+    and normalisation are resolved by the API in the same call). Extracts and
+    disambiguation links are then downloaded only for pages whose revision is
+    not already in the page store.
+    """
+
+    def __init__(
+        self,
+        http_client: httpx.AsyncClient,
+        api_url: str = "https://en.wikipedia.org/w/api.php",
+        store: Optional[WikiPageStore] = None,
+    ):
+        self.http_client = http_client
+        self.api_url = api_url
+        self.store = store if store is not None else WikiPageStore()
+        self.fetched = 0
+        self.reused = 0
+
+    @retry(
+        stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10)
+    )
+    async def _query(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        response = await self.http_client.get(
+            self.api_url,
+            params={"action": "query", "format": "json", "formatversion": 2, **params},
+        )
+        response.raise_for_status()
+        return response.json()
+
+    async def _query_pages(
+        self, titles: List[str], params: Dict[str, Any]
+    ) -> Tuple[Dict[str, str], Dict[str, Dict[str, Any]]]:
+        """Runs a multi-title query, following continuation until complete."""
+        aliases: Dict[str, str] = {}
+        pages: Dict[str, Dict[str, Any]] = {}
+        request = {"titles": "|".join(titles), **params}
+        while True:
+            data = await self._query(request)
+            query = data.get("query", {})
+            for hop in query.get("normalized", []) + query.get("redirects", []):
+                aliases[hop["from"]] = hop["to"]
+            for page in query.get("pages", []):
+                merged = pages.setdefault(page["title"], {})
+                links = merged.get("links", []) + page.get("links", [])
+                merged.update(page)
+                merged["links"] = links
+            if "continue" not in data:
+                return aliases, pages
+            request = {**request, **data["continue"]}
+
+    @staticmethod
+    def _resolve(aliases: Dict[str, str], title: str) -> str:
+        seen = set()
+        while title in aliases and title not in seen:
+            seen.add(title)
+            title = aliases[title]
+        return title
+
+    async def fetch_pages(
+        self, titles: Iterable[str]
+    ) -> Dict[str, Optional[Dict[str, Any]]]:
+        titles = list(dict.fromkeys(titles))
+        canonical: Dict[str, Optional[str]] = {}
+        revisions: Dict[str, Dict[str, Any]] = {}
+        for chunk in chunked(titles, MAX_TITLES_PER_QUERY):
+            aliases, pages = await self._query_pages(
+                chunk,
+                {
+                    "prop": "info|pageprops",
+                    "inprop": "url",
+                    "ppprop": "disambiguation",
+                    "redirects": 1,
+                },
+            )
+            for requested in chunk:
+                page = pages.get(self._resolve(aliases, requested))
+                if page is None or page.get("missing") or page.get("invalid"):
+                    canonical[requested] = None
+                    continue
+                canonical[requested] = page["title"]
+                revisions[page["title"]] = page
+
+        stored: Dict[str, Dict[str, Any]] = {}
+        stale: List[str] = []
+        for title, page in revisions.items():
+            cached = self.store.get(title, page["lastrevid"])
+            if cached is None:
+                stale.append(title)
+            else:
+                stored[title] = cached
+        self.reused += len(stored)
+        self.fetched += len(stale)
+
+        extracts: Dict[str, Dict[str, Any]] = {}
+        for chunk in chunked(stale, MAX_EXTRACTS_PER_QUERY):
+            _, pages = await self._query_pages(
+                chunk,
+                {"prop": "extracts", "exintro": 1, "explaintext": 1, "exlimit": "max"},
+            )
+            extracts.update(pages)
+
+        disambiguations = [
+            title
+            for title in stale
+            if "disambiguation" in revisions[title].get("pageprops", {})
+            or "disambiguation" in title
+        ]
+        links: Dict[str, Dict[str, Any]] = {}
+        for chunk in chunked(disambiguations, MAX_TITLES_PER_QUERY):
+            _, pages = await self._query_pages(
+                chunk, {"prop": "links", "plnamespace": 0, "pllimit": "max"}
+            )
+            links.update(pages)
+
+        for title in stale:
+            stored[title] = self.store.put(
+                {
+                    "title": title,
+                    "revid": revisions[title]["lastrevid"],
+                    "url": revisions[title].get("fullurl", ""),
+                    "extract": extracts.get(title, {}).get("extract", ""),
+                    "disambiguation": title in disambiguations,
+                    "links": [
+                        link["title"] for link in links.get(title, {}).get("links", [])
+                    ],
+                }
+            )
+
+        return {
+            requested: stored[title] if title else None
+            for requested, title in canonical.items()
+        }
+
+    async def fetch_wikipedia_infos(
+        self, places: Iterable[Tuple[str, str]]
+    ) -> Dict[Tuple[str, str], Dict[str, str]]:
+        """Maps each (city, country) pair to its Wikipedia summary and URL."""
+        places = list(dict.fromkeys(places))
+        pages = await self.fetch_pages(city for city, _ in places)
+
+        # Disambiguation links that mention the country, resolved in one batch
+        candidates: Dict[Tuple[str, str], List[str]] = {}
+        for city, country in places:
+            page = pages[city]
+            if page is not None and page["disambiguation"]:
+                pattern = re.compile(rf"\b{re.escape(country)}\b", re.IGNORECASE)
+                candidates[(city, country)] = [
+                    link for link in page["links"] if pattern.search(link)
+                ]
+        linked = await self.fetch_pages(
+            link for links in candidates.values() for link in links
+        )
+
+        infos = {}
+        for city, country in places:
+            page = pages[city]
+            if page is None:
+                logger.warning(f"No Wikipedia page found for {city}, {country}")
+                infos[(city, country)] = {"summary": "", "url": ""}
+            elif page["disambiguation"]:
+                match = next(
+                    (
+                        linked[link]
+                        for link in candidates[(city, country)]
+                        if linked.get(link)
+                    ),
+                    None,
+                )
+                if match is None:
+                    logger.warning(
+                        f"No relevant Wikipedia page found for disambiguation page of {city}, {country}"
+                    )
+                    infos[(city, country)] = {
+                        "summary": NO_CITY_PAGE_SUMMARY,
+                        "url": page["url"],
+                    }
+                else:
+                    infos[(city, country)] = {
+                        "summary": match["extract"],
+                        "url": match["url"],
+                    }
+            else:
+                infos[(city, country)] = {
+                    "summary": page["extract"],
+                    "url": page["url"],
+                }
+        return infos
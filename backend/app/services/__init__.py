@@ -1,3 +1,13 @@
+from .cache import *
+from .destination_cache import *
+from .embedding_cache import *
+from .job_queue import *
+from .json_repair import *
 from .llm_service import *
+from .prompt_context import *
+from .prompts import *
+from .route_optimizer import *
+from .spatial_index import *
+from .stream_parser import *
 from .supabase_client import *
 from .vector_store import *
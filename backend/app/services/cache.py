@@ -0,0 +1,191 @@
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after a TTL."""
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl_seconds: float = 300.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is not _MISSING:
+                expires_at, value = entry
+                if expires_at > self.clock():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None):
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        with self._lock:
+            self._entries[key] = (self.clock() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: Hashable):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and entry[0] > self.clock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class SharedCache(ABC):
+    """Cache shared between workers, e.g. a Redis or memcached adapter.
+
+    Keys are strings; values must survive whatever serialization the
+    backend applies (the API stores bytes, strings and plain dicts).
+    """
+
+    @abstractmethod
+    def get(self, key: str) -> Any:
+        raise NotImplementedError
+
+    @abstractmethod
+    def set(self, key: str, value: Any, ttl_seconds: float):
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    @abstractmethod
+    def incr(self, key: str) -> int:
+        raise NotImplementedError
+
+
+class InMemorySharedCache(SharedCache):
+    """Process-local stand-in for a shared cache, for tests and single workers."""
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        self._entries: Dict[str, tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= self.clock():
+                del self._entries[key]
+                return None
+            return entry[1]
+
+    def set(self, key: str, value: Any, ttl_seconds: float):
+        with self._lock:
+            self._entries[key] = (self.clock() + ttl_seconds, value)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            _, value = self._entries.get(key, (0.0, 0))
+            self._entries[key] = (float("inf"), value + 1)
+            return value + 1
+
+
+class TieredCache:
+    """A local ``TTLCache`` in front of an optional ``SharedCache``.
+
+    Shared hits are copied into the local tier. Writes and deletes go to
+    both tiers; other workers' local tiers only catch up when their entry
+    expires, so the local TTL bounds cross-worker staleness.
+    """
+
+    def __init__(
+        self, namespace: str, local: TTLCache, shared: Optional[SharedCache] = None
+    ):
+        self.namespace = namespace
+        self.local = local
+        self.shared = shared
+        self.shared_hits = 0
+        self.misses = 0
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    def get(self, key: str) -> Any:
+        value = self.local.get(key)
+        if value is not None or self.shared is None:
+            if value is None:
+                self.misses += 1
+            return value
+        value = self.shared.get(self._key(key))
+        if value is None:
+            self.misses += 1
+            return None
+        self.shared_hits += 1
+        self.local.set(key, value)
+        return value
+
+    def set(self, key: str, value: Any):
+        self.local.set(key, value)
+        if self.shared is not None:
+            self.shared.set(self._key(key), value, self.local.ttl_seconds)
+
+    def delete(self, key: str):
+        self.local.delete(key)
+        if self.shared is not None:
+            self.shared.delete(self._key(key))
+
+    def clear(self):
+        self.local.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        hits = self.local.hits + self.shared_hits
+        lookups = hits + self.misses
+        return {
+            "size": len(self.local),
+            "local_hits": self.local.hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "evictions": self.local.evictions,
+            "hit_rate": hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,106 @@
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.config import settings
+from app.services.cache import SharedCache, TieredCache, TTLCache
+
+VERSION_KEY = "destination:version"
+
+
+class DestinationCache:
+    """Read-through cache of destination rows and listing pages.
+
+    Rows are keyed by id with a name lookup on top. Names map to ids and
+    rows are stored once per id, so a rename or delete only has to drop the
+    id: a stale name entry no longer matches its row and is treated as a
+    miss. Listing pages are keyed by a catalog version that every write
+    bumps, so no write has to know which pages it affects.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = settings.DESTINATION_CACHE_MAX_ENTRIES,
+        ttl_seconds: float = settings.DESTINATION_CACHE_TTL_SECONDS,
+        page_entries: int = settings.DESTINATION_PAGE_CACHE_MAX_ENTRIES,
+        shared: Optional[SharedCache] = None,
+    ):
+        self.shared = shared
+        self.rows = TieredCache(
+            "destination",
+            TTLCache(max_entries=max_entries, ttl_seconds=ttl_seconds),
+            shared,
+        )
+        self.names = TTLCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+        self.pages = TieredCache(
+            "destination-page",
+            TTLCache(max_entries=page_entries, ttl_seconds=ttl_seconds),
+            shared,
+        )
+        self._version = 0
+
+    def get(self, destination_id: str) -> Optional[Dict[str, Any]]:
+        return self.rows.get(destination_id)
+
+    def get_by_name(self, name: str) -> Optional[Dict[str, Any]]:
+        destination_id = self.names.get(name)
+        if destination_id is None:
+            return None
+        row = self.rows.get(destination_id)
+        if row is None or row["name"] != name:
+            self.names.delete(name)
+            return None
+        return row
+
+    def lookup_names(
+        self, names: Iterable[str]
+    ) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+        """Cached rows by name, plus the distinct names that missed."""
+        found, missing = {}, []
+        for name in dict.fromkeys(names):
+            row = self.get_by_name(name)
+            if row is None:
+                missing.append(name)
+            else:
+                found[name] = row
+        return found, missing
+
+    def put(self, row: Dict[str, Any]):
+        self.rows.set(row["id"], row)
+        self.names.set(row["name"], row["id"])
+
+    def put_many(self, rows: Iterable[Dict[str, Any]]):
+        for row in rows:
+            self.put(row)
+
+    def invalidate(self, destination_id: str, row: Optional[Dict[str, Any]] = None):
+        """Drops a written destination, storing its fresh ``row`` if given."""
+        self.rows.delete(destination_id)
+        if row is not None:
+            self.put(row)
+        self._version += 1
+        if self.shared is not None:
+            self.shared.incr(VERSION_KEY)
+
+    def version(self) -> int:
+        if self.shared is None:
+            return self._version
+        return self.shared.get(VERSION_KEY) or 0
+
+    def page_key(self, key: str) -> str:
+        # Read the version before querying, so a write racing the query
+        # files its stale page under a version nobody reads any more
+        return f"{self.version()}:{key}"
+
+    def clear(self):
+        self.rows.clear()
+        self.names.clear()
+        self.pages.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rows": self.rows.stats(),
+            "names": self.names.stats(),
+            "pages": self.pages.stats(),
+        }
+
+
+destination_cache = DestinationCache()
@@ -0,0 +1,174 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from typing import Any, Dict, List
+
+from app.config import settings
+from app.services.cache import TTLCache
+from langchain_core.embeddings import Embeddings
+
+# Bound parameters per statement, under SQLite's historical limit of 999
+SQLITE_MAX_VARIABLES = 900
+# Memory-tier hits buffered before their last_used is written back
+TOUCH_BATCH_SIZE = 256
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that only sends never-seen text to the model.
+
+    Vectors are keyed by model name plus a hash of the text and kept in two
+    tiers: an in-process LRU in front of a SQLite file whose least recently
+    used rows are evicted beyond ``max_entries``.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        model_name: str,
+        path: str,
+        max_entries: int = settings.EMBEDDING_CACHE_MAX_ENTRIES,
+        memory_entries: int = settings.EMBEDDING_CACHE_MEMORY_ENTRIES,
+    ):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.memory = TTLCache(max_entries=memory_entries, ttl_seconds=float("inf"))
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._touched: set = set()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS embeddings_last_used"
+                " ON embeddings (last_used)"
+            )
+
+    def _key(self, text: str) -> str:
+        digest = hashlib.sha256(text.encode()).hexdigest()
+        return f"{self.model_name}:{digest}"
+
+    def _touch(self, keys: List[str]):
+        # Caller holds the lock and an open transaction
+        now = time.time()
+        for start in range(0, len(keys), SQLITE_MAX_VARIABLES - 1):
+            chunk = keys[start : start + SQLITE_MAX_VARIABLES - 1]
+            self._conn.execute(
+                "UPDATE embeddings SET last_used = ?"
+                f" WHERE key IN ({','.join('?' * len(chunk))})",
+                [now, *chunk],
+            )
+
+    def _flush_touched(self):
+        # Caller holds the lock and an open transaction
+        if self._touched:
+            self._touch(list(self._touched))
+            self._touched.clear()
+
+    def _load(self, keys: List[str]) -> Dict[str, List[float]]:
+        found = {}
+        missing = []
+        for key in keys:
+            vector = self.memory.get(key)
+            if vector is None:
+                missing.append(key)
+            else:
+                found[key] = vector
+
+        # Memory hits refresh last_used too, or SQLite would evict the hottest
+        # keys first; they are written back in batches
+        with self._lock:
+            self._touched.update(found)
+            if not missing and len(self._touched) < TOUCH_BATCH_SIZE:
+                return found
+
+        rows = []
+        with self._lock, self._conn:
+            self._flush_touched()
+            for start in range(0, len(missing), SQLITE_MAX_VARIABLES):
+                chunk = missing[start : start + SQLITE_MAX_VARIABLES]
+                rows.extend(
+                    self._conn.execute(
+                        "SELECT key, vector FROM embeddings"
+                        f" WHERE key IN ({','.join('?' * len(chunk))})",
+                        chunk,
+                    ).fetchall()
+                )
+            self._touch(missing)
+        for key, blob in rows:
+            vector = array("d", blob).tolist()
+            self.memory.set(key, vector)
+            found[key] = vector
+        return found
+
+    def _store(self, vectors: Dict[str, List[float]]):
+        now = time.time()
+        with self._lock, self._conn:
+            self._flush_touched()
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)",
+                [
+                    (key, array("d", vector).tobytes(), now)
+                    for key, vector in vectors.items()
+                ],
+            )
+            overflow = (
+                self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+                - self.max_entries
+            )
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN ("
+                    " SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                    (overflow,),
+                )
+                self.evictions += overflow
+        for key, vector in vectors.items():
+            self.memory.set(key, vector)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._key(text) for text in texts]
+        vectors = self._load(list(dict.fromkeys(keys)))
+
+        pending = {key: text for key, text in zip(keys, texts) if key not in vectors}
+        self.hits += len(keys) - len(pending)
+        self.misses += len(pending)
+        if pending:
+            computed = self.embeddings.embed_documents(list(pending.values()))
+            fresh = dict(zip(pending, computed))
+            self._store(fresh)
+            vectors.update(fresh)
+        return [vectors[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self._key(text)
+        vector = self._load([key]).get(key)
+        if vector is not None:
+            self.hits += 1
+            return vector
+        self.misses += 1
+        vector = self.embeddings.embed_query(text)
+        self._store({key: vector})
+        return vector
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "size": size,
+            "memory_size": len(self.memory),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,208 @@
+import asyncio
+import logging
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from app.config import settings
+from app.models.itinerary import Itinerary
+from app.models.job import GenerationJob, ItineraryGenerationRequest, JobStatus
+
+logger = logging.getLogger(__name__)
+
+# report(stage, progress, **job_fields), e.g. report("saving", 0.9, route_report=r)
+ProgressReporter = Callable[..., Awaitable[None]]
+JobHandler = Callable[[GenerationJob, ProgressReporter], Awaitable[Itinerary]]
+
+
+class JobQueueFullError(Exception):
+    pass
+
+
+class UserJobLimitError(Exception):
+    pass
+
+
+class InMemoryJobStore:
+    """Process-local job store; finished jobs are pruned oldest-first."""
+
+    def __init__(self, max_jobs: int = settings.GENERATION_JOB_RETENTION):
+        self.max_jobs = max_jobs
+        self.jobs: "OrderedDict[str, GenerationJob]" = OrderedDict()
+        self.versions: Dict[str, int] = {}
+
+    def get(self, job_id: str) -> Optional[GenerationJob]:
+        return self.jobs.get(job_id)
+
+    def version(self, job_id: str) -> int:
+        return self.versions.get(job_id, 0)
+
+    def unfinished(self) -> List[GenerationJob]:
+        return [job for job in self.jobs.values() if not job.is_finished]
+
+    def save(self, job: GenerationJob):
+        self.jobs[job.id] = job
+        self.versions[job.id] = self.version(job.id) + 1
+        self._prune()
+
+    def _prune(self):
+        overflow = len(self.jobs) - self.max_jobs
+        if overflow <= 0:
+            return
+        finished = [job_id for job_id, job in self.jobs.items() if job.is_finished]
+        for job_id in finished[:overflow]:
+            del self.jobs[job_id]
+            del self.versions[job_id]
+
+
+class JobQueue:
+    def __init__(
+        self,
+        workers: int = settings.GENERATION_WORKERS,
+        max_queue_size: int = settings.GENERATION_QUEUE_SIZE,
+        max_jobs_per_user: int = settings.GENERATION_MAX_JOBS_PER_USER,
+        store: Optional[InMemoryJobStore] = None,
+    ):
+        self.workers = workers
+        self.max_queue_size = max_queue_size
+        self.max_jobs_per_user = max_jobs_per_user
+        self.store = store or InMemoryJobStore()
+        self._handlers: Dict[str, JobHandler] = {}
+        self._active_per_user: Dict[str, int] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._changed: Optional[asyncio.Condition] = None
+        self._worker_tasks: List[asyncio.Task] = []
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        # Queues and conditions are bound to the loop that created them, so a
+        # new loop (e.g. a fresh test client) gets a fresh set of workers.
+        self._loop = loop
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._changed = asyncio.Condition()
+        self._worker_tasks = [
+            loop.create_task(self._worker()) for _ in range(self.workers)
+        ]
+        # Nothing left from the old loop will run, so settle those jobs and
+        # give their users their slots back
+        for job in self.store.unfinished():
+            self.store.save(
+                job.model_copy(
+                    update={
+                        "status": JobStatus.FAILED,
+                        "stage": "failed",
+                        "error": "Generation queue restarted before the job finished",
+                        "updated_at": datetime.utcnow(),
+                    }
+                )
+            )
+        self._handlers.clear()
+        self._active_per_user.clear()
+
+    async def stop(self):
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+        self._loop = None
+
+    async def submit(
+        self,
+        user_id: str,
+        request: ItineraryGenerationRequest,
+        handler: JobHandler,
+    ) -> GenerationJob:
+        await self.start()
+        active = self._active_per_user.get(user_id, 0)
+        if active >= self.max_jobs_per_user:
+            raise UserJobLimitError(
+                f"User already has {self.max_jobs_per_user} generation jobs in progress"
+            )
+        if self._queue.full():
+            raise JobQueueFullError("Generation queue is full, try again later")
+
+        # No awaits from here on, so the queue cannot fill up under us.
+        job = GenerationJob(id=str(uuid.uuid4()), user_id=user_id, request=request)
+        self._handlers[job.id] = handler
+        self._active_per_user[user_id] = active + 1
+        self.store.save(job)
+        self._queue.put_nowait(job.id)
+        return job
+
+    def get(self, job_id: str) -> Optional[GenerationJob]:
+        return self.store.get(job_id)
+
+    async def watch(self, job_id: str) -> AsyncIterator[GenerationJob]:
+        await self.start()
+        seen = -1
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: self.store.version(job_id) != seen)
+                seen = self.store.version(job_id)
+                job = self.store.get(job_id)
+            if job is None:
+                return
+            yield job
+            if job.is_finished:
+                return
+
+    async def _save(self, job: GenerationJob):
+        job.updated_at = datetime.utcnow()
+        async with self._changed:
+            self.store.save(job)
+            self._changed.notify_all()
+
+    async def _update(self, job_id: str, **changes):
+        job = self.store.get(job_id)
+        if job is not None:
+            await self._save(job.model_copy(update=changes))
+
+    def _release(self, user_id: str):
+        # A restart may already have reset the count
+        active = self._active_per_user.pop(user_id, 0) - 1
+        if active > 0:
+            self._active_per_user[user_id] = active
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            job = self.store.get(job_id)
+            handler = self._handlers.pop(job_id, None)
+            try:
+                if job is None or handler is None:
+                    continue
+                await self._update(
+                    job_id, status=JobStatus.RUNNING, stage="running", progress=0
+                )
+
+                async def report(stage: str, progress: float, **details):
+                    await self._update(
+                        job_id, stage=stage, progress=progress, **details
+                    )
+
+                result = await handler(self.store.get(job_id), report)
+                await self._update(
+                    job_id,
+                    status=JobStatus.SUCCEEDED,
+                    stage="completed",
+                    progress=1,
+                    result=result,
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Generation job {job_id} failed: {e}")
+                await self._update(
+                    job_id, status=JobStatus.FAILED, stage="failed", error=str(e)
+                )
+            finally:
+                if job is not None:
+                    self._release(job.user_id)
+                self._queue.task_done()
+
+
+job_queue = JobQueue()
@@ -0,0 +1,96 @@
+import json
+from typing import List, Tuple
+
+CLOSERS = {"{": "}", "[": "]"}
+PYTHON_LITERALS = {"True": "true", "False": "false", "None": "null"}
+
+
+def _close(text: str, stack: List[str]) -> str:
+    text = text.rstrip()
+    if text.endswith(","):
+        text = text[:-1]
+    elif text.endswith(":"):
+        text += " null"
+    return text + "".join(CLOSERS[opener] for opener in reversed(stack))
+
+
+def repair_json(text: str) -> str:
+    """Best-effort fix for near-miss JSON from a language model.
+
+    Handles the usual ways a generation misses: prose or code fences around
+    the object, trailing commas, Python literals, raw newlines in strings
+    and output truncated mid-value (cut back to the last complete member
+    and closed). The result is not guaranteed to parse; callers validate it
+    as usual.
+    """
+    start = min(
+        (pos for pos in (text.find("{"), text.find("[")) if pos != -1), default=-1
+    )
+    if start == -1:
+        return text
+
+    out: List[str] = []
+    stack: List[str] = []
+    # Where each member-separating comma was emitted, and what was open there
+    cuts: List[Tuple[int, List[str]]] = []
+    in_string = escaped = False
+    pos = start
+    while pos < len(text):
+        char = text[pos]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+            elif char == "\n":
+                char = "\\n"
+            out.append(char)
+            pos += 1
+            continue
+
+        if char == '"':
+            in_string = True
+        elif char in CLOSERS:
+            stack.append(char)
+        elif char in "}]":
+            # Drop a trailing comma before the closing bracket
+            while out and out[-1].isspace():
+                out.pop()
+            if out and out[-1] == ",":
+                out.pop()
+            if stack:
+                stack.pop()
+            out.append(char)
+            if not stack:
+                break
+            pos += 1
+            continue
+        elif char == ",":
+            cuts.append((len(out), list(stack)))
+        elif char.isalpha():
+            word_end = pos
+            while word_end < len(text) and text[word_end].isalpha():
+                word_end += 1
+            word = text[pos:word_end]
+            out.append(PYTHON_LITERALS.get(word, word))
+            pos = word_end
+            continue
+        out.append(char)
+        pos += 1
+
+    repaired = "".join(out)
+    if not stack:
+        return repaired
+
+    # Truncated: close what is open, or cut back to the last complete member
+    candidates = [_close(repaired + ('"' if in_string else ""), stack)]
+    candidates += [_close("".join(out[:end]), opened) for end, opened in cuts[::-1]]
+    for candidate in candidates:
+        try:
+            json.loads(candidate)
+        except ValueError:
+            continue
+        return candidate
+    return candidates[0]
@@ -1,66 +1,625 @@
-from typing import Any, Dict, List
+import hashlib
+import json
+import logging
+import math
+import threading
+import time
+import uuid
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Type,
+    TypeVar,
+    Union,
+)
 
+from app.config import settings
 from app.models.destination import Destination
-from app.models.itinerary import Itinerary
+from app.models.itinerary import (
+    DestinationInItinerary,
+    Itinerary,
+    ItinerarySkeleton,
+    StopDetails,
+)
 from app.models.user import UserPreferences
+from app.services.cache import TTLCache
+from app.services.destination_cache import destination_cache
+from app.services.json_repair import repair_json
+from app.services.prompt_context import PromptContextBuilder, estimate_tokens
+from app.services.prompts import PromptRegistry, prompt_registry
+from app.services.stream_parser import IncrementalItineraryParser, StreamEvent
 from app.services.vector_store import vector_store_service
-from langchain.chains import LLMChain
-from langchain.output_parsers import PydanticOutputParser
-from langchain.prompts import PromptTemplate
 from langchain_ollama import OllamaLLM
+from pydantic import BaseModel, ValidationError
+
+logger = logging.getLogger(__name__)
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+# Preference fields that are semantically sets, so their order is irrelevant
+UNORDERED_PREFERENCE_FIELDS = {
+    "interests",
+    "preferred_activities",
+    "accessibility_needs",
+    "preferred_transportation",
+    "dietary_restrictions",
+    "language_preferences",
+}
+
+
+def normalize_prompt_input(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        value = value.model_dump(mode="json")
+    if isinstance(value, dict):
+        return {
+            str(key): (
+                sorted(normalize_prompt_input(item) for item in val or [])
+                if key in UNORDERED_PREFERENCE_FIELDS
+                else normalize_prompt_input(val)
+            )
+            for key, val in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        return [normalize_prompt_input(item) for item in value]
+    if isinstance(value, str):
+        return " ".join(value.lower().split())
+    if isinstance(value, float):
+        return round(value, 2)
+    return value
+
+
+def prompt_cache_key(*parts: Any) -> str:
+    normalized = json.dumps(
+        normalize_prompt_input(list(parts)), sort_keys=True, default=str
+    )
+    return hashlib.sha256(normalized.encode()).hexdigest()
+
+
+def cosine_similarity(a: List[float], b: List[float]) -> float:
+    dot = math.fsum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(math.fsum(x * x for x in a)) * math.sqrt(
+        math.fsum(y * y for y in b)
+    )
+    return dot / norm if norm else 0.0
+
+
+class LLMResponseCache:
+    """Caches validated generations by a normalized hash of the prompt inputs.
+
+    Itinerary lookups that miss exactly can fall back to the closest cached
+    preference set for the same destinations and duration, as long as its
+    embedding is within ``similarity_threshold`` and the budget is within
+    ``budget_tolerance``.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = settings.LLM_CACHE_MAX_ENTRIES,
+        ttl_seconds: float = settings.LLM_CACHE_TTL_SECONDS,
+        similarity_threshold: Optional[float] = settings.LLM_CACHE_SIMILARITY,
+        budget_tolerance: float = 0.1,
+        embed=None,
+    ):
+        self.entries = TTLCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+        self.similarity_threshold = similarity_threshold
+        self.budget_tolerance = budget_tolerance
+        self.embed = embed
+        self.semantic_hits = 0
+        # partition -> cache key -> (preference embedding, budget)
+        self._semantic_index: Dict[str, OrderedDict] = defaultdict(OrderedDict)
+        self._lock = threading.Lock()
+
+    @property
+    def semantic_enabled(self) -> bool:
+        return self.embed is not None and self.similarity_threshold is not None
+
+    def get(self, key: str) -> Optional[BaseModel]:
+        value = self.entries.get(key)
+        return value.model_copy(deep=True) if value is not None else None
+
+    def set(self, key: str, value: BaseModel):
+        self.entries.set(key, value.model_copy(deep=True))
+
+    def get_similar(
+        self, partition: str, vector: List[float], budget: float
+    ) -> Optional[BaseModel]:
+        best_key, best_score = None, self.similarity_threshold
+        with self._lock:
+            candidates = self._semantic_index.get(partition, {})
+            for key, (candidate, candidate_budget) in list(candidates.items()):
+                if key not in self.entries:
+                    del candidates[key]
+                    continue
+                if abs(candidate_budget - budget) > self.budget_tolerance * max(
+                    budget, candidate_budget
+                ):
+                    continue
+                score = cosine_similarity(vector, candidate)
+                if score >= best_score:
+                    best_key, best_score = key, score
+        if best_key is None:
+            return None
+        value = self.get(best_key)
+        if value is not None:
+            self.semantic_hits += 1
+        return value
+
+    def index(self, partition: str, key: str, vector: List[float], budget: float):
+        with self._lock:
+            candidates = self._semantic_index[partition]
+            candidates[key] = (vector, budget)
+            while len(candidates) > self.entries.max_entries:
+                candidates.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self.entries.stats()
+        stats["semantic_hits"] = self.semantic_hits
+        return stats
+
+
+@lru_cache(maxsize=None)
+def _json_schema(model_cls: Type[BaseModel]) -> Dict[str, Any]:
+    return model_cls.model_json_schema()
+
+
+def output_format(model_cls: Type[BaseModel]) -> Union[str, Dict[str, Any]]:
+    """Ollama ``format`` constraining generation to ``model_cls``'s schema.
+
+    Schema-constrained decoding needs Ollama 0.5+; with
+    ``LLM_SCHEMA_FORMAT`` off, plain JSON mode still guarantees syntax.
+    """
+    return _json_schema(model_cls) if settings.LLM_SCHEMA_FORMAT else "json"
+
+
+def validate_output(model_cls: Type[ModelT], text: str) -> Tuple[ModelT, bool]:
+    """The validated output, and whether it needed a repair pass first."""
+    try:
+        return model_cls.model_validate_json(text), False
+    except ValidationError:
+        repaired = repair_json(text)
+        if repaired == text:
+            raise
+    return model_cls.model_validate_json(repaired), True
+
+
+class ModelMetrics:
+    def __init__(self):
+        self.calls = 0
+        self.repaired_outputs = 0
+        self.invalid_outputs = 0
+        self.fallbacks = 0
+        self.wasted_tokens = 0
+        self.seconds = 0.0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "repaired_outputs": self.repaired_outputs,
+            "invalid_outputs": self.invalid_outputs,
+            "fallbacks": self.fallbacks,
+            "retry_rate": self.fallbacks / self.calls if self.calls else 0.0,
+            "wasted_tokens": self.wasted_tokens,
+            "mean_latency_seconds": self.seconds / self.calls if self.calls else 0.0,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "tokens_per_second": (
+                self.completion_tokens / self.seconds if self.seconds else 0.0
+            ),
+        }
+
+
+class ModelRouter:
+    """Routes each task to a model tier.
+
+    ``models`` maps tier names to Ollama models, smallest first. When a
+    tier's output fails validation the call is retried on the next larger
+    tier, so cheap tasks only pay for the large model when the small one
+    gets them wrong.
+    """
+
+    def __init__(
+        self,
+        models: Dict[str, str] = settings.LLM_MODELS,
+        task_tiers: Dict[str, str] = settings.LLM_TASK_TIERS,
+        llm_factory: Callable[[str], Any] = lambda model: OllamaLLM(model=model),
+        seed_temperature: float = settings.LLM_SEED_TEMPERATURE,
+    ):
+        self.tiers = list(models)
+        self.seed_temperature = seed_temperature
+        self.model_names = dict(models)
+        self.models = {tier: llm_factory(name) for tier, name in models.items()}
+        self.task_tiers = task_tiers
+        self.metrics: Dict[str, ModelMetrics] = defaultdict(ModelMetrics)
+        self._lock = threading.Lock()
+
+    def tiers_for(self, task: str) -> List[str]:
+        """The task's tier followed by every larger one; tasks without a
+        configured tier use the largest."""
+        tier = self.task_tiers.get(task)
+        if tier not in self.model_names:
+            tier = self.tiers[-1]
+        return self.tiers[self.tiers.index(tier) :]
+
+    def _record(
+        self,
+        task: str,
+        tier: str,
+        seconds: float,
+        prompt_tokens: int,
+        completion_tokens: int,
+        repaired: bool = False,
+        invalid: bool = False,
+        fallback: bool = False,
+    ):
+        with self._lock:
+            metrics = self.metrics[self.model_names[tier]]
+            metrics.calls += 1
+            metrics.seconds += seconds
+            metrics.prompt_tokens += prompt_tokens
+            metrics.completion_tokens += completion_tokens
+            metrics.repaired_outputs += repaired
+            metrics.invalid_outputs += invalid
+            metrics.fallbacks += fallback
+            if invalid:
+                metrics.wasted_tokens += completion_tokens
+        logger.info(
+            f"{task} on {self.model_names[tier]}: {prompt_tokens} prompt tokens, "
+            f"{completion_tokens} completion tokens, {seconds:.2f}s"
+        )
+
+    def invoke(
+        self,
+        task: str,
+        prompt: str,
+        model_cls: Type[ModelT],
+        seed: Optional[int] = None,
+    ) -> ModelT:
+        """The validated output of the first tier that produces one.
+
+        With a ``seed``, sampling uses it at ``seed_temperature`` so the same
+        prompt gives the same output on the same model and server.
+        """
+        params = {"format": output_format(model_cls)}
+        if seed is not None:
+            # Replaces OllamaLLM's default options, which are all unset
+            params["options"] = {"seed": seed, "temperature": self.seed_temperature}
+        tiers = self.tiers_for(task)
+        for position, tier in enumerate(tiers):
+            started = time.perf_counter()
+            result = self.models[tier].generate([prompt], **params)
+            seconds = time.perf_counter() - started
+            generation = result.generations[0][0]
+            info = generation.generation_info or {}
+            prompt_tokens = info.get("prompt_eval_count") or estimate_tokens(prompt)
+            completion_tokens = info.get("eval_count") or estimate_tokens(
+                generation.text
+            )
+            try:
+                parsed, repaired = validate_output(model_cls, generation.text)
+            except ValidationError:
+                last = position == len(tiers) - 1
+                self._record(
+                    task,
+                    tier,
+                    seconds,
+                    prompt_tokens,
+                    completion_tokens,
+                    invalid=True,
+                    fallback=not last,
+                )
+                if last:
+                    raise
+                logger.warning(
+                    f"{self.model_names[tier]} output for {task} failed validation, "
+                    f"falling back to {self.model_names[tiers[position + 1]]}"
+                )
+                continue
+            self._record(
+                task, tier, seconds, prompt_tokens, completion_tokens, repaired=repaired
+            )
+            return parsed
+
+    def stream(
+        self, task: str, prompt: str, model_cls: Type[BaseModel]
+    ) -> Iterator[str]:
+        """Streams from the task's own tier; there is no fallback once tokens
+        have been sent."""
+        tier = self.tiers_for(task)[0]
+        started = time.perf_counter()
+        completion_tokens = 0
+        for token in self.models[tier].stream(prompt, format=output_format(model_cls)):
+            completion_tokens += estimate_tokens(token)
+            yield token
+        self._record(
+            task,
+            tier,
+            time.perf_counter() - started,
+            estimate_tokens(prompt),
+            completion_tokens,
+        )
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {model: m.as_dict() for model, m in self.metrics.items()}
 
 
 class LLMService:
-    def __init__(self, model_name: str = "llama3.1:8b"):
-        self.llm = OllamaLLM(model=model_name)
+    def __init__(
+        self,
+        router: Optional[ModelRouter] = None,
+        cache: Optional[LLMResponseCache] = None,
+        prompts: PromptRegistry = prompt_registry,
+        hierarchical_min_days: int = settings.LLM_HIERARCHICAL_MIN_DAYS,
+        stop_workers: int = settings.GENERATION_WORKERS,
+        context: Optional[PromptContextBuilder] = None,
+    ):
+        self.router = router or ModelRouter()
+        self.context = context or PromptContextBuilder()
+        self.hierarchical_min_days = hierarchical_min_days
+        self.stop_workers = stop_workers
+        self.cache = cache or LLMResponseCache(
+            embed=vector_store_service.embeddings.embed_query
+        )
+
+        # Templates and their format instructions are compiled once, not per call
+        self.destination_info_version = prompts.active_version("destination_info")
+        self.destination_info_prompt = prompts.get(
+            "destination_info", self.destination_info_version
+        )
+        self.itinerary_version = prompts.active_version("itinerary")
+        self.itinerary_prompt = prompts.get("itinerary", self.itinerary_version)
+        self.skeleton_version = prompts.active_version("itinerary_skeleton")
+        self.skeleton_prompt = prompts.get("itinerary_skeleton", self.skeleton_version)
+        self.stop_version = prompts.active_version("itinerary_stop")
+        self.stop_prompt = prompts.get("itinerary_stop", self.stop_version)
 
     def generate_destination_info(self, scraped_data: Dict[str, Any]) -> Destination:
+        cache_key = prompt_cache_key(
+            "destination_info", self.destination_info_version, scraped_data
+        )
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        destination = self._generate_destination_info(scraped_data)
+        self.cache.set(cache_key, destination)
+        return destination
+
+    def _generate_destination_info(self, scraped_data: Dict[str, Any]) -> Destination:
         relevant_info = vector_store_service.get_relevant_info(
             scraped_data["name"], scraped_data["country"]
         )
 
-        parser = PydanticOutputParser(pydantic_object=Destination)
-        prompt = PromptTemplate(
-            template="Generate comprehensive destination information for {name}, {country} based on the following scraped and relevant data:\n\nScraped Data: {scraped_data}\n\nRelevant Information: {relevant_info}\n\n{format_instructions}\n",
-            input_variables=["name", "country", "scraped_data", "relevant_info"],
-            partial_variables={"format_instructions": parser.get_format_instructions()},
+        # The scraped item and the retrieved documents share the budget
+        budget = self.context.token_budget // 2
+        return self.router.invoke(
+            "destination_info",
+            self.destination_info_prompt.format(
+                name=scraped_data["name"],
+                country=scraped_data["country"],
+                scraped_data=self.context.scraped_data(scraped_data, budget),
+                relevant_info=self.context.text(relevant_info, budget),
+            ),
+            Destination,
         )
-        chain = LLMChain(llm=self.llm, prompt=prompt)
-        output = chain.run(
-            name=scraped_data["name"],
-            country=scraped_data["country"],
-            scraped_data=scraped_data,
-            relevant_info=relevant_info,
+
+    def _destination_rows(
+        self,
+        destinations: List[str],
+        destination_details: Optional[List[Dict[str, Any]]],
+    ) -> List[Dict[str, Any]]:
+        """Rows for ``destinations``, from ``destination_details`` or else the
+        destination cache; a name with neither is passed on as is."""
+        by_name = {row["name"]: row for row in destination_details or []}
+        return [
+            by_name.get(name) or destination_cache.get_by_name(name) or {"name": name}
+            for name in destinations
+        ]
+
+    def _itinerary_prompt(
+        self,
+        user_preferences: UserPreferences,
+        destinations: List[str],
+        duration: int,
+        destination_details: Optional[List[Dict[str, Any]]] = None,
+    ) -> str:
+        return self.itinerary_prompt.format(
+            destinations=", ".join(destinations),
+            duration=duration,
+            user_preferences=user_preferences.model_dump_json(),
+            destinations_info=self.context.destinations(
+                self._destination_rows(destinations, destination_details)
+            ),
+        )
+
+    def _cached_itinerary(
+        self,
+        user_preferences: UserPreferences,
+        destinations: List[str],
+        duration: int,
+        seed: Optional[int] = None,
+    ) -> Tuple[Optional[Itinerary], Any]:
+        # The requesting user is not part of the prompt, so leave it out of the key
+        preferences = user_preferences.model_dump(mode="json", exclude={"user_id"})
+        partition = prompt_cache_key(
+            "itinerary",
+            self.itinerary_version,
+            self.skeleton_version,
+            self.stop_version,
+            destinations,
+            duration,
+            # A seeded generation only reuses output of the same seed
+            seed,
         )
-        return Destination.model_validate_json(output)
+        key = prompt_cache_key(partition, preferences)
+        vector = None
+
+        itinerary = self.cache.get(key)
+        if itinerary is None and self.cache.semantic_enabled:
+            try:
+                vector = self.cache.embed(
+                    json.dumps(normalize_prompt_input(preferences), sort_keys=True)
+                )
+                itinerary = self.cache.get_similar(
+                    partition, vector, user_preferences.budget
+                )
+            except Exception as e:
+                logger.warning(f"Semantic cache lookup failed: {e}")
+
+        if itinerary is not None:
+            # A hit is a new trip for this user, not the row it was first saved as
+            now = datetime.now(timezone.utc)
+            itinerary.id = str(uuid.uuid4())
+            itinerary.user_id = user_preferences.user_id
+            itinerary.created_at = itinerary.updated_at = now
+
+        def store(result: Itinerary):
+            self.cache.set(key, result)
+            if vector is not None:
+                self.cache.index(partition, key, vector, user_preferences.budget)
+
+        return itinerary, store
 
     def generate_itinerary(
-        self, user_preferences: UserPreferences, destinations: List[str], duration: int
+        self,
+        user_preferences: UserPreferences,
+        destinations: List[str],
+        duration: int,
+        destination_details: Optional[List[Dict[str, Any]]] = None,
+        seed: Optional[int] = None,
     ) -> Itinerary:
-        destinations_info = []
-        for dest in destinations:
-            dest_info = vector_store_service.get_destination_info(dest)
-            destinations_info.append(dest_info)
-
-        parser = PydanticOutputParser(pydantic_object=Itinerary)
-        prompt = PromptTemplate(
-            template="Generate a detailed itinerary for a {duration}-day trip to the following destinations: {destinations}\n\nUser Preferences: {user_preferences}\n\nDestination Information: {destinations_info}\n\nPlease create an itinerary that takes into account the user's preferences, the specific details of each destination, and ensures a logical and enjoyable travel sequence. Include specific activities, accommodations, and travel methods between destinations.\n\n{format_instructions}\n",
-            input_variables=[
-                "destinations",
-                "duration",
-                "user_preferences",
-                "destinations_info",
-            ],
-            partial_variables={"format_instructions": parser.get_format_instructions()},
+        itinerary, store = self._cached_itinerary(
+            user_preferences, destinations, duration, seed
         )
-        chain = LLMChain(llm=self.llm, prompt=prompt)
-        output = chain.run(
-            destinations=", ".join(destinations),
-            duration=duration,
-            user_preferences=user_preferences.model_dump_json(),
-            destinations_info=destinations_info,
+        if itinerary is not None:
+            return itinerary
+
+        if duration >= self.hierarchical_min_days and len(destinations) > 1:
+            itinerary = self._generate_hierarchical(
+                user_preferences, destinations, duration, destination_details, seed
+            )
+        else:
+            itinerary = self.router.invoke(
+                "itinerary",
+                self._itinerary_prompt(
+                    user_preferences, destinations, duration, destination_details
+                ),
+                Itinerary,
+                seed,
+            )
+        store(itinerary)
+        return itinerary
+
+    def _generate_hierarchical(
+        self,
+        user_preferences: UserPreferences,
+        destinations: List[str],
+        duration: int,
+        destination_details: Optional[List[Dict[str, Any]]] = None,
+        seed: Optional[int] = None,
+    ) -> Itinerary:
+        """Plans the stop order and dates in one short call, then fills in
+        every stop concurrently.
+
+        Each completion stays small however long the trip is, and the stop
+        calls overlap on the Ollama server instead of decoding one long
+        itinerary token by token.
+        """
+        rows = self._destination_rows(destinations, destination_details)
+        preferences = user_preferences.model_dump_json()
+        skeleton = self.router.invoke(
+            "itinerary_skeleton",
+            self.skeleton_prompt.format(
+                destinations=", ".join(destinations),
+                duration=duration,
+                user_preferences=preferences,
+                destinations_info=self.context.destinations(rows),
+            ),
+            ItinerarySkeleton,
+            seed,
+        )
+        rows_by_destination = {row["name"]: row for row in rows}
+
+        def fill(position: int) -> StopDetails:
+            stop = skeleton.destinations[position]
+            row = rows_by_destination.get(stop.destination_id)
+            previous = (
+                skeleton.destinations[position - 1].destination_id
+                if position
+                else "none, this is the first stop"
+            )
+            return self.router.invoke(
+                "itinerary_stop",
+                self.stop_prompt.format(
+                    title=skeleton.title,
+                    theme=skeleton.theme.value,
+                    destination=stop.destination_id,
+                    arrival_time=stop.arrival_time.isoformat(),
+                    departure_time=stop.departure_time.isoformat(),
+                    previous_destination=previous,
+                    user_preferences=preferences,
+                    destination_info=self.context.destinations([row]) if row else "",
+                ),
+                StopDetails,
+                seed,
+            )
+
+        with ThreadPoolExecutor(max_workers=self.stop_workers) as pool:
+            details = list(pool.map(fill, range(len(skeleton.destinations))))
+
+        now = datetime.now(timezone.utc)
+        return Itinerary.model_validate(
+            {
+                **skeleton.model_dump(exclude={"destinations"}),
+                "id": str(uuid.uuid4()),
+                "user_id": user_preferences.user_id,
+                "destinations": [
+                    DestinationInItinerary(**stop.model_dump(), **detail.model_dump())
+                    for stop, detail in zip(skeleton.destinations, details)
+                ],
+                "created_at": now,
+                "updated_at": now,
+            }
+        )
+
+    def stream_itinerary(
+        self,
+        user_preferences: UserPreferences,
+        destinations: List[str],
+        duration: int,
+        destination_details: Optional[List[Dict[str, Any]]] = None,
+    ) -> Iterator[StreamEvent]:
+        itinerary, store = self._cached_itinerary(
+            user_preferences, destinations, duration
+        )
+        if itinerary is not None:
+            for destination in itinerary.destinations:
+                yield StreamEvent("destination", destination)
+            yield StreamEvent("itinerary", itinerary)
+            return
+
+        parser = IncrementalItineraryParser()
+        prompt = self._itinerary_prompt(
+            user_preferences, destinations, duration, destination_details
         )
-        return Itinerary.model_validate_json(output)
+        for token in self.router.stream("itinerary", prompt, Itinerary):
+            yield StreamEvent("token", token)
+            for destination in parser.feed(token):
+                yield StreamEvent("destination", destination)
+        itinerary, _ = validate_output(Itinerary, parser.text)
+        store(itinerary)
+        yield StreamEvent("itinerary", itinerary)
 
 
 llm_service = LLMService()
@@ -0,0 +1,182 @@
+import json
+import logging
+import os
+from typing import Any, Dict, List, Optional
+
+from app.config import settings
+
+try:
+    from tokenizers import Tokenizer
+except ImportError:  # Token counts fall back to a characters-per-token estimate
+    Tokenizer = None
+
+logger = logging.getLogger(__name__)
+
+# Destination fields an itinerary prompt uses; ids, timestamps and
+# coordinates only cost tokens
+ITINERARY_FIELDS = (
+    "name",
+    "description",
+    "timezone",
+    "best_seasons",
+    "safety_rating",
+    "popular_events",
+)
+# The same for every destination in a country, so listed once per country
+COUNTRY_FIELDS = ("currency", "local_currency", "languages")
+SCRAPED_FIELDS = ("name", "country", "is_capital", "description")
+TRUNCATION_MARK = "…"
+
+
+def estimate_tokens(text: str) -> int:
+    # Roughly four characters per token for English text
+    return max(1, len(text) // 4) if text else 0
+
+
+def compact_json(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def _present(value: Any) -> bool:
+    return value not in (None, "", [], {})
+
+
+def summarize_country(country: Dict[str, Any]) -> Dict[str, Any]:
+    """The parts of a REST Countries record a destination prompt uses."""
+    name = country.get("name")
+    languages = country.get("languages")
+    currencies = country.get("currencies")
+    summary = {
+        "name": name.get("common") if isinstance(name, dict) else name,
+        "capital": country.get("capital"),
+        "region": country.get("region"),
+        "subregion": country.get("subregion"),
+        "population": country.get("population"),
+        "languages": (
+            sorted(languages.values()) if isinstance(languages, dict) else languages
+        ),
+        "currencies": (
+            [f"{c.get('name', code)} ({code})" for code, c in currencies.items()]
+            if isinstance(currencies, dict)
+            else currencies
+        ),
+        "timezones": country.get("timezones"),
+    }
+    return {key: value for key, value in summary.items() if _present(value)}
+
+
+class TokenCounter:
+    """Counts and truncates text by tokens.
+
+    ``tokenizer`` is a Hugging Face ``tokenizer.json`` path or hub name
+    matching the served model; without one, counts are estimated.
+    """
+
+    def __init__(self, tokenizer: Optional[str] = settings.LLM_TOKENIZER):
+        self.tokenizer = None
+        if tokenizer and Tokenizer is not None:
+            try:
+                self.tokenizer = (
+                    Tokenizer.from_file(tokenizer)
+                    if os.path.exists(tokenizer)
+                    else Tokenizer.from_pretrained(tokenizer)
+                )
+            except Exception as e:
+                logger.warning(f"Could not load tokenizer {tokenizer}: {e}")
+
+    def count(self, text: str) -> int:
+        if self.tokenizer is None:
+            return estimate_tokens(text)
+        return len(self.tokenizer.encode(text, add_special_tokens=False).ids)
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """``text`` cut to at most ``max_tokens``, marked where it was cut."""
+        if self.tokenizer is None:
+            if estimate_tokens(text) <= max_tokens:
+                return text
+            cut = max(max_tokens - 1, 0) * 4
+            # End on a word boundary when there is one nearby
+            space = text.rfind(" ", 0, cut)
+            if space > cut // 2:
+                cut = space
+        else:
+            offsets = self.tokenizer.encode(text, add_special_tokens=False).offsets
+            if len(offsets) <= max_tokens:
+                return text
+            cut = offsets[max_tokens - 2][1] if max_tokens > 1 else 0
+        return text[:cut].rstrip() + TRUNCATION_MARK if cut else ""
+
+
+class PromptContextBuilder:
+    """Compact prompt context from destination rows and scraped items.
+
+    Only the fields a prompt uses are kept and country-wide data is listed
+    once. Context over its token budget has its descriptions shortened to
+    even shares of what the other fields leave.
+    """
+
+    def __init__(
+        self,
+        counter: Optional[TokenCounter] = None,
+        token_budget: int = settings.LLM_CONTEXT_TOKEN_BUDGET,
+    ):
+        self.counter = counter or TokenCounter()
+        self.token_budget = token_budget
+
+    def destinations(
+        self, rows: List[Dict[str, Any]], budget: Optional[int] = None
+    ) -> str:
+        countries: Dict[str, Dict[str, Any]] = {}
+        entries = []
+        for row in rows:
+            entry = {f: row[f] for f in ITINERARY_FIELDS if _present(row.get(f))}
+            country = row.get("country")
+            if country:
+                entry["country"] = country
+                shared = {f: row[f] for f in COUNTRY_FIELDS if _present(row.get(f))}
+                known = countries.setdefault(country, shared)
+                # Whatever differs from the country's first destination stays here
+                entry.update(
+                    {f: value for f, value in shared.items() if known.get(f) != value}
+                )
+            entries.append(entry)
+        context = {"destinations": entries}
+        if countries:
+            context["countries"] = countries
+        return self._fit(context, entries, budget)
+
+    def scraped_data(self, item: Dict[str, Any], budget: Optional[int] = None) -> str:
+        entry = {f: item[f] for f in SCRAPED_FIELDS if _present(item.get(f))}
+        if _present(item.get("country_data")):
+            entry["country_data"] = summarize_country(item["country_data"])
+        return self._fit(entry, [entry], budget)
+
+    def text(self, text: str, budget: Optional[int] = None) -> str:
+        return self.counter.truncate(text, budget or self.token_budget)
+
+    def _fit(
+        self,
+        context: Dict[str, Any],
+        entries: List[Dict[str, Any]],
+        budget: Optional[int],
+    ) -> str:
+        budget = budget or self.token_budget
+        text = compact_json(context)
+        overflow = self.counter.count(text) - budget
+        if overflow <= 0:
+            return text
+
+        described = [entry for entry in entries if entry.get("description")]
+        lengths = [self.counter.count(entry["description"]) for entry in described]
+        remaining = sum(lengths) - overflow
+        # Even shares, with what short descriptions leave over going to long ones
+        for position, index in enumerate(
+            sorted(range(len(lengths)), key=lengths.__getitem__)
+        ):
+            share = max(remaining, 0) // (len(lengths) - position)
+            keep = min(lengths[index], share)
+            remaining -= keep
+            entry = described[index]
+            entry["description"] = self.counter.truncate(entry["description"], keep)
+        # Escaping can still leave it a few tokens over
+        return self.counter.truncate(compact_json(context), budget)
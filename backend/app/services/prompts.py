@@ -0,0 +1,109 @@
+from typing import Dict, List, Optional, Type
+
+from app.config import settings
+from app.models.destination import Destination
+from app.models.itinerary import Itinerary, ItinerarySkeleton, StopDetails
+from langchain.output_parsers import PydanticOutputParser
+from langchain.prompts import PromptTemplate
+from pydantic import BaseModel
+
+
+class PromptRegistry:
+    """Versioned prompt templates, compiled once at registration.
+
+    The active version of each prompt is the last one registered unless
+    ``settings.PROMPT_VERSIONS`` pins another, e.g. ``{"itinerary": "v2"}``.
+    """
+
+    def __init__(self, pinned_versions: Optional[Dict[str, str]] = None):
+        self.pinned_versions = dict(pinned_versions or {})
+        self._templates: Dict[str, Dict[str, PromptTemplate]] = {}
+        self._latest: Dict[str, str] = {}
+
+    def register(
+        self,
+        name: str,
+        version: str,
+        template: str,
+        input_variables: List[str],
+        output_model: Optional[Type[BaseModel]] = None,
+    ) -> PromptTemplate:
+        partial_variables = {}
+        if output_model is not None:
+            parser = PydanticOutputParser(pydantic_object=output_model)
+            partial_variables["format_instructions"] = parser.get_format_instructions()
+        prompt = PromptTemplate(
+            template=template,
+            input_variables=input_variables,
+            partial_variables=partial_variables,
+        )
+        self._templates.setdefault(name, {})[version] = prompt
+        self._latest[name] = version
+        return prompt
+
+    def get(self, name: str, version: Optional[str] = None) -> PromptTemplate:
+        version = version or self.active_version(name)
+        try:
+            return self._templates[name][version]
+        except KeyError:
+            raise KeyError(f"Unknown prompt {name!r} version {version!r}")
+
+    def active_version(self, name: str) -> str:
+        return self.pinned_versions.get(name) or self._latest[name]
+
+    def versions(self, name: str) -> List[str]:
+        return list(self._templates.get(name, {}))
+
+
+prompt_registry = PromptRegistry(settings.PROMPT_VERSIONS)
+
+prompt_registry.register(
+    "destination_info",
+    "v1",
+    "Generate comprehensive destination information for {name}, {country} based on the following scraped and relevant data:\n\nScraped Data: {scraped_data}\n\nRelevant Information: {relevant_info}\n\n{format_instructions}\n",
+    input_variables=["name", "country", "scraped_data", "relevant_info"],
+    output_model=Destination,
+)
+
+prompt_registry.register(
+    "itinerary",
+    "v1",
+    "Generate a detailed itinerary for a {duration}-day trip to the following destinations: {destinations}\n\nUser Preferences: {user_preferences}\n\nDestination Information: {destinations_info}\n\nPlease create an itinerary that takes into account the user's preferences, the specific details of each destination, and ensures a logical and enjoyable travel sequence. Include specific activities, accommodations, and travel methods between destinations.\n\n{format_instructions}\n",
+    input_variables=[
+        "destinations",
+        "duration",
+        "user_preferences",
+        "destinations_info",
+    ],
+    output_model=Itinerary,
+)
+
+prompt_registry.register(
+    "itinerary_skeleton",
+    "v1",
+    "Plan the outline of a {duration}-day trip to the following destinations: {destinations}\n\nUser Preferences: {user_preferences}\n\nDestination Information: {destinations_info}\n\nChoose a logical visiting order and the arrival and departure time of every stop so that the stops cover all {duration} days. Do not plan accommodation or travel yet.\n\n{format_instructions}\n",
+    input_variables=[
+        "destinations",
+        "duration",
+        "user_preferences",
+        "destinations_info",
+    ],
+    output_model=ItinerarySkeleton,
+)
+
+prompt_registry.register(
+    "itinerary_stop",
+    "v1",
+    "Fill in one stop of the {theme} trip {title}: {destination}, from {arrival_time} to {departure_time}. The previous stop is {previous_destination}.\n\nUser Preferences: {user_preferences}\n\nDestination Information: {destination_info}\n\nChoose accommodation that suits the user's preferences and estimate the travel time in hours and the cost in USD from the previous stop.\n\n{format_instructions}\n",
+    input_variables=[
+        "title",
+        "theme",
+        "destination",
+        "arrival_time",
+        "departure_time",
+        "previous_destination",
+        "user_preferences",
+        "destination_info",
+    ],
+    output_model=StopDetails,
+)
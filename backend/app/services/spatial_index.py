@@ -0,0 +1,171 @@
+import math
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+from app.config import settings
+from app.services.cache import TTLCache
+from app.utils.geo import EARTH_RADIUS_KM, haversine_km, pairwise_distances_km
+
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+HALF_CIRCUMFERENCE_KM = math.pi * EARTH_RADIUS_KM
+
+
+class SpatialIndex:
+    """In-memory lat/lon grid for radius and nearest-neighbour queries.
+
+    Points are bucketed into ``cell_degrees`` cells, so a query only measures
+    the points in cells overlapping the search cap. Query distances are
+    haversine (see ``haversine_km`` for the accuracy bound); the cached
+    pairwise matrices use Vincenty, like the itinerary route metrics.
+    """
+
+    def __init__(
+        self,
+        cell_degrees: float = settings.SPATIAL_INDEX_CELL_DEGREES,
+        matrix_cache_size: int = settings.DISTANCE_MATRIX_CACHE_SIZE,
+    ):
+        self.cell_degrees = cell_degrees
+        self.columns = math.ceil(360 / cell_degrees)
+        self.loaded = False
+        self.version = 0
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._cells: Dict[Tuple[int, int], Set[str]] = defaultdict(set)
+        self._matrices = TTLCache(
+            max_entries=matrix_cache_size, ttl_seconds=float("inf")
+        )
+
+    def _cell(self, latitude: float, longitude: float) -> Tuple[int, int]:
+        row = math.floor((min(latitude, 90.0) + 90) / self.cell_degrees)
+        column = math.floor((longitude + 180) / self.cell_degrees) % self.columns
+        return row, column
+
+    def rebuild(self, entries: Iterable[Dict[str, Any]]):
+        self._entries.clear()
+        self._cells.clear()
+        for entry in entries:
+            self._insert(entry)
+        self.loaded = True
+        self.version += 1
+
+    def _insert(self, entry: Dict[str, Any]):
+        self._entries[entry["id"]] = entry
+        self._cells[self._cell(entry["latitude"], entry["longitude"])].add(entry["id"])
+
+    def upsert(self, entry: Dict[str, Any]):
+        self.remove(entry["id"])
+        self._insert(entry)
+        self.version += 1
+
+    def remove(self, entry_id: str):
+        entry = self._entries.pop(entry_id, None)
+        if entry is None:
+            return
+        cell = self._cell(entry["latitude"], entry["longitude"])
+        self._cells[cell].discard(entry_id)
+        if not self._cells[cell]:
+            del self._cells[cell]
+        self.version += 1
+
+    def get(self, entry_id: str) -> Optional[Dict[str, Any]]:
+        return self._entries.get(entry_id)
+
+    def __contains__(self, entry_id: str) -> bool:
+        return entry_id in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _candidates(self, latitude: float, longitude: float, radius_km: float):
+        # Bounding box of the spherical cap, in cells
+        angular = radius_km / EARTH_RADIUS_KM
+        lat_min = math.degrees(math.radians(latitude) - angular)
+        lat_max = math.degrees(math.radians(latitude) + angular)
+        rows = range(
+            self._cell(max(lat_min, -90.0), 0)[0],
+            self._cell(min(lat_max, 90.0), 0)[0] + 1,
+        )
+        cos_lat = math.cos(math.radians(latitude))
+        if (
+            lat_min <= -90
+            or lat_max >= 90
+            or angular >= math.pi / 2
+            or math.sin(angular) >= cos_lat
+        ):
+            columns = range(self.columns)
+        else:
+            delta = math.degrees(math.asin(math.sin(angular) / cos_lat))
+            first = math.floor((longitude - delta + 180) / self.cell_degrees)
+            last = math.floor((longitude + delta + 180) / self.cell_degrees)
+            columns = (
+                range(self.columns)
+                if last - first + 1 >= self.columns
+                else [column % self.columns for column in range(first, last + 1)]
+            )
+
+        for row in rows:
+            for column in columns:
+                yield from self._cells.get((row, column), ())
+
+    def within(
+        self,
+        latitude: float,
+        longitude: float,
+        radius_km: float,
+        limit: Optional[int] = None,
+        exclude: Optional[str] = None,
+    ) -> List[Tuple[Dict[str, Any], float]]:
+        """Entries within ``radius_km``, nearest first."""
+        ids = [
+            entry_id
+            for entry_id in self._candidates(latitude, longitude, radius_km)
+            if entry_id != exclude
+        ]
+        if not ids:
+            return []
+        entries = [self._entries[entry_id] for entry_id in ids]
+        distances = haversine_km(
+            latitude,
+            longitude,
+            np.array([entry["latitude"] for entry in entries]),
+            np.array([entry["longitude"] for entry in entries]),
+        )
+        order = np.argsort(distances, kind="stable")
+        order = order[distances[order] <= radius_km][:limit]
+        return [(entries[i], float(distances[i])) for i in order]
+
+    def nearest(
+        self,
+        latitude: float,
+        longitude: float,
+        k: int,
+        exclude: Optional[str] = None,
+    ) -> List[Tuple[Dict[str, Any], float]]:
+        # Widen the search cap until it holds k entries; everything nearer
+        # than the k-th one is then inside the cap too
+        radius_km = self.cell_degrees * KM_PER_DEGREE
+        while True:
+            found = self.within(latitude, longitude, radius_km, exclude=exclude)
+            if len(found) >= k or radius_km >= HALF_CIRCUMFERENCE_KM:
+                return found[:k]
+            radius_km *= 2
+
+    def distance_matrix(self, ids: List[str]) -> np.ndarray:
+        """Pairwise Vincenty distances (km) between ``ids``, in that order.
+
+        Cached per index version, so repeated itineraries over the same hot
+        destinations reuse the matrix until one of them moves.
+        """
+        key = (self.version, tuple(ids))
+        matrix = self._matrices.get(key)
+        if matrix is None:
+            matrix = pairwise_distances_km(
+                [self._entries[i]["latitude"] for i in ids],
+                [self._entries[i]["longitude"] for i in ids],
+            )
+            matrix.setflags(write=False)
+            self._matrices.set(key, matrix)
+        return matrix
+
+
+destination_index = SpatialIndex()
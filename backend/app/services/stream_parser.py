@@ -0,0 +1,90 @@
+import logging
+from typing import Any, List, NamedTuple, Optional
+
+from app.models.itinerary import DestinationInItinerary
+from pydantic import ValidationError
+
+logger = logging.getLogger(__name__)
+
+
+class StreamEvent(NamedTuple):
+    event: str
+    data: Any
+
+
+class IncrementalItineraryParser:
+    """Pull completed ``destinations`` entries out of a partial itinerary.
+
+    The parser scans each chunk once, tracking JSON string/escape state and
+    bracket depth, and validates an entry as soon as its closing brace
+    arrives. Anything before the first ``{`` (chatter, code fences) is
+    skipped.
+    """
+
+    def __init__(self, array_key: str = "destinations"):
+        self.array_key = array_key
+        self.text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._string_start = 0
+        self._last_string: Optional[str] = None
+        self._current_key: Optional[str] = None
+        self._array_depth: Optional[int] = None
+        self._element_start: Optional[int] = None
+
+    def feed(self, chunk: str) -> List[DestinationInItinerary]:
+        self.text += chunk
+        completed = []
+        text = self.text
+        for pos in range(self._pos, len(text)):
+            char = text[pos]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    self._last_string = text[self._string_start : pos]
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = pos + 1
+            elif char == ":" and self._depth == 1:
+                self._current_key = self._last_string
+            elif char in "{[":
+                if (
+                    char == "["
+                    and self._depth == 1
+                    and self._current_key == self.array_key
+                ):
+                    self._array_depth = self._depth + 1
+                elif char == "{" and self._depth == self._array_depth:
+                    self._element_start = pos
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if (
+                    char == "}"
+                    and self._element_start is not None
+                    and self._depth == self._array_depth
+                ):
+                    element = self._parse_element(text[self._element_start : pos + 1])
+                    if element is not None:
+                        completed.append(element)
+                    self._element_start = None
+                elif self._array_depth is not None and self._depth < self._array_depth:
+                    self._array_depth = None
+        self._pos = len(text)
+        return completed
+
+    def _parse_element(self, raw: str) -> Optional[DestinationInItinerary]:
+        try:
+            return DestinationInItinerary.model_validate_json(raw)
+        except ValidationError as e:
+            # The final Itinerary validation reports the error properly
+            logger.warning(f"Skipping invalid streamed destination: {e}")
+            return None
@@ -1,11 +1,19 @@
-import httpx
+from typing import Any
+
+import anyio
 from app.config import settings
 from supabase import Client, create_client
 
 
 class SupabaseClientManager:
-    def __init__(self):
+    def __init__(self, max_concurrency: int = settings.SUPABASE_MAX_CONCURRENCY):
         self.client = None
+        # One shared client means one shared httpx connection pool, so every
+        # offloaded query reuses the same keep-alive connections to PostgREST.
+        # The limiter keeps in-flight queries at or below the pool's
+        # keep-alive size so threads never queue on fresh TCP/TLS handshakes.
+        self.max_concurrency = max_concurrency
+        self._limiter = None
 
     def get_client(self) -> Client:
         if self.client is None:
@@ -15,5 +23,15 @@ class SupabaseClientManager:
             )
         return self.client
 
+    @property
+    def limiter(self) -> anyio.CapacityLimiter:
+        if self._limiter is None:
+            self._limiter = anyio.CapacityLimiter(self.max_concurrency)
+        return self._limiter
+
+    async def execute(self, query: Any) -> Any:
+        """Run a postgrest query builder off the event loop."""
+        return await anyio.to_thread.run_sync(query.execute, limiter=self.limiter)
+
 
 supabase_client_manager = SupabaseClientManager()
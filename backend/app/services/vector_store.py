@@ -1,27 +1,131 @@
+import hashlib
+import json
+import os
+from typing import Any, Dict, Iterable, List, Optional
+
+from app.config import settings
 from app.models.destination import Destination
+from app.services.embedding_cache import CachedEmbeddings
 from langchain_chroma import Chroma
+from langchain_core.embeddings import Embeddings
 from langchain_ollama import OllamaEmbeddings
 
 
+def content_hash(text: str, metadata: Dict[str, Any]) -> str:
+    # Metadata counts too, so a rename with the same description is rewritten
+    payload = json.dumps([text, metadata], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
 class VectorStoreService:
-    def __init__(self, model_name: str = "all-minilm"):
-        self.embeddings = OllamaEmbeddings(model=model_name)
+    def __init__(
+        self,
+        model_name: str = "all-minilm",
+        batch_size: int = settings.VECTOR_STORE_BATCH_SIZE,
+        embeddings: Optional[Embeddings] = None,
+        persist_directory: str = "./chroma_db",
+    ):
+        if embeddings is None:
+            embeddings = CachedEmbeddings(
+                OllamaEmbeddings(model=model_name),
+                model_name,
+                os.path.join(persist_directory, "embedding_cache.sqlite3"),
+            )
+        self.embeddings = embeddings
+        self.batch_size = batch_size
         self.vector_store = Chroma(
-            embedding_function=self.embeddings, persist_directory="./chroma_db"
+            embedding_function=self.embeddings, persist_directory=persist_directory
         )
 
-    def add_destination(self, destination: Destination):
-        self.vector_store.add_texts(
-            texts=[destination.description],
+    def _upsert(
+        self, texts: List[str], metadatas: List[Dict[str, Any]], ids: List[str]
+    ) -> int:
+        """Embeds and upserts in chunks, skipping ids whose text and metadata
+        are unchanged.
+
+        Each chunk costs one embedding request and one Chroma write. Returns
+        the number of documents actually written.
+        """
+        written = 0
+        for start in range(0, len(ids), self.batch_size):
+            chunk = slice(start, start + self.batch_size)
+            chunk_ids = ids[chunk]
+            hashes = [
+                content_hash(text, metadata)
+                for text, metadata in zip(texts[chunk], metadatas[chunk])
+            ]
+            existing = self.vector_store.get(ids=chunk_ids, include=["metadatas"])
+            stored_hashes = {
+                id_: (metadata or {}).get("content_hash")
+                for id_, metadata in zip(existing["ids"], existing["metadatas"])
+            }
+            changed = [
+                index
+                for index, (id_, digest) in enumerate(zip(chunk_ids, hashes))
+                if stored_hashes.get(id_) != digest
+            ]
+            if not changed:
+                continue
+            self.vector_store.add_texts(
+                texts=[texts[start + index] for index in changed],
+                metadatas=[
+                    {**metadatas[start + index], "content_hash": hashes[index]}
+                    for index in changed
+                ],
+                ids=[chunk_ids[index] for index in changed],
+            )
+            written += len(changed)
+        return written
+
+    def add_destinations(self, destinations: Iterable[Destination]) -> int:
+        # Last write wins for an id repeated within one call
+        destinations = list({d.id: d for d in destinations if d.description}.values())
+        return self._upsert(
+            texts=[destination.description for destination in destinations],
             metadatas=[
                 {
                     "id": destination.id,
                     "name": destination.name,
                     "country": destination.country,
+                    "latitude": destination.latitude,
+                    "longitude": destination.longitude,
                 }
+                for destination in destinations
             ],
-            ids=[destination.id],
+            ids=[destination.id for destination in destinations],
+        )
+
+    def add_destination(self, destination: Destination):
+        self.add_destinations([destination])
+
+    def add_scraped_items(self, items: Iterable[Dict[str, Any]]) -> int:
+        items = {
+            f"scraped:{item['country']}:{item['name']}": item
+            for item in items
+            if item.get("description")
+        }
+        return self._upsert(
+            texts=[item["description"] for item in items.values()],
+            metadatas=[
+                {
+                    "name": item["name"],
+                    "country": item["country"],
+                    "is_capital": item.get("is_capital", False),
+                    "wikipedia_url": item.get("wikipedia_url", ""),
+                }
+                for item in items.values()
+            ],
+            ids=list(items),
+        )
+
+    def add_scraped_data(self, scraped_data: Dict[str, Any]):
+        self.add_scraped_items([scraped_data])
+
+    def get_relevant_info(self, name: str, country: str, n_results: int = 3) -> str:
+        documents = self.vector_store.similarity_search(
+            f"{name}, {country}", k=n_results
         )
+        return "\n\n".join(document.page_content for document in documents)
 
     def search_destinations(self, query: str, n_results: int = 5):
         return self.vector_store.similarity_search(query, k=n_results)
@@ -0,0 +1,2 @@
+from .country import *
+from .geo import *
@@ -0,0 +1,54 @@
+from typing import Any, Dict, List
+
+import httpx
+from app.models.destination import Season
+
+REST_COUNTRIES_URL = "https://restcountries.com/v3.1"
+OPEN_METEO_URL = "https://api.open-meteo.com/v1/forecast"
+TROPIC_LATITUDE = 23.44
+POLAR_LATITUDE = 60.0
+
+
+def get_country_info(country: str) -> Dict[str, Any]:
+    """Coordinates, timezone, currency, languages and continent of a country."""
+    response = httpx.get(
+        f"{REST_COUNTRIES_URL}/name/{country}",
+        params={"fullText": "true"},
+        timeout=10,
+    )
+    response.raise_for_status()
+    data = response.json()[0]
+    latitude, longitude = data["latlng"]
+    return {
+        "latitude": latitude,
+        "longitude": longitude,
+        "timezone": data["timezones"][0],
+        "currency": next(iter(data.get("currencies", {})), ""),
+        "languages": list(data.get("languages", {}).values()),
+        "continent": data["continents"][0],
+    }
+
+
+def get_weather_info(latitude: float, longitude: float) -> Dict[str, Any]:
+    """Current weather at a point, from Open-Meteo."""
+    response = httpx.get(
+        OPEN_METEO_URL,
+        params={
+            "latitude": latitude,
+            "longitude": longitude,
+            "current_weather": "true",
+        },
+        timeout=10,
+    )
+    response.raise_for_status()
+    return response.json().get("current_weather", {})
+
+
+def determine_best_seasons(latitude: float) -> List[Season]:
+    """Local seasons that are usually best to visit, by latitude alone."""
+    if abs(latitude) >= POLAR_LATITUDE:
+        return [Season.SUMMER]
+    if abs(latitude) <= TROPIC_LATITUDE:
+        # The cooler, drier half of the year
+        return [Season.WINTER, Season.SPRING]
+    return [Season.SPRING, Season.AUTUMN]
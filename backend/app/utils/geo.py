@@ -0,0 +1,277 @@
+import logging
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+from app.models.itinerary import Itinerary
+
+logger = logging.getLogger(__name__)
+
+# Mean Earth radius (IUGG) used by the spherical haversine model
+EARTH_RADIUS_KM = 6371.0088
+# WGS-84 ellipsoid used by Vincenty's formulae
+WGS84_A_KM = 6378.137
+WGS84_F = 1 / 298.257223563
+WGS84_B_KM = WGS84_A_KM * (1 - WGS84_F)
+
+AVERAGE_SPEED_KMH = 100.0
+DEFAULT_BASE_TRAVEL_COST = 50.0
+DEFAULT_COST_PER_KM = 0.1
+
+DISTANCE_METHODS = ("haversine", "vincenty")
+
+
+def haversine_km(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """Great-circle distance on a sphere.
+
+    Treating the Earth as a sphere is off by at most ~0.56% (typically under
+    0.3%) compared with the WGS-84 ellipsoid.
+    """
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def vincenty_km(
+    lat1, lon1, lat2, lon2, max_iterations: int = 200, tolerance: float = 1e-12
+) -> np.ndarray:
+    """Ellipsoidal (WGS-84) distance by Vincenty's inverse formula, vectorized.
+
+    Converged results agree with geopy's ``geodesic`` to well under a
+    millimetre. Nearly antipodal pairs, where the iteration does not
+    converge, fall back to ``haversine_km``.
+    """
+    lat1, lon1, lat2, lon2 = (
+        np.asarray(value, dtype=float) for value in (lat1, lon1, lat2, lon2)
+    )
+    L = np.radians(lon2 - lon1)
+    U1 = np.arctan((1 - WGS84_F) * np.tan(np.radians(lat1)))
+    U2 = np.arctan((1 - WGS84_F) * np.tan(np.radians(lat2)))
+    sin_u1, cos_u1 = np.sin(U1), np.cos(U1)
+    sin_u2, cos_u2 = np.sin(U2), np.cos(U2)
+
+    lam = L
+    converged = np.zeros(np.broadcast(L, U1, U2).shape, dtype=bool)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for _ in range(max_iterations):
+            sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+            sin_sigma = np.hypot(
+                cos_u2 * sin_lam, cos_u1 * sin_u2 - sin_u1 * cos_u2 * cos_lam
+            )
+            cos_sigma = sin_u1 * sin_u2 + cos_u1 * cos_u2 * cos_lam
+            sigma = np.arctan2(sin_sigma, cos_sigma)
+            sin_alpha = np.where(
+                sin_sigma == 0, 0.0, cos_u1 * cos_u2 * sin_lam / sin_sigma
+            )
+            cos2_alpha = 1 - sin_alpha**2
+            # Equatorial lines have cos2_alpha == 0
+            cos_2sigma_m = np.where(
+                cos2_alpha == 0, 0.0, cos_sigma - 2 * sin_u1 * sin_u2 / cos2_alpha
+            )
+            C = WGS84_F / 16 * cos2_alpha * (4 + WGS84_F * (4 - 3 * cos2_alpha))
+            previous = lam
+            lam = L + (1 - C) * WGS84_F * sin_alpha * (
+                sigma
+                + C
+                * sin_sigma
+                * (cos_2sigma_m + C * cos_sigma * (-1 + 2 * cos_2sigma_m**2))
+            )
+            converged = np.abs(lam - previous) < tolerance
+            if converged.all():
+                break
+
+        u2 = cos2_alpha * (WGS84_A_KM**2 - WGS84_B_KM**2) / WGS84_B_KM**2
+        A = 1 + u2 / 16384 * (4096 + u2 * (-768 + u2 * (320 - 175 * u2)))
+        B = u2 / 1024 * (256 + u2 * (-128 + u2 * (74 - 47 * u2)))
+        delta_sigma = (
+            B
+            * sin_sigma
+            * (
+                cos_2sigma_m
+                + B
+                / 4
+                * (
+                    cos_sigma * (-1 + 2 * cos_2sigma_m**2)
+                    - B
+                    / 6
+                    * cos_2sigma_m
+                    * (-3 + 4 * sin_sigma**2)
+                    * (-3 + 4 * cos_2sigma_m**2)
+                )
+            )
+        )
+        distance = WGS84_B_KM * A * (sigma - delta_sigma)
+
+    if not converged.all():
+        fallback = haversine_km(lat1, lon1, lat2, lon2)
+        distance = np.where(converged, distance, fallback)
+    return distance
+
+
+def distance_km(lat1, lon1, lat2, lon2, method: str = "vincenty") -> np.ndarray:
+    if method == "haversine":
+        return haversine_km(lat1, lon1, lat2, lon2)
+    if method == "vincenty":
+        return vincenty_km(lat1, lon1, lat2, lon2)
+    raise ValueError(
+        f"Unknown distance method {method!r}, use one of {DISTANCE_METHODS}"
+    )
+
+
+def calculate_distance(
+    lat1: float, lon1: float, lat2: float, lon2: float, method: str = "vincenty"
+) -> float:
+    return float(distance_km(lat1, lon1, lat2, lon2, method))
+
+
+def estimate_travel_cost(
+    distance,
+    base_cost=DEFAULT_BASE_TRAVEL_COST,
+    cost_per_km=DEFAULT_COST_PER_KM,
+):
+    return base_cost + (distance * cost_per_km)
+
+
+class RouteMetrics(NamedTuple):
+    """Per-leg metrics of one route; leg ``i`` ends at stop ``i + 1``."""
+
+    distances_km: np.ndarray
+    travel_hours: np.ndarray
+    costs: np.ndarray
+
+    @property
+    def total_distance_km(self) -> float:
+        return float(self.distances_km.sum())
+
+    @property
+    def total_cost(self) -> float:
+        return float(self.costs.sum())
+
+
+def batch_route_metrics(
+    routes: Sequence[np.ndarray],
+    base_costs: Optional[Sequence[np.ndarray]] = None,
+    costs_per_km: Optional[Sequence[np.ndarray]] = None,
+    speed_kmh: float = AVERAGE_SPEED_KMH,
+    method: str = "vincenty",
+) -> List[RouteMetrics]:
+    """Computes every leg of every route in a single vectorized pass.
+
+    ``routes`` holds one ``(n_stops, 2)`` array of latitude/longitude per
+    route. ``base_costs`` and ``costs_per_km`` optionally give one value per
+    stop (the cost of arriving there); the defaults apply otherwise.
+    """
+    routes = [np.asarray(route, dtype=float).reshape(-1, 2) for route in routes]
+    starts = np.concatenate([route[:-1] for route in routes] or [np.empty((0, 2))])
+    ends = np.concatenate([route[1:] for route in routes] or [np.empty((0, 2))])
+    distances = distance_km(starts[:, 0], starts[:, 1], ends[:, 0], ends[:, 1], method)
+
+    def arrivals(values, default):
+        if values is None:
+            return default
+        return np.concatenate(
+            [np.asarray(v, dtype=float)[1:] for v in values] or [np.empty(0)]
+        )
+
+    costs = estimate_travel_cost(
+        distances,
+        arrivals(base_costs, DEFAULT_BASE_TRAVEL_COST),
+        arrivals(costs_per_km, DEFAULT_COST_PER_KM),
+    )
+    hours = distances / speed_kmh
+
+    offsets = np.cumsum([max(len(route) - 1, 0) for route in routes])[:-1]
+    return [
+        RouteMetrics(d, h, c)
+        for d, h, c in zip(
+            np.split(distances, offsets),
+            np.split(hours, offsets),
+            np.split(costs, offsets),
+        )
+    ]
+
+
+def route_metrics(route: np.ndarray, **kwargs: Any) -> RouteMetrics:
+    return batch_route_metrics([route], **kwargs)[0]
+
+
+def pairwise_distances_km(latitudes, longitudes, method: str = "vincenty"):
+    latitudes = np.asarray(latitudes, dtype=float)
+    longitudes = np.asarray(longitudes, dtype=float)
+    return distance_km(
+        latitudes[:, None],
+        longitudes[:, None],
+        latitudes[None, :],
+        longitudes[None, :],
+        method,
+    )
+
+
+def locate_stops(
+    itinerary: Itinerary, locations: Dict[str, Dict[str, Any]]
+) -> Optional[List[Dict[str, Any]]]:
+    """Destination rows for each stop, or None if any stop is unknown."""
+    stops = [locations.get(stop.destination_id) for stop in itinerary.destinations]
+    return None if None in stops else stops
+
+
+def index_destinations(
+    destinations: Iterable[Dict[str, Any]],
+) -> Dict[str, Dict[str, Any]]:
+    # Stops are matched by id, or by name when the model echoed the name
+    locations = {}
+    for destination in destinations:
+        locations[destination["name"]] = destination
+        locations[destination["id"]] = destination
+    return locations
+
+
+def apply_route_metrics(
+    itineraries: Iterable[Itinerary],
+    destinations: Iterable[Dict[str, Any]],
+    method: str = "vincenty",
+) -> List[Itinerary]:
+    """Fills travel time and cost on each stop after the first, and
+    ``total_cost`` per itinerary.
+
+    Stops are matched to destination rows by id, or by name when the model
+    echoed the destination name. Itineraries with a stop that cannot be
+    located are left unchanged.
+    """
+    itineraries = list(itineraries)
+    locations = index_destinations(destinations)
+
+    located = []
+    for itinerary in itineraries:
+        stops = locate_stops(itinerary, locations)
+        if stops is None:
+            logger.warning(f"Skipping route metrics for itinerary {itinerary.id}")
+            continue
+        located.append((itinerary, stops))
+
+    metrics = batch_route_metrics(
+        [[(s["latitude"], s["longitude"]) for s in stops] for _, stops in located],
+        base_costs=[
+            [s.get("base_travel_cost", DEFAULT_BASE_TRAVEL_COST) for s in stops]
+            for _, stops in located
+        ],
+        costs_per_km=[
+            [s.get("cost_per_km", DEFAULT_COST_PER_KM) for s in stops]
+            for _, stops in located
+        ],
+        method=method,
+    )
+    for (itinerary, _), route in zip(located, metrics):
+        # The first stop has no leg, even if reordering moved it there
+        for stop in itinerary.destinations[:1]:
+            stop.travel_time_from_previous = None
+            stop.travel_cost_from_previous = None
+        for stop, hours, cost in zip(
+            itinerary.destinations[1:], route.travel_hours, route.costs
+        ):
+            stop.travel_time_from_previous = float(hours)
+            stop.travel_cost_from_previous = float(cost)
+        itinerary.total_cost = route.total_cost
+    return itineraries
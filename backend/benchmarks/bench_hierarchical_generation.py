@@ -0,0 +1,146 @@
+"""End-to-end itinerary generation latency: one-shot vs skeleton + parallel stops.
+
+Ollama is replaced by a simulated server with ``--parallel`` slots (as with
+OLLAMA_NUM_PARALLEL) whose per-token decode time grows with the length of
+the completion so far, so this measures the shape of the two strategies
+rather than any one model:
+
+    poetry run python -m benchmarks.bench_hierarchical_generation --days 5 10 21
+"""
+
+import argparse
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+
+from app.models.itinerary import DestinationInItinerary, Itinerary, StopDetails
+from app.models.user import UserPreferences
+from app.services.llm_service import LLMResponseCache, LLMService, ModelRouter
+from app.services.prompt_context import estimate_tokens
+from langchain_core.outputs import Generation, LLMResult
+
+PREFERENCES = UserPreferences(
+    user_id="bench",
+    interests=["history", "food", "architecture"],
+    budget=2500.0,
+    preferred_travel_style="mid-range",
+    preferred_activities=["sightseeing", "dining"],
+)
+
+
+def sample_itinerary(destinations, days) -> Itinerary:
+    start = datetime(2024, 6, 1)
+    stay = days / len(destinations)
+    return Itinerary(
+        id="bench",
+        title="Bench trip",
+        start_date=start,
+        end_date=start + timedelta(days=days),
+        user_id="bench",
+        total_budget=2500.0,
+        destinations=[
+            DestinationInItinerary(
+                destination_id=name,
+                arrival_time=start + timedelta(days=i * stay),
+                departure_time=start + timedelta(days=(i + 1) * stay),
+                travel_time_from_previous=2.5,
+                travel_cost_from_previous=80.0,
+                accommodation_id=f"hotel-{name}",
+            )
+            for i, name in enumerate(destinations)
+        ],
+        theme="cultural",
+        flexibility="flexible",
+        sustainability_score=7.5,
+        created_at=start,
+        updated_at=start,
+    )
+
+
+class SimulatedOllama:
+    def __init__(self, itinerary, parallel, prefill_ms, decode_ms, context_tokens):
+        skeleton = itinerary.model_dump(
+            mode="json",
+            exclude={
+                "id": True,
+                "user_id": True,
+                "created_at": True,
+                "updated_at": True,
+                "total_cost": True,
+                "rating": True,
+                "status": True,
+                "destinations": {
+                    "__all__": {
+                        "travel_time_from_previous",
+                        "travel_cost_from_previous",
+                        "accommodation_id",
+                    }
+                },
+            },
+        )
+        stop = itinerary.destinations[-1]
+        self.outputs = {
+            "Itinerary": itinerary.model_dump_json(),
+            "ItinerarySkeleton": json.dumps(skeleton),
+            "StopDetails": StopDetails(**stop.model_dump()).model_dump_json(),
+        }
+        self.slots = threading.Semaphore(parallel)
+        self.prefill_s = prefill_ms / 1e3
+        self.decode_s = decode_ms / 1e3
+        self.context_tokens = context_tokens
+
+    def generate(self, prompts, format=None):
+        text = self.outputs[format["title"]]
+        completion = estimate_tokens(text)
+        with self.slots:
+            # Each token attends to everything before it
+            seconds = estimate_tokens(prompts[0]) * self.prefill_s + sum(
+                self.decode_s * (1 + position / self.context_tokens)
+                for position in range(completion)
+            )
+            time.sleep(seconds)
+        return LLMResult(generations=[[Generation(text=text)]])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--days", type=int, nargs="+", default=[5, 10, 21])
+    parser.add_argument("--days-per-stop", type=float, default=2.5)
+    parser.add_argument("--parallel", type=int, default=4)
+    parser.add_argument("--prefill-ms", type=float, default=0.05)
+    parser.add_argument("--decode-ms", type=float, default=2.0)
+    parser.add_argument("--context-tokens", type=int, default=512)
+    args = parser.parse_args()
+
+    print(f"{'days':>5} {'stops':>6} {'one-shot s':>11} {'hierarchical s':>15}")
+    for days in args.days:
+        stops = max(2, round(days / args.days_per_stop))
+        destinations = [f"City {i}" for i in range(stops)]
+        details = [
+            {"name": name, "description": "A historic city. " * 20}
+            for name in destinations
+        ]
+        server = SimulatedOllama(
+            sample_itinerary(destinations, days),
+            args.parallel,
+            args.prefill_ms,
+            args.decode_ms,
+            args.context_tokens,
+        )
+        timings = []
+        for min_days in (10**6, 0):
+            service = LLMService(
+                router=ModelRouter(llm_factory=lambda _: server),
+                cache=LLMResponseCache(similarity_threshold=None),
+                hierarchical_min_days=min_days,
+                stop_workers=args.parallel,
+            )
+            started = time.perf_counter()
+            service.generate_itinerary(PREFERENCES, destinations, days, details)
+            timings.append(time.perf_counter() - started)
+        print(f"{days:>5} {stops:>6} {timings[0]:>11.2f} {timings[1]:>15.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""Bytes on the wire and p50/p99 latency for typical frontend list calls.
+
+Supabase is replaced by an in-memory table of synthetic rows, so this
+measures only what the API does with them: serialization, ETags,
+compression and the destination cache:
+
+    poetry run python -m benchmarks.bench_http_responses --requests 300
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+from types import SimpleNamespace
+
+import httpx
+import numpy as np
+from app.main import app
+from app.services.destination_cache import destination_cache
+from app.services.supabase_client import supabase_client_manager
+
+
+def destination_row(i: int) -> dict:
+    return {
+        "id": f"dest-{i:05}",
+        "name": f"City {i}",
+        "country": "Benchland",
+        "description": f"City {i} is known for its old town, markets and river walks.",
+        "latitude": 40 + (i % 100) / 10,
+        "longitude": -3 + (i % 70) / 10,
+        "timezone": "Europe/Madrid",
+        "currency": "EUR",
+        "local_currency": "Euro",
+        "languages": ["Spanish", "English"],
+        "best_seasons": ["spring", "autumn"],
+        "safety_rating": 8.0,
+        "popular_events": ["Spring festival", "Harvest fair"],
+        "created_at": "2024-01-01T00:00:00+00:00",
+        "updated_at": "2024-01-01T00:00:00+00:00",
+    }
+
+
+def itinerary_row(i: int) -> dict:
+    return {
+        "id": f"trip-{i:05}",
+        "title": f"Trip {i}",
+        "start_date": "2024-06-01T00:00:00+00:00",
+        "end_date": "2024-06-10T00:00:00+00:00",
+        "status": "planning",
+        "theme": "cultural",
+        "total_cost": 1234.5,
+        "created_at": f"2024-05-01T00:00:{i % 60:02}+00:00",
+        "destinations": [{"destination_id": f"dest-{j}"} for j in range(6)],
+    }
+
+
+def install_fake_supabase(rows: int):
+    tables = {
+        "destinations": [destination_row(i) for i in range(rows)],
+        "itineraries": [itinerary_row(i) for i in range(rows)],
+    }
+
+    async def execute(query):
+        table = str(query.path).rsplit("/", 1)[-1]
+        return SimpleNamespace(data=tables[table][: int(query.params["limit"])])
+
+    supabase_client_manager.execute = execute
+
+
+async def measure(client, path, headers, requests, cold, params):
+    timings, wire = [], 0
+    for _ in range(requests):
+        if cold:
+            destination_cache.clear()
+        started = time.perf_counter()
+        response = await client.get(path, params=params, headers=headers)
+        timings.append(time.perf_counter() - started)
+        assert response.status_code in (200, 304), response.text
+        wire = response.num_bytes_downloaded
+    return wire, np.percentile(timings, 50) * 1e3, np.percentile(timings, 99) * 1e3
+
+
+async def run(args):
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    install_fake_supabase(args.limit + 1)
+    transport = httpx.ASGITransport(app=app)
+    calls = [
+        ("/destinations/", "cold", True, {}),
+        ("/destinations/", "cached", False, {}),
+        ("/itineraries/", "summaries", False, {"user-id": "bench"}),
+    ]
+    encodings = ["identity", "gzip", "br"]
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as c:
+        print(f"{'call':<34} {'encoding':<9} {'bytes':>8} {'p50 ms':>8} {'p99 ms':>8}")
+        for path, label, cold, headers in calls:
+            params = {"limit": args.limit}
+            for encoding in encodings:
+                probe = await c.get(
+                    path,
+                    params=params,
+                    headers={**headers, "Accept-Encoding": encoding},
+                )
+                if encoding != "identity" and "content-encoding" not in probe.headers:
+                    continue  # e.g. brotli not installed
+                request_headers = {**headers, "Accept-Encoding": encoding}
+                wire, p50, p99 = await measure(
+                    c, path, request_headers, args.requests, cold, params
+                )
+                print(
+                    f"{path + ' (' + label + ')':<34} {encoding:<9} {wire:>8} "
+                    f"{p50:>8.2f} {p99:>8.2f}"
+                )
+
+            # Revalidation of an unchanged page
+            request_headers = {**headers, "Accept-Encoding": "gzip"}
+            probe = await c.get(path, params=params, headers=request_headers)
+            request_headers["If-None-Match"] = probe.headers["etag"]
+            wire, p50, p99 = await measure(
+                c, path, request_headers, args.requests, False, params
+            )
+            print(
+                f"{path + ' (' + label + ')':<34} {'304':<9} {wire:>8} "
+                f"{p50:>8.2f} {p99:>8.2f}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Prompt construction and parse/validate overhead, without model latency.
+
+poetry run python -m benchmarks.bench_prompts --iterations 2000
+"""
+
+import argparse
+import timeit
+from datetime import datetime, timedelta
+
+from app.models.itinerary import DestinationInItinerary, Itinerary
+from app.models.user import UserPreferences
+from app.services.prompt_context import PromptContextBuilder
+from app.services.prompts import prompt_registry
+from langchain.output_parsers import PydanticOutputParser
+from langchain.prompts import PromptTemplate
+
+PREFERENCES = UserPreferences(
+    user_id="bench",
+    interests=["history", "food", "architecture"],
+    budget=2500.0,
+    preferred_travel_style="mid-range",
+    preferred_activities=["sightseeing", "dining"],
+)
+INPUTS = {
+    "destinations": "Lisbon, Porto, Seville",
+    "duration": 10,
+    "user_preferences": PREFERENCES.model_dump_json(),
+    "destinations_info": [
+        {"name": name, "description": "A historic city. " * 20}
+        for name in ("Lisbon", "Porto", "Seville")
+    ],
+}
+
+
+def destination_row(i: int) -> dict:
+    # A full Supabase row, as the generation endpoints fetch them
+    return {
+        "id": f"dest-{i:05}",
+        "name": f"City {i}",
+        "country": "Portugal" if i % 2 else "Spain",
+        "description": f"City {i} is known for its old town and river walks. " * 8,
+        "latitude": 40 + i / 10,
+        "longitude": -8 + i / 10,
+        "timezone": "Europe/Lisbon",
+        "currency": "EUR",
+        "local_currency": "Euro",
+        "languages": ["Portuguese"] if i % 2 else ["Spanish", "Catalan"],
+        "best_seasons": ["spring", "autumn"],
+        "safety_rating": 8.0,
+        "popular_events": ["Spring festival", "Harvest fair"],
+        "created_at": "2024-01-01T00:00:00+00:00",
+        "updated_at": "2024-01-01T00:00:00+00:00",
+    }
+
+
+def sample_output(stops: int) -> str:
+    start = datetime(2024, 6, 1)
+    return Itinerary(
+        id="bench",
+        title="Iberian highlights",
+        start_date=start,
+        end_date=start + timedelta(days=stops * 2),
+        user_id="bench",
+        total_budget=2500.0,
+        destinations=[
+            DestinationInItinerary(
+                destination_id=f"dest-{i}",
+                arrival_time=start + timedelta(days=i * 2),
+                departure_time=start + timedelta(days=i * 2 + 1),
+            )
+            for i in range(stops)
+        ],
+        theme="cultural",
+        flexibility="flexible",
+        sustainability_score=7.5,
+        created_at=start,
+        updated_at=start,
+    ).model_dump_json()
+
+
+def build_per_call() -> str:
+    # What every call used to do before templates were compiled once
+    template = prompt_registry.get("itinerary").template
+    parser = PydanticOutputParser(pydantic_object=Itinerary)
+    prompt = PromptTemplate(
+        template=template,
+        input_variables=list(INPUTS),
+        partial_variables={"format_instructions": parser.get_format_instructions()},
+    )
+    return prompt.format(**INPUTS)
+
+
+def build_precompiled() -> str:
+    return prompt_registry.get("itinerary").format(**INPUTS)
+
+
+def report(label: str, seconds: float, iterations: int):
+    print(f"{label:<32} {seconds / iterations * 1e6:10.1f} us/call")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--stops", type=int, default=10)
+    args = parser.parse_args()
+
+    assert build_per_call() == build_precompiled()
+    output = sample_output(args.stops)
+
+    for label, func in (
+        ("prompt: rebuilt per call", build_per_call),
+        ("prompt: precompiled", build_precompiled),
+        (
+            "parse: Itinerary.model_validate",
+            lambda: Itinerary.model_validate_json(output),
+        ),
+    ):
+        report(label, timeit.timeit(func, number=args.iterations), args.iterations)
+
+    builder = PromptContextBuilder()
+    rows = [destination_row(i) for i in range(args.stops)]
+    for label, destinations_info in (
+        ("context: full rows", rows),
+        ("context: projected", builder.destinations(rows)),
+    ):
+        prompt = prompt_registry.get("itinerary").format(
+            **{**INPUTS, "destinations_info": destinations_info}
+        )
+        print(f"{label:<32} {builder.counter.count(prompt):10} prompt tokens")
+
+
+if __name__ == "__main__":
+    main()
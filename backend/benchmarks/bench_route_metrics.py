@@ -0,0 +1,63 @@
+"""Leg distance/time/cost for a batch of itineraries: geopy loop vs NumPy.
+
+poetry run python -m benchmarks.bench_route_metrics --itineraries 2000
+"""
+
+import argparse
+import time
+
+import numpy as np
+from app.utils.geo import batch_route_metrics, estimate_travel_cost
+from geopy.distance import geodesic
+
+
+def sample_routes(itineraries: int, rng: np.random.Generator):
+    return [
+        np.column_stack(
+            (rng.uniform(-60, 70, size=stops), rng.uniform(-180, 180, size=stops))
+        )
+        for stops in rng.integers(2, 8, size=itineraries)
+    ]
+
+
+def geopy_route_metrics(routes):
+    # The per-leg loop the itinerary endpoints used to run
+    totals = []
+    for route in routes:
+        total_cost = 0
+        for (lat1, lon1), (lat2, lon2) in zip(route[:-1], route[1:]):
+            distance = geodesic((lat1, lon1), (lat2, lon2)).kilometers
+            total_cost += estimate_travel_cost(distance)
+        totals.append(total_cost)
+    return np.array(totals)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--itineraries", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    routes = sample_routes(args.itineraries, np.random.default_rng(args.seed))
+    legs = sum(len(route) - 1 for route in routes)
+    print(f"{args.itineraries} itineraries, {legs} legs")
+
+    started = time.perf_counter()
+    reference = geopy_route_metrics(routes)
+    baseline = time.perf_counter() - started
+    print(f"{'geopy geodesic loop':<24} {baseline * 1e3:9.1f} ms")
+
+    for method in ("vincenty", "haversine"):
+        started = time.perf_counter()
+        metrics = batch_route_metrics(routes, method=method)
+        elapsed = time.perf_counter() - started
+        totals = np.array([route.total_cost for route in metrics])
+        error = np.abs(totals - reference).max()
+        print(
+            f"{'numpy ' + method:<24} {elapsed * 1e3:9.1f} ms"
+            f"  {baseline / elapsed:6.1f}x  max total-cost error {error:.6f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Validating and serializing a 10k-row destination list, old path vs new.
+
+The old path builds ``Destination(**row)`` per row and lets FastAPI
+validate and serialize the list again for ``response_model``; the new path
+validates once with a ``TypeAdapter`` and dumps straight to JSON bytes:
+
+    poetry run python -m benchmarks.bench_serialization --rows 10000
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from typing import List
+
+import orjson
+from app.api.serialization import ModelResponse, destination_list_adapter, rows_to_json
+from app.models.destination import Destination
+from fastapi._compat import ModelField
+from fastapi.routing import serialize_response
+from pydantic.fields import FieldInfo
+
+
+def sample_rows(count: int):
+    return [
+        {
+            "id": f"dest-{i:05}",
+            "name": f"City {i}",
+            "country": "Benchland",
+            "description": f"City {i} is known for its old town and river walks.",
+            "latitude": 40 + (i % 100) / 10,
+            "longitude": -3 + (i % 70) / 10,
+            "timezone": "Europe/Madrid",
+            "currency": "EUR",
+            "local_currency": "Euro",
+            "languages": ["Spanish", "English"],
+            "best_seasons": ["spring", "autumn"],
+            "safety_rating": 8.0,
+            "popular_events": ["Spring festival"],
+            "created_at": "2024-01-01T00:00:00+00:00",
+            "updated_at": "2024-01-01T00:00:00+00:00",
+        }
+        for i in range(count)
+    ]
+
+
+async def response_model_path(rows, field):
+    # What the handlers used to do, then FastAPI's response_model pass
+    models = [Destination(**row) for row in rows]
+    content = await serialize_response(field=field, response_content=models)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def timed(label, fn, repeat, baseline=None):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = fn()
+        best = min(best, time.perf_counter() - started)
+    speedup = f"  {baseline / best:5.1f}x" if baseline else ""
+    print(f"{label:<40} {best * 1e3:8.1f} ms  {len(body):>9} bytes{speedup}")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rows = sample_rows(args.rows)
+    field = ModelField(
+        name="Response",
+        field_info=FieldInfo(annotation=List[Destination]),
+        mode="serialization",
+    )
+    models = destination_list_adapter.validate_python(rows)
+    print(f"{args.rows} destination rows")
+
+    baseline = timed(
+        "models + response_model + json.dumps",
+        lambda: asyncio.run(response_model_path(rows, field)),
+        args.repeat,
+    )
+    timed(
+        "TypeAdapter validate + dump_json",
+        lambda: rows_to_json(destination_list_adapter, rows),
+        args.repeat,
+        baseline,
+    )
+    timed(
+        "TypeAdapter validate + orjson",
+        lambda: orjson.dumps(
+            destination_list_adapter.dump_python(
+                destination_list_adapter.validate_python(rows), mode="json"
+            )
+        ),
+        args.repeat,
+        baseline,
+    )
+    timed(
+        "ModelResponse on validated models",
+        lambda: ModelResponse(models).body,
+        args.repeat,
+        baseline,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Concurrent-request throughput with blocking vs offloaded Supabase queries.
+
+Simulates a PostgREST round trip with a blocking sleep so the benchmark runs
+without a live Supabase project:
+
+    poetry run python -m benchmarks.bench_supabase_offload --requests 200
+"""
+
+import argparse
+import asyncio
+import time
+
+import httpx
+from app.services.supabase_client import SupabaseClientManager
+from fastapi import FastAPI
+
+
+class FakeQuery:
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def execute(self):
+        time.sleep(self.latency)
+        return {"data": []}
+
+
+def build_app(manager: SupabaseClientManager, latency: float) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/blocking")
+    async def blocking():
+        return FakeQuery(latency).execute()
+
+    @app.get("/offloaded")
+    async def offloaded():
+        return await manager.execute(FakeQuery(latency))
+
+    return app
+
+
+async def run(app: FastAPI, path: str, requests: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        start = time.perf_counter()
+        responses = await asyncio.gather(*(client.get(path) for _ in range(requests)))
+        elapsed = time.perf_counter() - start
+    assert all(response.status_code == 200 for response in responses)
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+
+    manager = SupabaseClientManager(max_concurrency=args.concurrency)
+    app = build_app(manager, args.latency)
+
+    for path in ("/blocking", "/offloaded"):
+        elapsed = asyncio.run(run(app, path, args.requests))
+        print(
+            f"{path:<12} {args.requests} requests in {elapsed:.2f}s "
+            f"({args.requests / elapsed:.1f} req/s)"
+        )
+
+
+if __name__ == "__main__":
+    main()
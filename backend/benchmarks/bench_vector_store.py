@@ -0,0 +1,107 @@
+"""Documents/sec for single vs bulk vector-store inserts.
+
+Embedding requests are simulated with a fixed round-trip latency plus a
+per-document cost, so the benchmark runs without an Ollama server; Chroma
+writes are real, into a temporary directory:
+
+    poetry run python -m benchmarks.bench_vector_store --documents 500
+"""
+
+import argparse
+import hashlib
+import tempfile
+import time
+from datetime import datetime
+
+from app.models.destination import Destination
+from app.services.vector_store import VectorStoreService
+from langchain_core.embeddings import Embeddings
+
+
+class SimulatedEmbeddings(Embeddings):
+    def __init__(self, round_trip: float, per_document: float, dimensions: int = 384):
+        self.round_trip = round_trip
+        self.per_document = per_document
+        self.dimensions = dimensions
+
+    def _vector(self, text: str):
+        digest = hashlib.sha256(text.encode()).digest()
+        return [digest[i % len(digest)] / 255 for i in range(self.dimensions)]
+
+    def embed_documents(self, texts):
+        time.sleep(self.round_trip + self.per_document * len(texts))
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def sample_destinations(count: int):
+    now = datetime(2024, 1, 1)
+    return [
+        Destination(
+            id=f"bench-{i}",
+            name=f"City {i}",
+            country="Benchland",
+            description=f"City {i} is known for its old town and river walks.",
+            latitude=0.0,
+            longitude=0.0,
+            timezone="UTC",
+            currency="EUR",
+            local_currency="Euro",
+            languages=["English"],
+            best_seasons=["summer"],
+            safety_rating=8.0,
+            created_at=now,
+            updated_at=now,
+        )
+        for i in range(count)
+    ]
+
+
+def report(label: str, documents: int, seconds: float):
+    print(f"{label:<28} {documents / seconds:10.1f} docs/s  ({seconds:.2f}s)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--documents", type=int, default=500)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--round-trip", type=float, default=0.02)
+    parser.add_argument("--per-document", type=float, default=0.001)
+    args = parser.parse_args()
+
+    embeddings = SimulatedEmbeddings(args.round_trip, args.per_document)
+    destinations = sample_destinations(args.documents)
+
+    with tempfile.TemporaryDirectory() as single_dir:
+        service = VectorStoreService(
+            batch_size=args.batch_size,
+            embeddings=embeddings,
+            persist_directory=single_dir,
+        )
+        started = time.perf_counter()
+        for destination in destinations:
+            service.add_destination(destination)
+        report("single add_destination", args.documents, time.perf_counter() - started)
+
+    with tempfile.TemporaryDirectory() as bulk_dir:
+        service = VectorStoreService(
+            batch_size=args.batch_size,
+            embeddings=embeddings,
+            persist_directory=bulk_dir,
+        )
+        started = time.perf_counter()
+        service.add_destinations(destinations)
+        report("bulk add_destinations", args.documents, time.perf_counter() - started)
+
+        started = time.perf_counter()
+        written = service.add_destinations(destinations)
+        assert written == 0
+        report(
+            "bulk, unchanged (deduped)", args.documents, time.perf_counter() - started
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,31 @@
+import json
+import threading
+from types import SimpleNamespace
+
+import anyio
+import pytest
 from app.main import app
+from app.models.destination import Destination
 from app.models.itinerary import ItineraryCreate, ItineraryUpdate
+from app.api.itineraries import fetch_destination_details, save_generated_itinerary
+from app.api.serialization import (
+    ModelResponse,
+    destination_list_adapter,
+    rows_to_json,
+)
+from app.services.destination_cache import destination_cache
+from app.services.llm_service import (
+    LLMResponseCache,
+    LLMService,
+    ModelRouter,
+    llm_service,
+)
+from app.services.spatial_index import destination_index
+from app.services.supabase_client import supabase_client_manager
+from app.services.vector_store import vector_store_service
+from fastapi import HTTPException
 from fastapi.testclient import TestClient
+from langchain_core.outputs import Generation, LLMResult
 
 from backend.app.models.destination import DestinationCreate, DestinationUpdate
 from backend.app.models.user import UserPreferences
@@ -115,7 +140,478 @@ def test_generate_itinerary():
         },
         headers={"user-id": "test_user"},
     )
+    assert response.status_code == 202
+    job = response.json()
+    assert job["status"] == "queued"
+
+    response = client.get(
+        f"/itineraries/jobs/{job['id']}", headers={"user-id": "test_user"}
+    )
+    assert response.status_code == 200
+    assert response.json()["id"] == job["id"]
+
+
+def test_read_unknown_generation_job():
+    response = client.get(
+        "/itineraries/jobs/unknown_job", headers={"user-id": "test_user"}
+    )
+    assert response.status_code == 404
+
+
+def test_nearby_destinations_and_neighbors():
+    destination_index.rebuild(
+        [
+            {
+                "id": "paris",
+                "name": "Paris",
+                "country": "France",
+                "latitude": 48.8566,
+                "longitude": 2.3522,
+            },
+            {
+                "id": "brussels",
+                "name": "Brussels",
+                "country": "Belgium",
+                "latitude": 50.8503,
+                "longitude": 4.3517,
+            },
+            {
+                "id": "rome",
+                "name": "Rome",
+                "country": "Italy",
+                "latitude": 41.9028,
+                "longitude": 12.4964,
+            },
+        ]
+    )
+    response = client.get(
+        "/destinations/nearby",
+        params={"latitude": 48.85, "longitude": 2.35, "radius_km": 300},
+    )
+    assert response.status_code == 200
+    assert [d["id"] for d in response.json()] == ["paris", "brussels"]
+
+    response = client.get("/destinations/paris/neighbors", params={"limit": 5})
+    assert response.status_code == 200
+    assert [d["id"] for d in response.json()] == ["brussels", "rome"]
+    assert response.json()[0]["distance_km"] == pytest.approx(264, abs=1)
+
+    response = client.get("/destinations/unknown/neighbors")
+    assert response.status_code == 404
+
+
+def destination_row(destination_id, name, **fields):
+    return {
+        "id": destination_id,
+        "name": name,
+        "country": "Portugal",
+        "latitude": 38.72,
+        "longitude": -9.14,
+        "timezone": "Europe/Lisbon",
+        "currency": "EUR",
+        "local_currency": "Euro",
+        "languages": ["Portuguese"],
+        "best_seasons": ["spring"],
+        "safety_rating": 8.5,
+        "popular_events": [],
+        "created_at": "2024-01-01T00:00:00",
+        "updated_at": "2024-01-01T00:00:00",
+        **fields,
+    }
+
+
+def test_create_destination_indexes_before_embedding_off_the_loop(monkeypatch):
+    row = destination_row("faro", "Faro")
+    loop_threads, embedded_on = [], []
+
+    async def execute(query):
+        loop_threads.append(threading.get_ident())
+        return SimpleNamespace(data=[row])
+
+    def add_destination(destination):
+        embedded_on.append(threading.get_ident())
+        raise ConnectionError("embedding server unavailable")
+
+    monkeypatch.setattr(supabase_client_manager, "execute", execute)
+    monkeypatch.setattr(vector_store_service, "add_destination", add_destination)
+    destination_cache.clear()
+    response = client.post(
+        "/destinations/",
+        json={k: v for k, v in row.items() if k != "id"},
+        headers={"user-id": "test_user"},
+    )
+
+    assert response.status_code == 400
+    assert embedded_on and embedded_on[0] != loop_threads[0]
+    # The committed row is still visible to reads and nearby queries
+    assert destination_cache.get("faro")["name"] == "Faro"
+    assert "faro" in destination_index
+
+
+def test_read_destinations_pages_filters_and_projects(monkeypatch):
+    rows = [destination_row(f"d{i}", f"City {i}") for i in range(4)]
+    queries = []
+
+    async def execute(query):
+        queries.append(query.params)
+        return SimpleNamespace(data=rows[: int(query.params["limit"])])
+
+    monkeypatch.setattr(supabase_client_manager, "execute", execute)
+    destination_cache.clear()
+    response = client.get(
+        "/destinations/",
+        params={
+            "limit": 3,
+            "fields": "name",
+            "season": "summer",
+            "min_safety_rating": 7,
+            "min_longitude": 170,
+            "max_longitude": -170,
+        },
+    )
+    assert response.status_code == 200
+    assert [d["id"] for d in response.json()] == ["d0", "d1", "d2"]
+    params = queries[-1]
+    assert params["select"] == "id,name"
+    assert params["order"] == "id"
+    assert params["best_seasons"] == "cs.{summer}"
+    assert params["safety_rating"] == "gte.7.0"
+    assert params["or"] == "(longitude.gte.170.0,longitude.lte.-170.0)"
+
+    cursor = response.headers["x-next-cursor"]
+    rows = rows[3:]
+    response = client.get("/destinations/", params={"limit": 3, "cursor": cursor})
+    assert [d["name"] for d in response.json()] == ["City 3"]
+    assert "x-next-cursor" not in response.headers
+    assert queries[-1]["id"] == "gt.d2"
+
+    response = client.get("/destinations/", params={"fields": "password"})
+    assert response.status_code == 400
+    response = client.get("/destinations/", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+    # Projected rows are not full destinations, and the schema says so
+    schema = app.openapi()["paths"]["/destinations/"]["get"]["responses"]["200"]
+    variants = schema["content"]["application/json"]["schema"]["anyOf"]
+    assert [v["items"].get("$ref") for v in variants] == [
+        "#/components/schemas/Destination",
+        None,
+    ]
+
+
+def test_read_itineraries_returns_paged_summaries(monkeypatch):
+    def row(i):
+        return {
+            "id": f"it{i}",
+            "title": f"Trip {i}",
+            "start_date": "2024-06-01T00:00:00+00:00",
+            "end_date": "2024-06-07T00:00:00+00:00",
+            "status": "planning",
+            "theme": "cultural",
+            "total_cost": 100.0 * i,
+            "created_at": f"2024-05-0{9 - i}T12:00:00+00:00",
+            "destinations": [{"destination_id": "paris"}] * i,
+        }
+
+    queries = []
+
+    async def execute(query):
+        queries.append(query.params)
+        return SimpleNamespace(data=[row(i) for i in range(1, 4)])
+
+    monkeypatch.setattr(supabase_client_manager, "execute", execute)
+    response = client.get(
+        "/itineraries/",
+        params={"limit": 2, "status": "planning"},
+        headers={"user-id": "test_user"},
+    )
+    assert response.status_code == 200
+    summaries = response.json()
+    assert [s["id"] for s in summaries] == ["it1", "it2"]
+    assert [s["stop_count"] for s in summaries] == [1, 2]
+    assert "destinations" not in summaries[0]
+    assert queries[-1]["order"] == "created_at.desc,id.desc"
+    assert queries[-1]["status"] == "eq.planning"
+
+    client.get(
+        "/itineraries/",
+        params={"cursor": response.headers["x-next-cursor"]},
+        headers={"user-id": "test_user"},
+    )
+    assert queries[-1]["or"] == (
+        '(created_at.lt."2024-05-07T12:00:00+00:00",'
+        'and(created_at.eq."2024-05-07T12:00:00+00:00",id.lt."it2"))'
+    )
+
+
+def test_fetch_destination_details_batches_and_caches(monkeypatch):
+    rows = {name: {"id": name.lower(), "name": name} for name in ("Paris", "Rome")}
+    queries = []
+
+    async def execute(query):
+        queries.append(query.params)
+        names = query.params["name"][len("in.(") : -1].split(",")
+        return SimpleNamespace(data=[rows[n] for n in names if n in rows])
+
+    monkeypatch.setattr(supabase_client_manager, "execute", execute)
+    destination_cache.clear()
+
+    details = anyio.run(fetch_destination_details, ["Rome", "Paris", "Rome"])
+    assert [d["id"] for d in details] == ["rome", "paris", "rome"]
+    assert [q["name"] for q in queries] == ["in.(Rome,Paris)"]
+
+    # Cached names never reach Supabase again; unknown ones still 404
+    with pytest.raises(HTTPException) as error:
+        anyio.run(fetch_destination_details, ["Paris", "Atlantis"])
+    assert error.value.status_code == 404
+    assert error.value.detail == "Destination not found: Atlantis"
+    assert queries[-1]["name"] == "in.(Atlantis)"
+
+
+def test_cached_generations_save_as_new_itineraries(monkeypatch):
+    generated = {
+        "id": "generated",
+        "title": "Paris and Rome",
+        "start_date": "2024-06-01T00:00:00+00:00",
+        "end_date": "2024-06-07T00:00:00+00:00",
+        "user_id": "first",
+        "total_budget": 1000,
+        "destinations": [],
+        "theme": "cultural",
+        "flexibility": "flexible",
+        "sustainability_score": 7,
+        "created_at": "2024-05-01T00:00:00+00:00",
+        "updated_at": "2024-05-01T00:00:00+00:00",
+    }
+
+    class OneShotLLM:
+        def generate(self, prompts, format=None):
+            return LLMResult(generations=[[Generation(text=json.dumps(generated))]])
+
+    service = LLMService(
+        router=ModelRouter(
+            models={"large": "model"}, llm_factory=lambda _: OneShotLLM()
+        ),
+        cache=LLMResponseCache(similarity_threshold=None),
+    )
+    saved = {}
+
+    async def execute(query):
+        row = query.json
+        if row["id"] in saved:
+            raise Exception("duplicate key value violates unique constraint")
+        saved[row["id"]] = row
+        return SimpleNamespace(data=[row])
+
+    monkeypatch.setattr(supabase_client_manager, "execute", execute)
+
+    ids = []
+    for user_id in ("first", "second"):
+        preferences = UserPreferences(
+            user_id=user_id,
+            interests=["history"],
+            budget=1000,
+            preferred_travel_style="relaxed",
+            preferred_activities=["sightseeing"],
+        )
+        itinerary = service.generate_itinerary(preferences, ["Paris", "Rome"], 7)
+        ids.append(anyio.run(save_generated_itinerary, itinerary, user_id, []).id)
+
+    assert service.cache.stats()["hits"] == 1
+    assert ids[0] != ids[1]
+    assert saved[ids[1]]["user_id"] == "second"
+
+    monkeypatch.setattr(llm_service, "router", service.router)
+    assert client.get("/itineraries/llm/stats").status_code == 401
+    stats = client.get("/itineraries/llm/stats", headers={"user-id": "second"})
+    assert stats.json()["model"]["calls"] == 1
+
+
+def test_destination_reads_are_cached_with_etags(monkeypatch):
+    row = destination_row("lisbon", "Lisbon")
+    queries = []
+
+    async def execute(query):
+        queries.append(query.params)
+        return SimpleNamespace(data=[dict(row)])
+
+    monkeypatch.setattr(supabase_client_manager, "execute", execute)
+    destination_cache.clear()
+
+    first = client.get("/destinations/lisbon")
+    assert first.status_code == 200 and first.json()["name"] == "Lisbon"
+    etag = first.headers["etag"]
+    cached = client.get("/destinations/lisbon", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert len(queries) == 1
+
+    listing = client.get("/destinations/", params={"limit": 10})
+    again = client.get(
+        "/destinations/",
+        params={"limit": 10},
+        headers={"If-None-Match": listing.headers["etag"]},
+    )
+    assert again.status_code == 304
+    assert len(queries) == 2
+
+    # Writes go through to the cache and retire cached listing pages
+    row["description"] = "Updated"
+    response = client.put(
+        "/destinations/lisbon",
+        json={"description": "Updated"},
+        headers={"user-id": "test_user"},
+    )
+    assert response.status_code == 200
+    updated = client.get("/destinations/lisbon", headers={"If-None-Match": etag})
+    assert updated.status_code == 200
+    assert updated.json()["description"] == "Updated"
+    client.get("/destinations/", params={"limit": 10})
+    assert len(queries) == 4
+    assert client.get("/destinations/cache/stats").status_code == 401
+    stats = client.get("/destinations/cache/stats", headers={"user-id": "test_user"})
+    assert stats.json()["rows"]["local_hits"] >= 2
+
+
+def test_large_responses_are_compressed_with_weak_etags(monkeypatch):
+    rows = [destination_row(f"d{i:03}", f"City {i}") for i in range(200)]
+
+    async def execute(query):
+        return SimpleNamespace(data=rows[: int(query.params["limit"])])
+
+    monkeypatch.setattr(supabase_client_manager, "execute", execute)
+    destination_cache.clear()
+
+    response = client.get(
+        "/destinations/", params={"limit": 100}, headers={"Accept-Encoding": "gzip"}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert int(response.headers["content-length"]) < len(response.content) / 4
+    assert [d["id"] for d in response.json()] == [r["id"] for r in rows[:100]]
+    etag = response.headers["etag"]
+    assert etag.startswith('W/"')
+
+    response = client.get(
+        "/destinations/",
+        params={"limit": 100},
+        headers={"Accept-Encoding": "gzip", "If-None-Match": etag},
+    )
+    assert response.status_code == 304
+
+    small = client.get(
+        "/destinations/", params={"limit": 2}, headers={"Accept-Encoding": "gzip"}
+    )
+    assert "content-encoding" not in small.headers
+    assert small.headers["etag"].startswith('"')
+
+    identity = client.get(
+        "/destinations/", params={"limit": 100}, headers={"Accept-Encoding": "identity"}
+    )
+    assert "content-encoding" not in identity.headers
+
+
+def test_fast_serialization_matches_response_model_output():
+    rows = [destination_row(f"d{i}", f"City {i}") for i in range(3)]
+    body = rows_to_json(destination_list_adapter, rows)
+    models = [Destination(**row) for row in rows]
+    assert json.loads(body) == [json.loads(m.model_dump_json()) for m in models]
+    assert ModelResponse(models).body == body
+
+
+def test_bulk_create_and_patch_report_per_item_results(monkeypatch):
+    stored = {"lisbon": destination_row("lisbon", "Lisbon")}
+    writes, embedded = [], []
+
+    async def execute(query):
+        if query.http_method == "GET":
+            ids = query.params["id"][len("in.(") : -1].split(",")
+            return SimpleNamespace(data=[stored[i] for i in ids if i in stored])
+        writes.append(len(query.json))
+        if any(row["name"] == "Duplicate" for row in query.json):
+            raise Exception("duplicate key value violates unique constraint")
+        rows = [
+            {"created_at": "2024-01-01T00:00:00", "updated_at": "2024-01-01T00:00:00"}
+            | row
+            | {"id": row.get("id", row["name"].lower())}
+            for row in query.json
+        ]
+        stored.update((row["id"], row) for row in rows)
+        return SimpleNamespace(data=rows)
+
+    monkeypatch.setattr(supabase_client_manager, "execute", execute)
+    monkeypatch.setattr(
+        vector_store_service, "add_destinations", lambda ds: embedded.append(ds)
+    )
+    new = {k: v for k, v in destination_row("x", "Porto").items() if k != "id"}
+
+    response = client.post(
+        "/destinations/bulk",
+        json=[new, {"name": "Faro"}, {**new, "name": "Duplicate"}],
+        headers={"user-id": "test_user"},
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["succeeded"], body["failed"]) == (1, 2)
+    assert [r["status"] for r in body["results"]] == ["created", "failed", "failed"]
+    assert body["results"][0]["id"] == "porto"
+    assert "country: Field required" in body["results"][1]["error"]
+    assert "duplicate key" in body["results"][2]["error"]
+    # One multi-row insert, then the failing chunk retried row by row
+    assert writes == [2, 1, 1]
+    assert [d.name for d in embedded[-1]] == ["Porto"]
+
+    lines = [
+        json.dumps({"id": "lisbon", "safety_rating": 9.1}),
+        "{not json",
+        json.dumps({"id": "atlantis", "description": "Sunk"}),
+        json.dumps({"id": "porto", "safety_rating": 11}),
+    ]
+    response = client.patch(
+        "/destinations/bulk",
+        content="\n".join(lines) + "\n",
+        headers={"user-id": "test_user", "content-type": "application/x-ndjson"},
+    )
+    results = response.json()["results"]
+    assert [r["status"] for r in results] == ["updated", "failed", "failed", "failed"]
+    assert results[1]["error"].startswith("Invalid JSON")
+    assert results[2]["error"] == "Destination not found"
+    assert stored["lisbon"]["safety_rating"] == 9.1
+    assert stored["lisbon"]["country"] == "Portugal"
+    assert destination_cache.get("lisbon")["safety_rating"] == 9.1
+
+
+def test_bulk_create_does_not_replay_a_partly_written_chunk(monkeypatch):
+    writes = []
+
+    async def execute(query):
+        writes.append([row["name"] for row in query.json])
+        # Rows a trigger or policy silently filtered out are not returned
+        return SimpleNamespace(
+            data=[
+                {
+                    "created_at": "2024-01-01T00:00:00",
+                    "updated_at": "2024-01-01T00:00:00",
+                }
+                | row
+                | {"id": row["name"].lower()}
+                for row in query.json
+                if row["name"] != "Ghost"
+            ]
+        )
+
+    monkeypatch.setattr(supabase_client_manager, "execute", execute)
+    monkeypatch.setattr(vector_store_service, "add_destinations", lambda ds: None)
+    new = {k: v for k, v in destination_row("x", "Porto").items() if k != "id"}
+
+    response = client.post(
+        "/destinations/bulk",
+        json=[new, {**new, "name": "Ghost"}, {**new, "name": "Faro"}],
+        headers={"user-id": "test_user"},
+    )
     assert response.status_code == 200
-    assert isinstance(response.json(), dict)
-    assert "title" in response.json()
-    assert "destinations" in response.json()
+    results = response.json()["results"]
+    assert [r["status"] for r in results] == ["created", "failed", "created"]
+    assert [results[0]["id"], results[2]["id"]] == ["porto", "faro"]
+    assert results[1]["error"] == "Row was not written"
+    assert writes == [["Porto", "Ghost", "Faro"]]
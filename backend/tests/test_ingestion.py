@@ -0,0 +1,363 @@
+import collections
+import hashlib
+import json
+import threading
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import httpx
+import pytest
+from app.models.itinerary import Itinerary
+from app.scripts.fetcher import AsyncRestCountriesWikipediaFetcher
+from app.scripts.http_cache import HTTPResponseCache
+from app.scripts.ingestion import StagedIngestionPipeline
+from app.scripts.itinerary_generator import generate_mock_itineraries, mock_requests
+from app.scripts.wiki_batch import WikipediaBatchFetcher, WikiPageStore
+from app.services.llm_service import LLMResponseCache, LLMService, ModelRouter
+from langchain_core.outputs import Generation, LLMResult
+
+COUNTRIES = [
+    {"name": {"common": "France"}, "cca3": "FRA", "capital": ["Paris"]},
+    {"name": {"common": "Italy"}, "cca3": "ITA", "capital": ["Rome"]},
+]
+WIKI_PAGES = {
+    "Paris": {"lastrevid": 1, "extract": "Capital of France."},
+    "Rome": {"lastrevid": 1, "extract": "Capital of Italy."},
+    "Georgetown": {
+        "lastrevid": 1,
+        "extract": "Georgetown may refer to:",
+        "disambiguation": True,
+        "links": ["Georgetown, Guyana", "Georgetown, Texas"],
+    },
+    "Georgetown, Guyana": {"lastrevid": 1, "extract": "Capital of Guyana."},
+}
+WIKI_REDIRECTS = {"Roma": "Rome"}
+
+
+def wiki_query(params):
+    titles = params["titles"][0].split("|")
+    props = params["prop"][0].split("|")
+    redirects = []
+    pages = []
+    for title in titles:
+        if "redirects" in params and title in WIKI_REDIRECTS:
+            redirects.append({"from": title, "to": WIKI_REDIRECTS[title]})
+            title = WIKI_REDIRECTS[title]
+        stored = WIKI_PAGES.get(title)
+        if stored is None:
+            pages.append({"ns": 0, "title": title, "missing": True})
+            continue
+        page = {"ns": 0, "title": title}
+        if "info" in props:
+            page["lastrevid"] = stored["lastrevid"]
+            page["fullurl"] = f"w/{title}"
+        if "pageprops" in props and stored.get("disambiguation"):
+            page["pageprops"] = {"disambiguation": ""}
+        if "extracts" in props:
+            page["extract"] = stored["extract"]
+        if "links" in props:
+            page["links"] = [{"ns": 0, "title": link} for link in stored["links"]]
+        pages.append(page)
+    return {"query": {"redirects": redirects, "pages": pages}}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    requests = []
+    not_modified = 0
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        StubHandler.requests.append(self.path)
+        if url.path == "/rest/all":
+            body = COUNTRIES
+        elif url.path.startswith("/rest/alpha/"):
+            code = url.path.rsplit("/", 1)[-1]
+            body = [country for country in COUNTRIES if country["cca3"] == code]
+        elif url.path == "/w/api.php":
+            body = wiki_query(parse_qs(url.query))
+        else:
+            self.send_error(404)
+            return
+        payload = json.dumps(body).encode()
+        etag = f'"{hashlib.sha256(payload).hexdigest()}"'
+        if self.headers.get("If-None-Match") == etag:
+            StubHandler.not_modified += 1
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    StubHandler.requests = []
+    StubHandler.not_modified = 0
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+def make_pipeline(base_url, checkpoint_path, persisted, fail_on=(), cache_dir=None):
+    def generate(item):
+        if item["name"] in fail_on:
+            raise ValueError("invalid JSON from model")
+        return {"name": item["name"], "description": item["description"]}
+
+    return StagedIngestionPipeline(
+        fetcher=AsyncRestCountriesWikipediaFetcher(
+            rest_countries_url=f"{base_url}/rest",
+            wikipedia_api_url=f"{base_url}/w/api.php",
+            http_cache=HTTPResponseCache(str(cache_dir or checkpoint_path) + "-http"),
+            page_store=WikiPageStore(str(checkpoint_path) + "-pages.sqlite3"),
+        ),
+        embed=lambda items: None,
+        generate=generate,
+        persist=persisted.append,
+        workers={"fetch": 2, "wiki": 2, "embed": 1, "llm": 2, "persist": 1},
+        checkpoint_path=str(checkpoint_path),
+    )
+
+
+@pytest.mark.anyio
+async def test_pipeline_processes_all_cities(stub_server, tmp_path):
+    persisted = []
+    stats = await make_pipeline(stub_server, tmp_path / "ckpt", persisted).run()
+
+    assert sorted(d["name"] for d in persisted) == ["Paris", "Rome"]
+    assert {d["description"] for d in persisted} == {
+        "Capital of France.",
+        "Capital of Italy.",
+    }
+    assert stats["persist"].processed == 2
+    assert all(stage.failed == 0 for stage in stats.values())
+    # Cities come from the bulk /all payload, not one /alpha request per country
+    assert not [path for path in StubHandler.requests if "/alpha/" in path]
+
+
+@pytest.mark.anyio
+async def test_recrawl_revalidates_cached_responses(stub_server, tmp_path):
+    cache_dir = tmp_path / "http"
+    await make_pipeline(stub_server, tmp_path / "a", [], cache_dir=cache_dir).run()
+    assert StubHandler.not_modified == 0
+
+    persisted = []
+    await make_pipeline(
+        stub_server, tmp_path / "b", persisted, cache_dir=cache_dir
+    ).run()
+    assert sorted(d["description"] for d in persisted) == [
+        "Capital of France.",
+        "Capital of Italy.",
+    ]
+    # At least the /all listing was answered with 304 from the stub
+    assert StubHandler.not_modified >= 1
+
+
+@pytest.mark.anyio
+async def test_pipeline_resumes_from_checkpoint(stub_server, tmp_path):
+    checkpoint = tmp_path / "ckpt"
+    persisted = []
+    stats = await make_pipeline(
+        stub_server, checkpoint, persisted, fail_on={"Rome"}
+    ).run()
+    assert [d["name"] for d in persisted] == ["Paris"]
+    assert stats["llm"].failed == 1
+
+    persisted = []
+    await make_pipeline(stub_server, checkpoint, persisted).run()
+    assert [d["name"] for d in persisted] == ["Rome"]
+
+
+def wiki_requests(prop):
+    return [path for path in StubHandler.requests if "api.php" in path and prop in path]
+
+
+@pytest.mark.anyio
+async def test_batch_fetcher_resolves_titles_in_bulk(stub_server, tmp_path):
+    store = WikiPageStore(str(tmp_path / "pages.sqlite3"))
+    places = [
+        ("Paris", "France"),
+        ("Roma", "Italy"),
+        ("Georgetown", "Guyana"),
+        ("Atlantis", "Greece"),
+    ]
+    async with httpx.AsyncClient() as client:
+        wikipedia = WikipediaBatchFetcher(client, f"{stub_server}/w/api.php", store)
+        infos = await wikipedia.fetch_wikipedia_infos(places)
+
+        assert infos[("Paris", "France")]["summary"] == "Capital of France."
+        assert infos[("Roma", "Italy")] == {
+            "summary": "Capital of Italy.",
+            "url": "w/Rome",
+        }
+        assert infos[("Georgetown", "Guyana")]["summary"] == "Capital of Guyana."
+        assert infos[("Atlantis", "Greece")] == {"summary": "", "url": ""}
+        # One info, extract and links query for the cities, then one info and
+        # extract query for the chosen disambiguation link
+        assert len(wiki_requests("prop=info")) == 2
+        assert len(wiki_requests("prop=extracts")) == 2
+        assert len(wiki_requests("prop=links")) == 1
+
+        StubHandler.requests = []
+        assert await wikipedia.fetch_wikipedia_infos(places) == infos
+        # Unchanged revisions come from the page store
+        assert len(wiki_requests("prop=info")) == 2
+        assert not wiki_requests("prop=extracts")
+        assert not wiki_requests("prop=links")
+        assert len(store) == 4
+
+
+@pytest.mark.anyio
+async def test_batch_fetcher_refetches_new_revisions(
+    stub_server, tmp_path, monkeypatch
+):
+    store = WikiPageStore(str(tmp_path / "pages.sqlite3"))
+    async with httpx.AsyncClient() as client:
+        wikipedia = WikipediaBatchFetcher(client, f"{stub_server}/w/api.php", store)
+        await wikipedia.fetch_pages(["Paris"])
+        monkeypatch.setitem(
+            WIKI_PAGES, "Paris", {"lastrevid": 2, "extract": "City of light."}
+        )
+        pages = await wikipedia.fetch_pages(["Paris"])
+
+    assert pages["Paris"]["revid"] == 2
+    assert pages["Paris"]["extract"] == "City of light."
+    # The superseded revision is dropped
+    assert store.get("Paris", 1) is None and len(store) == 1
+
+
+def test_mock_itineraries_are_seeded_parallel_and_batched():
+    destinations = [
+        {"id": f"d{i}", "name": f"City {i}", "latitude": 40.0 + i, "longitude": 2.0}
+        for i in range(8)
+    ]
+    first = mock_requests(destinations, 10, seed=7)
+    assert first == mock_requests(destinations, 10, seed=7)
+    assert first != mock_requests(destinations, 10, seed=8)
+
+    calls = collections.Counter()
+    seeds = {}
+    lock = threading.Lock()
+
+    def generate(user_preferences, names, duration, destination_details, seed):
+        index = int(user_preferences.user_id.rsplit("-", 1)[1])
+        with lock:
+            calls[index] += 1
+            seeds[index] = seed
+            attempt = calls[index]
+        if index == 5 or (index == 3 and attempt < 3):
+            raise ValueError("malformed JSON")
+        start = datetime(2024, 6, 1)
+        return Itinerary(
+            id=f"it{index}",
+            title=f"Trip {index}",
+            start_date=start,
+            end_date=start + timedelta(days=duration),
+            user_id=user_preferences.user_id,
+            total_budget=user_preferences.budget,
+            destinations=[],
+            theme="cultural",
+            flexibility="flexible",
+            sustainability_score=5,
+            created_at=start,
+            updated_at=start,
+        )
+
+    inserted = []
+    progress = generate_mock_itineraries(
+        10,
+        workers=4,
+        seed=7,
+        batch_size=4,
+        retry_wait=0,
+        destinations=destinations,
+        generate=generate,
+        insert=lambda batch: inserted.append([it.id for it in batch]),
+    )
+
+    assert (progress.succeeded, progress.failed) == (9, 1)
+    assert calls[3] == 3 and calls[5] == 3
+    assert [len(batch) for batch in inserted] == [4, 4, 1]
+    assert sorted(i for batch in inserted for i in batch) == sorted(
+        f"it{i}" for i in range(10) if i != 5
+    )
+    assert seeds == {i: 7 + i for i in range(10)}
+
+    def insert(batch):
+        raise ConnectionError("database unavailable")
+
+    progress = generate_mock_itineraries(
+        10,
+        workers=4,
+        seed=7,
+        batch_size=4,
+        retry_wait=0,
+        destinations=destinations,
+        generate=generate,
+        insert=insert,
+    )
+    assert (progress.succeeded, progress.failed) == (0, 10)
+
+
+def test_mock_itinerary_prompts_include_the_sampled_rows():
+    destinations = [
+        {"id": "paris", "name": "Paris", "description": "City of light."},
+        {"id": "rome", "name": "Rome", "description": "The eternal city."},
+    ]
+    prompts = []
+
+    class RecordingLLM:
+        def generate(self, prompts_, format=None, options=None):
+            prompts.extend(prompts_)
+            start = datetime(2024, 6, 1)
+            itinerary = Itinerary(
+                id="it0",
+                title="Trip",
+                start_date=start,
+                end_date=start + timedelta(days=7),
+                user_id="mock-user-0",
+                total_budget=1000,
+                destinations=[],
+                theme="cultural",
+                flexibility="flexible",
+                sustainability_score=5,
+                created_at=start,
+                updated_at=start,
+            )
+            return LLMResult(
+                generations=[[Generation(text=itinerary.model_dump_json())]]
+            )
+
+    service = LLMService(
+        router=ModelRouter(
+            models={"large": "model"}, llm_factory=lambda _: RecordingLLM()
+        ),
+        cache=LLMResponseCache(similarity_threshold=None),
+        hierarchical_min_days=10**6,
+    )
+    progress = generate_mock_itineraries(
+        1,
+        workers=1,
+        destinations=destinations,
+        generate=service.generate_itinerary,
+        insert=lambda batch: None,
+    )
+
+    assert progress.succeeded == 1
+    assert "City of light." in prompts[0] and "The eternal city." in prompts[0]
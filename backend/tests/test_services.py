@@ -1,10 +1,42 @@
+import asyncio
+import json
+import threading
+import numpy as np
+import time
+from datetime import datetime, timedelta
 import pytest
 from unittest.mock import Mock, patch
-from app.services.llm_service import LLMService
+from app.models.job import ItineraryGenerationRequest, JobStatus
+from app.services.job_queue import JobQueue, JobQueueFullError, UserJobLimitError
+from app.services.cache import InMemorySharedCache, TTLCache
+from app.services.destination_cache import DestinationCache
+from app.services.embedding_cache import CachedEmbeddings
+from app.services.llm_service import (
+    LLMResponseCache,
+    LLMService,
+    ModelRouter,
+    prompt_cache_key,
+)
+from app.services.json_repair import repair_json
+from app.services.prompt_context import PromptContextBuilder, TokenCounter
+from app.services.prompts import PromptRegistry
+from app.services.route_optimizer import RouteOptimizer
+from app.services.spatial_index import SpatialIndex
+from app.services.stream_parser import IncrementalItineraryParser
+from app.services.supabase_client import SupabaseClientManager
 from app.services.vector_store import VectorStoreService
+from langchain_core.embeddings import Embeddings
+from langchain_core.outputs import Generation, LLMResult
+from pydantic import BaseModel, ValidationError
 from backend.app.models.destination import Destination
 from backend.app.models.user import UserPreferences
-from app.models.itinerary import Itinerary
+from app.models.itinerary import DestinationInItinerary, Itinerary
+from app.utils.geo import apply_route_metrics, haversine_km, pairwise_distances_km
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
 
 
 @pytest.fixture
@@ -63,3 +95,721 @@ def test_search_destinations(vector_store_service):
     results = vector_store_service.search_destinations("beautiful city")
     assert len(results) > 0
     # Assert that the results are relevant (this might require mocking the Chroma client)
+
+
+@pytest.mark.anyio
+async def test_supabase_execute_offloads_query():
+    manager = SupabaseClientManager(max_concurrency=2)
+    query = Mock()
+    query.execute.return_value = "result"
+    assert await manager.execute(query) == "result"
+    query.execute.assert_called_once_with()
+    assert manager.limiter.total_tokens == 2
+
+
+def make_generation_request():
+    return ItineraryGenerationRequest(
+        user_preferences=UserPreferences(
+            user_id="test_user",
+            interests=["history"],
+            budget=1000.0,
+            preferred_travel_style="relaxed",
+            preferred_activities=["sightseeing"],
+        ),
+        destinations=["Paris"],
+        duration=3,
+    )
+
+
+@pytest.mark.anyio
+async def test_job_queue_runs_job_and_reports_progress():
+    queue = JobQueue(workers=1)
+    itinerary = Mock()
+    resume = asyncio.Event()
+
+    async def handler(job, report):
+        await report("generating", 0.5)
+        await resume.wait()
+        return itinerary
+
+    job = await queue.submit("test_user", make_generation_request(), handler)
+    updates = []
+    async for update in queue.watch(job.id):
+        updates.append(update)
+        if update.stage == "generating":
+            resume.set()
+    await queue.stop()
+
+    assert [update.progress for update in updates if update.stage == "generating"]
+    assert updates[-1].status == JobStatus.SUCCEEDED
+    assert updates[-1].result is itinerary
+
+
+@pytest.mark.anyio
+async def test_job_queue_records_handler_failure():
+    queue = JobQueue(workers=1)
+
+    async def handler(job, report):
+        raise ValueError("model returned invalid JSON")
+
+    job = await queue.submit("test_user", make_generation_request(), handler)
+    updates = [update async for update in queue.watch(job.id)]
+    await queue.stop()
+
+    assert updates[-1].status == JobStatus.FAILED
+    assert updates[-1].error == "model returned invalid JSON"
+
+
+@pytest.mark.anyio
+async def test_job_queue_backpressure_and_user_limit():
+    queue = JobQueue(workers=1, max_queue_size=2, max_jobs_per_user=1)
+    release = asyncio.Event()
+
+    async def handler(job, report):
+        await release.wait()
+
+    await queue.submit("user_a", make_generation_request(), handler)
+    with pytest.raises(UserJobLimitError):
+        await queue.submit("user_a", make_generation_request(), handler)
+
+    await asyncio.sleep(0)  # let the worker pick up user_a's job
+    await queue.submit("user_b", make_generation_request(), handler)
+    await queue.submit("user_c", make_generation_request(), handler)
+    with pytest.raises(JobQueueFullError):
+        await queue.submit("user_d", make_generation_request(), handler)
+
+    release.set()
+    await queue.stop()
+
+
+@pytest.mark.anyio
+async def test_job_queue_restart_fails_orphaned_jobs_and_frees_users():
+    queue = JobQueue(workers=1, max_jobs_per_user=2)
+    release = asyncio.Event()
+
+    async def handler(job, report):
+        await release.wait()
+
+    running = await queue.submit("user_a", make_generation_request(), handler)
+    await asyncio.sleep(0)  # let the worker pick up the first job
+    queued = await queue.submit("user_a", make_generation_request(), handler)
+    await queue.stop()
+
+    # The next request starts the queue again, as a new event loop would
+    await queue.submit("user_a", make_generation_request(), handler)
+    await queue.submit("user_a", make_generation_request(), handler)
+    for job in (running, queued):
+        assert queue.get(job.id).status == JobStatus.FAILED
+        assert "restarted" in queue.get(job.id).error
+
+    release.set()
+    await queue.stop()
+
+
+def test_incremental_parser_emits_destinations_as_they_close():
+    output = (
+        "Here is your itinerary:\n"
+        '{"title": "Trip {with} \\"braces\\"", "destinations": ['
+        '{"destination_id": "paris", "arrival_time": "2024-06-01T10:00:00",'
+        ' "departure_time": "2024-06-03T10:00:00"},'
+        '{"destination_id": "rome", "arrival_time": "2024-06-03T18:00:00",'
+        ' "departure_time": "2024-06-06T10:00:00", "accommodation_id": null}'
+        '], "theme": "cultural"}'
+    )
+    parser = IncrementalItineraryParser()
+    emitted = []
+    for i in range(0, len(output), 7):
+        for destination in parser.feed(output[i : i + 7]):
+            emitted.append((destination.destination_id, len(parser.text)))
+
+    assert [destination_id for destination_id, _ in emitted] == ["paris", "rome"]
+    # Each entry is emitted before the rest of the document has arrived
+    assert emitted[0][1] < output.index('{"destination_id": "rome"') + 7
+    assert parser.text == output
+
+
+def test_ttl_cache_evicts_lru_and_expired_entries():
+    now = [0.0]
+    cache = TTLCache(max_entries=2, ttl_seconds=10, clock=lambda: now[0])
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)  # evicts "b", the least recently used
+    assert cache.get("b") is None
+    now[0] = 11
+    assert cache.get("a") is None
+    assert cache.stats() == {
+        "size": 1,
+        "hits": 1,
+        "misses": 2,
+        "evictions": 1,
+        "hit_rate": 1 / 3,
+    }
+
+
+def test_prompt_cache_key_normalizes_inputs():
+    preferences = {"interests": ["Food", "history"], "budget": 1000.0}
+    reordered = {"budget": 1000.001, "interests": ["history ", "food"]}
+    assert prompt_cache_key("itinerary", preferences) == prompt_cache_key(
+        "itinerary", reordered
+    )
+    assert prompt_cache_key("itinerary", preferences) != prompt_cache_key(
+        "itinerary", {**preferences, "budget": 2000.0}
+    )
+
+
+def test_llm_cache_serves_near_duplicate_preferences():
+    cache = LLMResponseCache(similarity_threshold=0.9, embed=Mock())
+    itinerary = Mock()
+    itinerary.model_copy.return_value = itinerary
+    cache.set("key", itinerary)
+    cache.index("paris-7-days", "key", [1.0, 0.0], budget=1000)
+
+    assert cache.get_similar("paris-7-days", [0.99, 0.05], budget=1050) is itinerary
+    assert cache.get_similar("paris-7-days", [0.0, 1.0], budget=1000) is None
+    assert cache.get_similar("paris-7-days", [1.0, 0.0], budget=2000) is None
+    assert cache.get_similar("rome-7-days", [1.0, 0.0], budget=1000) is None
+    assert cache.stats()["semantic_hits"] == 1
+
+
+class FakeLLM:
+    def __init__(self, outputs):
+        self.outputs = list(outputs)
+        self.prompts = []
+        self.formats = []
+        self.options = []
+
+    def generate(self, prompts, format=None, options=None):
+        self.prompts.extend(prompts)
+        self.formats.append(format)
+        self.options.append(options)
+        info = {"prompt_eval_count": 10, "eval_count": 20, "done": True}
+        return LLMResult(
+            generations=[[Generation(text=self.outputs.pop(0), generation_info=info)]]
+        )
+
+
+class Place(BaseModel):
+    name: str
+    country: str
+
+
+def test_model_router_falls_back_to_larger_tier_on_invalid_output():
+    valid = Place(name="Lyon", country="France").model_dump_json()
+    llms = {"small-model": FakeLLM(['{"name": "Lyon"']), "big-model": FakeLLM([valid])}
+    router = ModelRouter(
+        models={"small": "small-model", "large": "big-model"},
+        task_tiers={"destination_info": "small", "itinerary": "large"},
+        llm_factory=llms.__getitem__,
+    )
+
+    assert router.tiers_for("itinerary") == ["large"]
+    assert router.invoke("destination_info", "prompt", Place).name == "Lyon"
+    assert llms["small-model"].prompts == llms["big-model"].prompts == ["prompt"]
+
+    stats = router.stats()
+    assert stats["small-model"]["invalid_outputs"] == 1
+    assert stats["small-model"]["fallbacks"] == 1
+    assert stats["big-model"]["calls"] == 1
+    assert stats["big-model"]["invalid_outputs"] == 0
+    assert stats["big-model"]["completion_tokens"] == 20
+
+
+def test_model_router_constrains_format_and_repairs_near_misses():
+    near_miss = 'Here you go:\n```json\n{"name": "Lyon", "country": "France",}\n```'
+    truncated = '{"name": "Lyon", "country": "France", "notes": ["old town", "tra'
+    llm = FakeLLM([near_miss, truncated, '{"name": "Lyon"}'])
+    router = ModelRouter(
+        models={"large": "big-model"}, task_tiers={}, llm_factory=lambda _: llm
+    )
+
+    assert router.invoke("itinerary", "prompt", Place).country == "France"
+    assert router.invoke("itinerary", "prompt", Place).country == "France"
+    with pytest.raises(ValidationError):
+        router.invoke("itinerary", "prompt", Place)
+
+    assert llm.formats[0] == Place.model_json_schema()
+    stats = router.stats()["big-model"]
+    assert stats["repaired_outputs"] == 2
+    assert stats["invalid_outputs"] == 1
+    assert stats["wasted_tokens"] == 20
+
+
+def test_model_router_seeds_sampling_when_asked():
+    valid = Place(name="Lyon", country="France").model_dump_json()
+    llm = FakeLLM([valid, valid])
+    router = ModelRouter(
+        models={"large": "big-model"},
+        llm_factory=lambda _: llm,
+        seed_temperature=0.5,
+    )
+
+    router.invoke("itinerary", "prompt", Place)
+    router.invoke("itinerary", "prompt", Place, seed=42)
+    assert llm.options == [None, {"seed": 42, "temperature": 0.5}]
+
+
+class SchemaRoutedLLM:
+    """Answers by the requested output schema, like a format-constrained model."""
+
+    def __init__(self, outputs):
+        self.outputs = outputs
+        self.calls = []
+
+    def generate(self, prompts, format=None):
+        self.calls.append(format["title"])
+        text = self.outputs[format["title"]](prompts[0])
+        return LLMResult(generations=[[Generation(text=text)]])
+
+
+def test_long_trips_are_planned_as_skeleton_then_filled_concurrently():
+    start = datetime(2024, 6, 1)
+    skeleton = {
+        "title": "Iberia",
+        "start_date": start.isoformat(),
+        "end_date": (start + timedelta(days=9)).isoformat(),
+        "total_budget": 3000,
+        "theme": "cultural",
+        "flexibility": "flexible",
+        "sustainability_score": 7,
+        "destinations": [
+            {
+                "destination_id": name,
+                "arrival_time": (start + timedelta(days=3 * i)).isoformat(),
+                "departure_time": (start + timedelta(days=3 * i + 2)).isoformat(),
+            }
+            for i, name in enumerate(["Porto", "Lisbon", "Seville"])
+        ],
+    }
+    barrier = threading.Barrier(3, timeout=5)
+
+    def stop_details(prompt):
+        barrier.wait()  # Only passes if all three stops are in flight at once
+        name = prompt.split(": ", 1)[1].split(",", 1)[0]
+        return json.dumps({"accommodation_id": f"hotel-{name}"})
+
+    llm = SchemaRoutedLLM(
+        {
+            "ItinerarySkeleton": lambda _: json.dumps(skeleton),
+            "StopDetails": stop_details,
+        }
+    )
+    service = LLMService(
+        router=ModelRouter(models={"large": "model"}, llm_factory=lambda _: llm),
+        cache=LLMResponseCache(similarity_threshold=None),
+        stop_workers=3,
+    )
+    preferences = UserPreferences(
+        user_id="user-1",
+        interests=["food"],
+        budget=3000,
+        preferred_travel_style="mid-range",
+        preferred_activities=["dining"],
+    )
+
+    destination_details = [
+        {"id": f"dest-{name}", "name": name, "description": f"About {name}"}
+        for name in ["Seville", "Porto", "Lisbon"]
+    ]
+
+    itinerary = service.generate_itinerary(
+        preferences, ["Seville", "Porto", "Lisbon"], 10, destination_details
+    )
+
+    assert llm.calls[0] == "ItinerarySkeleton"
+    assert llm.calls.count("StopDetails") == 3
+    assert itinerary.user_id == "user-1"
+    assert [d.destination_id for d in itinerary.destinations] == [
+        "Porto",
+        "Lisbon",
+        "Seville",
+    ]
+    assert [d.accommodation_id for d in itinerary.destinations] == [
+        "hotel-Porto",
+        "hotel-Lisbon",
+        "hotel-Seville",
+    ]
+
+
+def test_prompt_context_projects_dedupes_and_fits_budget():
+    rows = [
+        {
+            "id": f"dest-{i}",
+            "name": name,
+            "country": "Portugal",
+            "description": f"{name} is a city. " * 200,
+            "currency": "EUR",
+            "languages": ["Portuguese"],
+            "latitude": 41.1,
+            "created_at": "2024-01-01T00:00:00+00:00",
+        }
+        for i, name in enumerate(["Porto", "Lisbon"])
+    ]
+    builder = PromptContextBuilder(TokenCounter(tokenizer=None), token_budget=200)
+
+    text = builder.destinations(rows)
+    context = json.loads(text)
+
+    assert builder.counter.count(text) <= 200
+    assert context["countries"] == {
+        "Portugal": {"currency": "EUR", "languages": ["Portuguese"]}
+    }
+    porto, lisbon = context["destinations"]
+    assert set(porto) == {"name", "country", "description"}
+    assert porto["description"].startswith("Porto is a city.")
+    assert porto["description"].endswith("…")
+    assert abs(len(porto["description"]) - len(lisbon["description"])) < 20
+
+    scraped = {
+        "name": "Porto",
+        "country": "Portugal",
+        "description": "Port wine.",
+        "country_data": {
+            "name": {"common": "Portugal", "official": "Portuguese Republic"},
+            "capital": ["Lisbon"],
+            "currencies": {"EUR": {"name": "Euro", "symbol": "€"}},
+            "languages": {"por": "Portuguese"},
+            "flags": {"png": "https://flagcdn.com/w320/pt.png"},
+            "translations": {"fra": {"common": "Portugal"}},
+        },
+    }
+    assert json.loads(builder.scraped_data(scraped))["country_data"] == {
+        "name": "Portugal",
+        "capital": ["Lisbon"],
+        "languages": ["Portuguese"],
+        "currencies": ["Euro (EUR)"],
+    }
+
+
+def test_repair_json_fixes_near_miss_output():
+    assert repair_json('Sure! {"a": [1, 2,], "b": True, "c": None} Enjoy') == (
+        '{"a": [1, 2], "b": true, "c": null}'
+    )
+    assert repair_json('{"a": "two\nlines", "b": [1, 2') == (
+        '{"a": "two\\nlines", "b": [1, 2]}'
+    )
+    assert repair_json('{"a": {"x": 1}, "b') == '{"a": {"x": 1}}'
+    assert repair_json('{"a": 1, "b":') == '{"a": 1, "b": null}'
+
+
+def test_prompt_registry_versions():
+    registry = PromptRegistry(pinned_versions={"greeting": "v1"})
+    registry.register("greeting", "v1", "Hello {name}", input_variables=["name"])
+    registry.register("greeting", "v2", "Hi {name}", input_variables=["name"])
+    registry.register(
+        "destination", "v1", "{format_instructions}", [], output_model=Destination
+    )
+
+    assert registry.versions("greeting") == ["v1", "v2"]
+    assert registry.get("greeting").format(name="Ada") == "Hello Ada"
+    assert registry.get("greeting", "v2").format(name="Ada") == "Hi Ada"
+    assert "latitude" in registry.get("destination").format()
+    with pytest.raises(KeyError):
+        registry.get("greeting", "v3")
+
+
+class CountingEmbeddings(Embeddings):
+    def __init__(self):
+        self.calls = []
+
+    def embed_documents(self, texts):
+        self.calls.append(len(texts))
+        return [[float(len(text)), 1.0, 0.0] for text in texts]
+
+    def embed_query(self, text):
+        self.calls.append("query")
+        return [float(len(text)), 1.0, 0.0]
+
+
+def test_add_destinations_batches_and_skips_unchanged(tmp_path):
+    embeddings = CountingEmbeddings()
+    service = VectorStoreService(
+        batch_size=2, embeddings=embeddings, persist_directory=str(tmp_path)
+    )
+    destinations = [
+        Destination(
+            id=f"dest-{i}",
+            name=f"City {i}",
+            country="Testland",
+            description=f"Description of city {i}",
+            latitude=0.0,
+            longitude=0.0,
+            timezone="UTC",
+            currency="USD",
+            local_currency="US Dollar",
+            languages=["English"],
+            best_seasons=["summer"],
+            safety_rating=8.0,
+            created_at=datetime(2024, 1, 1),
+            updated_at=datetime(2024, 1, 1),
+        )
+        for i in range(5)
+    ]
+
+    assert service.add_destinations(destinations) == 5
+    assert embeddings.calls == [2, 2, 1]
+
+    embeddings.calls.clear()
+    assert service.add_destinations(destinations) == 0
+    assert embeddings.calls == []
+
+    destinations[3] = destinations[3].model_copy(update={"description": "Renamed"})
+    assert service.add_destinations(destinations) == 1
+    assert embeddings.calls == [1]
+    assert service.vector_store.get(ids=["dest-3"])["documents"] == ["Renamed"]
+
+    # Same description, new name: the metadata must not go stale
+    destinations[4] = destinations[4].model_copy(update={"name": "New City 4"})
+    assert service.add_destinations(destinations) == 1
+    stored = service.vector_store.get(ids=["dest-4"], include=["metadatas"])
+    assert stored["metadatas"][0]["name"] == "New City 4"
+
+
+def test_cached_embeddings_reuse_vectors_across_instances(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite3")
+    inner = CountingEmbeddings()
+    cache = CachedEmbeddings(inner, "test-model", path, max_entries=3)
+
+    assert cache.embed_documents(["a", "bb", "a"]) == [
+        [1.0, 1.0, 0.0],
+        [2.0, 1.0, 0.0],
+        [1.0, 1.0, 0.0],
+    ]
+    assert inner.calls == [2]
+    assert cache.embed_query("bb") == [2.0, 1.0, 0.0]
+    assert cache.stats()["hit_rate"] == 0.5
+
+    # A fresh process starts with an empty memory tier but reads the file
+    reopened = CachedEmbeddings(inner, "test-model", path, max_entries=3)
+    reopened.embed_documents(["a", "ccc", "dddd"])
+    assert inner.calls == [2, 2]
+    stats = reopened.stats()
+    assert (stats["size"], stats["evictions"], stats["hits"]) == (3, 1, 1)
+
+    # Vectors from another model are never reused
+    CachedEmbeddings(inner, "other-model", path).embed_query("a")
+    assert inner.calls == [2, 2, "query"]
+
+
+def test_cached_embeddings_keep_memory_hits_and_chunk_lookups(tmp_path, monkeypatch):
+    path = str(tmp_path / "embeddings.sqlite3")
+    inner = CountingEmbeddings()
+    cache = CachedEmbeddings(inner, "test-model", path, max_entries=2)
+
+    cache.embed_query("a")
+    time.sleep(0.01)
+    cache.embed_query("bb")
+    time.sleep(0.01)
+    # Served from memory, but still the most recently used key on disk
+    cache.embed_query("a")
+    cache.embed_query("ccc")
+
+    reopened = CachedEmbeddings(inner, "test-model", path, max_entries=2)
+    inner.calls.clear()
+    reopened.embed_documents(["a", "ccc"])
+    assert inner.calls == []
+
+    # Lookups larger than one statement's parameter limit are chunked
+    monkeypatch.setattr("app.services.embedding_cache.SQLITE_MAX_VARIABLES", 3)
+    texts = ["x" * n for n in range(1, 11)]
+    big = CachedEmbeddings(inner, "test-model", str(tmp_path / "big.sqlite3"))
+    big.embed_documents(texts)
+    fresh = CachedEmbeddings(inner, "test-model", str(tmp_path / "big.sqlite3"))
+    assert fresh.embed_documents(texts) == [[float(n), 1.0, 0.0] for n in range(1, 11)]
+    assert fresh.stats()["hits"] == 10
+
+
+def brute_force(entries, latitude, longitude):
+    return sorted(
+        (
+            float(haversine_km(latitude, longitude, e["latitude"], e["longitude"])),
+            e["id"],
+        )
+        for e in entries
+    )
+
+
+def test_spatial_index_matches_brute_force():
+    rng = np.random.default_rng(3)
+    entries = [
+        {"id": f"d{i}", "latitude": lat, "longitude": lon}
+        for i, (lat, lon) in enumerate(
+            zip(rng.uniform(-89, 89, 2000), rng.uniform(-180, 180, 2000))
+        )
+    ]
+    index = SpatialIndex(cell_degrees=2.0)
+    index.rebuild(entries)
+
+    for latitude, longitude in [(48.85, 2.35), (-33.9, 151.2), (0.0, 179.9), (88, 0)]:
+        expected = brute_force(entries, latitude, longitude)
+        within = index.within(latitude, longitude, 1500)
+        assert [e["id"] for e, _ in within] == [
+            entry_id for distance, entry_id in expected if distance <= 1500
+        ]
+        nearest = index.nearest(latitude, longitude, 7)
+        assert [e["id"] for e, _ in nearest] == [
+            entry_id for _, entry_id in expected[:7]
+        ]
+
+
+def test_spatial_index_updates_incrementally():
+    index = SpatialIndex()
+    index.rebuild(
+        [
+            {"id": "paris", "latitude": 48.8566, "longitude": 2.3522},
+            {"id": "rome", "latitude": 41.9028, "longitude": 12.4964},
+        ]
+    )
+    matrix = index.distance_matrix(["paris", "rome"])
+    assert matrix[0, 0] == 0 and matrix[0, 1] == pytest.approx(1105.8, abs=1)
+    assert index.distance_matrix(["paris", "rome"]) is matrix
+
+    index.upsert({"id": "rome", "latitude": 40.4168, "longitude": -3.7038})
+    assert index.distance_matrix(["paris", "rome"])[0, 1] == pytest.approx(1053, abs=1)
+    assert [e["id"] for e, _ in index.within(40.4, -3.7, 50)] == ["rome"]
+    assert index.within(41.9, 12.5, 50) == []
+
+    index.remove("paris")
+    assert index.nearest(48.8566, 2.3522, 5, exclude="rome") == []
+    assert len(index) == 1
+
+
+def make_itinerary(stop_ids, stays):
+    start = datetime(2024, 6, 1)
+    stops, clock = [], start
+    for stop_id, stay in zip(stop_ids, stays):
+        stops.append(
+            DestinationInItinerary(
+                destination_id=stop_id,
+                arrival_time=clock,
+                departure_time=clock + timedelta(days=stay),
+            )
+        )
+        clock += timedelta(days=stay, hours=6)
+    return Itinerary(
+        id="it-route",
+        title="Zig-zag",
+        start_date=start,
+        end_date=clock,
+        user_id="user-1",
+        total_budget=2000,
+        destinations=stops,
+        theme="cultural",
+        flexibility="flexible",
+        sustainability_score=5,
+        created_at=start,
+        updated_at=start,
+    )
+
+
+def test_route_optimizer_unzigzags_and_keeps_schedule():
+    # West to east along the 45th parallel, visited out of order
+    rows = [
+        {"id": f"d{lon}", "name": f"City {lon}", "latitude": 45.0, "longitude": lon}
+        for lon in (0, 8, 2, 6, 4)
+    ]
+    itinerary = make_itinerary([row["id"] for row in rows], [1, 2, 3, 1, 2])
+    span = itinerary.destinations[-1].departure_time - itinerary.start_date
+
+    report = RouteOptimizer(index=SpatialIndex()).optimize_itinerary(
+        itinerary, rows, start="d0"
+    )
+
+    assert report.optimized_order == ["d0", "d2", "d4", "d6", "d8"]
+    assert report.optimized_distance_km < report.original_distance_km / 2
+    assert report.optimized_cost < report.original_cost
+    assert [stop.destination_id for stop in itinerary.destinations] == (
+        report.optimized_order
+    )
+    # Same stays per destination, same overall span
+    stays = {
+        stop.destination_id: stop.departure_time - stop.arrival_time
+        for stop in itinerary.destinations
+    }
+    assert stays["d8"] == timedelta(days=2) and stays["d4"] == timedelta(days=2)
+    assert itinerary.destinations[-1].departure_time - itinerary.start_date == span
+
+    # A stop moved to the front keeps no leg from its old predecessor
+    apply_route_metrics([itinerary], rows)
+    RouteOptimizer(index=SpatialIndex()).optimize_itinerary(itinerary, rows, start="d8")
+    apply_route_metrics([itinerary], rows)
+    first, *rest = itinerary.destinations
+    assert first.destination_id == "d8"
+    assert first.travel_time_from_previous is None
+    assert first.travel_cost_from_previous is None
+    assert all(stop.travel_time_from_previous > 0 for stop in rest)
+
+
+def test_route_optimizer_respects_pins_and_is_fast():
+    rng = np.random.default_rng(11)
+    latitudes, longitudes = rng.uniform(35, 60, 50), rng.uniform(-10, 30, 50)
+    distances = pairwise_distances_km(latitudes, longitudes)
+    optimizer = RouteOptimizer(index=SpatialIndex())
+
+    started = time.perf_counter()
+    order = optimizer.optimize_order(distances, start=7, end=3)
+    assert time.perf_counter() - started < 0.5
+
+    assert sorted(order) == list(range(50))
+    assert order[0] == 7 and order[-1] == 3
+    length = sum(distances[a, b] for a, b in zip(order, order[1:]))
+    given = [7] + [i for i in range(50) if i not in (7, 3)] + [3]
+    assert length < sum(distances[a, b] for a, b in zip(given, given[1:]))
+
+
+def test_route_optimizer_avoids_legs_over_travel_limit():
+    # Shortest from A is A-B-C-D, but its last leg is 150 km
+    distances = np.array(
+        [
+            [0, 60, 120, 200],
+            [60, 0, 100, 120],
+            [120, 100, 0, 150],
+            [200, 120, 150, 0],
+        ],
+        dtype=float,
+    )
+    optimizer = RouteOptimizer(index=SpatialIndex())
+    assert optimizer.optimize_order(distances, start=0) == [0, 1, 2, 3]
+    assert optimizer.optimize_order(distances, start=0, max_leg_km=130) == [
+        0,
+        2,
+        1,
+        3,
+    ]
+
+
+def test_destination_cache_follows_renames_and_deletes():
+    cache = DestinationCache()
+    cache.put_many(
+        [{"id": "d1", "name": "Paris"}, {"id": "d2", "name": "Rome"}],
+    )
+    found, missing = cache.lookup_names(["Rome", "Oslo", "Paris", "Rome"])
+    assert list(found) == ["Rome", "Paris"] and missing == ["Oslo"]
+
+    cache.put({"id": "d1", "name": "Paris, France"})
+    assert cache.get_by_name("Paris") is None
+    assert cache.get_by_name("Paris, France")["id"] == "d1"
+
+    cache.invalidate("d2")
+    assert cache.lookup_names(["Rome"]) == ({}, ["Rome"])
+
+
+def test_destination_cache_shares_rows_and_versions_between_workers():
+    shared = InMemorySharedCache()
+    worker_a = DestinationCache(shared=shared)
+    worker_b = DestinationCache(shared=shared)
+
+    worker_a.put({"id": "d1", "name": "Paris"})
+    assert worker_b.get("d1") == {"id": "d1", "name": "Paris"}
+    assert worker_b.get("d1") is not None
+    stats = worker_b.stats()["rows"]
+    assert (stats["shared_hits"], stats["local_hits"], stats["misses"]) == (1, 1, 0)
+
+    key = worker_b.page_key("limit=50")
+    worker_b.pages.set(key, {"body": b"[]"})
+    assert worker_a.pages.get(worker_a.page_key("limit=50")) == {"body": b"[]"}
+
+    # A write on one worker retires every cached page on all of them
+    worker_a.invalidate("d1", {"id": "d1", "name": "Paris, France"})
+    assert worker_b.page_key("limit=50") != key
+    assert worker_b.pages.get(worker_b.page_key("limit=50")) is None
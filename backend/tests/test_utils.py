@@ -0,0 +1,104 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from app.models.itinerary import DestinationInItinerary, Itinerary
+from app.utils.geo import (
+    apply_route_metrics,
+    batch_route_metrics,
+    calculate_distance,
+    haversine_km,
+    vincenty_km,
+)
+from app.models.destination import Season
+from app.utils.country import determine_best_seasons
+from geopy.distance import geodesic
+
+
+@pytest.fixture
+def coordinate_pairs():
+    rng = np.random.default_rng(7)
+    lat = rng.uniform(-80, 80, size=(500, 2))
+    lon = rng.uniform(-180, 180, size=(500, 2))
+    return lat[:, 0], lon[:, 0], lat[:, 1], lon[:, 1]
+
+
+def test_distance_modes_match_geodesic_within_documented_bounds(coordinate_pairs):
+    lat1, lon1, lat2, lon2 = coordinate_pairs
+    expected = np.array(
+        [
+            geodesic((a, b), (c, d)).kilometers
+            for a, b, c, d in zip(lat1, lon1, lat2, lon2)
+        ]
+    )
+    assert np.abs(vincenty_km(lat1, lon1, lat2, lon2) - expected).max() < 1e-6
+    relative = np.abs(haversine_km(lat1, lon1, lat2, lon2) - expected) / expected
+    assert relative.max() < 0.0056
+
+
+def test_vincenty_handles_coincident_and_antipodal_points():
+    assert calculate_distance(48.85, 2.35, 48.85, 2.35) == 0.0
+    # Does not converge; falls back to the spherical distance
+    assert calculate_distance(0.0, 0.0, 0.5, 179.7) == pytest.approx(
+        float(haversine_km(0.0, 0.0, 0.5, 179.7))
+    )
+
+
+def test_batch_route_metrics_splits_legs_per_route():
+    paris, rome, madrid = (48.8566, 2.3522), (41.9028, 12.4964), (40.4168, -3.7038)
+    first, second = batch_route_metrics(
+        [[paris, rome, madrid], [madrid, paris]],
+        base_costs=[[0, 10, 20], [0, 30]],
+        costs_per_km=[[0, 1, 1], [0, 2]],
+        method="haversine",
+    )
+    assert len(first.distances_km) == 2 and len(second.distances_km) == 1
+    assert first.travel_hours == pytest.approx(first.distances_km / 100)
+    assert second.costs[0] == pytest.approx(30 + 2 * second.distances_km[0])
+    assert first.total_cost == pytest.approx(
+        10 + first.distances_km[0] + 20 + first.distances_km[1]
+    )
+
+
+def test_apply_route_metrics_fills_itinerary_legs():
+    start = datetime(2024, 6, 1)
+    itinerary = Itinerary(
+        id="it-1",
+        title="Two capitals",
+        start_date=start,
+        end_date=start + timedelta(days=4),
+        user_id="user-1",
+        total_budget=1000,
+        destinations=[
+            DestinationInItinerary(
+                destination_id=name,
+                arrival_time=start + timedelta(days=i * 2),
+                departure_time=start + timedelta(days=i * 2 + 1),
+            )
+            for i, name in enumerate(["Paris", "dest-rome"])
+        ],
+        theme="cultural",
+        flexibility="flexible",
+        sustainability_score=7,
+        created_at=start,
+        updated_at=start,
+    )
+    destinations = [
+        {"id": "dest-paris", "name": "Paris", "latitude": 48.8566, "longitude": 2.3522},
+        {"id": "dest-rome", "name": "Rome", "latitude": 41.9028, "longitude": 12.4964},
+    ]
+
+    apply_route_metrics([itinerary], destinations)
+
+    leg = itinerary.destinations[1]
+    distance = geodesic((48.8566, 2.3522), (41.9028, 12.4964)).kilometers
+    assert leg.travel_time_from_previous == pytest.approx(distance / 100)
+    assert itinerary.total_cost == pytest.approx(50 + 0.1 * distance)
+    assert itinerary.destinations[0].travel_time_from_previous is None
+
+
+def test_determine_best_seasons_by_latitude():
+    assert determine_best_seasons(48.9) == [Season.SPRING, Season.AUTUMN]
+    assert determine_best_seasons(-33.9) == [Season.SPRING, Season.AUTUMN]
+    assert determine_best_seasons(13.7) == [Season.WINTER, Season.SPRING]
+    assert determine_best_seasons(64.1) == [Season.SUMMER]
@@ -4,16 +4,18 @@ import { Card, CardHeader, CardTitle, CardContent } from "@/components/ui/card";
 import { Button } from "@/components/ui/button";
 import { useItineraryApi } from "@/hooks/useItineraryApi";
 
-interface Itinerary {
+interface ItinerarySummary {
     id: string;
     title: string;
     start_date: string;
     end_date: string;
-    total_budget: number;
+    total_cost: number;
+    stop_count: number;
 }
 
 export function ItineraryList() {
-    const [itineraries, setItineraries] = useState<Itinerary[]>([]);
+    const [itineraries, setItineraries] = useState<ItinerarySummary[]>([]);
+    const [nextCursor, setNextCursor] = useState<string | null>(null);
     const {
         generateItinerary,
         getItineraries,
@@ -23,10 +25,21 @@ export function ItineraryList() {
     } = useItineraryApi();
 
     const fetchItineraries = useCallback(async () => {
-        const data = await getItineraries();
-        if (data) setItineraries(data);
+        const page = await getItineraries();
+        if (page) {
+            setItineraries(page.itineraries);
+            setNextCursor(page.nextCursor);
+        }
     }, [getItineraries, setItineraries]);
 
+    const loadMore = async () => {
+        const page = await getItineraries(nextCursor);
+        if (page) {
+            setItineraries((loaded) => [...loaded, ...page.itineraries]);
+            setNextCursor(page.nextCursor);
+        }
+    };
+
     useEffect(() => {
         fetchItineraries();
     }, [fetchItineraries]);
@@ -58,7 +71,8 @@ export function ItineraryList() {
                             End Date:{" "}
                             {new Date(itinerary.end_date).toLocaleDateString()}
                         </p>
-                        <p>Total Budget: ${itinerary.total_budget}</p>
+                        <p>Stops: {itinerary.stop_count}</p>
+                        <p>Total Cost: ${itinerary.total_cost}</p>
                         <div className="mt-4 space-x-2">
                             <Button
                                 onClick={() => {
@@ -75,6 +89,11 @@ export function ItineraryList() {
                     </CardContent>
                 </Card>
             ))}
+            {nextCursor && (
+                <Button variant="outline" onClick={loadMore}>
+                    Load More
+                </Button>
+            )}
         </div>
     );
 }
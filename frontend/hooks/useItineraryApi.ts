@@ -30,6 +30,34 @@ interface Itinerary {
     updated_at: string;
 }
 
+interface ItinerarySummary {
+    id: string;
+    title: string;
+    start_date: string;
+    end_date: string;
+    status: string;
+    theme: string;
+    total_cost: number;
+    stop_count: number;
+    created_at: string;
+}
+
+interface ItineraryPage {
+    itineraries: ItinerarySummary[];
+    nextCursor: string | null;
+}
+
+interface GenerationJob {
+    id: string;
+    status: "queued" | "running" | "succeeded" | "failed";
+    stage: string;
+    progress: number;
+    result?: Itinerary;
+    error?: string;
+}
+
+const JOB_POLL_INTERVAL_MS = 1000;
+
 export function useItineraryApi() {
     const [loading, setLoading] = useState(false);
     const [error, setError] = useState<string | null>(null);
@@ -63,8 +91,25 @@ export function useItineraryApi() {
                 throw new Error("Failed to generate itinerary");
             }
 
-            const data: Itinerary = await response.json();
-            return data;
+            let job: GenerationJob = await response.json();
+            while (job.status === "queued" || job.status === "running") {
+                await new Promise((resolve) =>
+                    setTimeout(resolve, JOB_POLL_INTERVAL_MS)
+                );
+                const jobResponse = await fetch(`/itineraries/jobs/${job.id}`, {
+                    method: "GET",
+                    headers,
+                });
+                if (!jobResponse.ok) {
+                    throw new Error("Failed to fetch generation status");
+                }
+                job = await jobResponse.json();
+            }
+
+            if (job.status === "failed" || !job.result) {
+                throw new Error(job.error || "Failed to generate itinerary");
+            }
+            return job.result;
         } catch (err) {
             setError(
                 err instanceof Error ? err.message : "An unknown error occurred"
@@ -75,12 +120,15 @@ export function useItineraryApi() {
         }
     };
 
-    const getItineraries = async (): Promise<Itinerary[] | null> => {
+    const getItineraries = async (
+        cursor?: string | null
+    ): Promise<ItineraryPage | null> => {
         setLoading(true);
         setError(null);
 
         try {
-            const response = await fetch("/itineraries", {
+            const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : "";
+            const response = await fetch(`/itineraries${query}`, {
                 method: "GET",
                 headers,
             });
@@ -89,8 +137,11 @@ export function useItineraryApi() {
                 throw new Error("Failed to fetch itineraries");
             }
 
-            const data: Itinerary[] = await response.json();
-            return data;
+            const itineraries: ItinerarySummary[] = await response.json();
+            return {
+                itineraries,
+                nextCursor: response.headers.get("X-Next-Cursor"),
+            };
         } catch (err) {
             setError(
                 err instanceof Error ? err.message : "An unknown error occurred"